@@ -7,6 +7,8 @@ import os
 import psycopg2
 import hashlib
 from dotenv import load_dotenv
+from app.api.deps import get_db
+from app.services.helpers.db_helpers import get_conn
 
 load_dotenv()
 
@@ -26,21 +28,15 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: str | None = None
+    user_id: int | None = None
 
 class User(BaseModel):
     email: str
     password: str
 
 
-# connect to the database
-
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.environ.get("DB_HOST"),
-        database=os.environ.get("DB_NAME"),
-        user=os.environ.get("DB_USER"),
-        password=os.environ.get("DB_PASSWORD"),
-    )
+# connect to the database (shared pool, see db_helpers); routes take Depends(get_db)
+get_db_connection = get_conn
 
 def hash_password(password: str) -> str:
     """simple sha256 hash for demo purposes"""
@@ -54,6 +50,32 @@ def get_password_hash(password: str) -> str:
     """get sha256 hash of password"""
     return hash_password(password)
 
+def decode_access_token(token: str) -> TokenData:
+    """
+    Validate a bearer token and return its claims (401 if invalid).
+
+    user_id comes from the "uid" claim; tokens issued before it existed only
+    carry the email.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    email = payload.get("sub")
+    if email is None:
+        raise credentials_exception
+    uid = payload.get("uid")
+    try:
+        user_id = int(uid) if uid is not None else None
+    except (TypeError, ValueError):
+        raise credentials_exception
+    return TokenData(email=email, user_id=user_id)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -65,8 +87,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 @router.post("/signup", response_model=Token)
-async def signup(user: User):
-    conn = get_db_connection()
+def signup(user: User, conn: psycopg2.extensions.connection = Depends(get_db)):
     cur = conn.cursor()
     try:
         # check if email already exists
@@ -99,18 +120,19 @@ async def signup(user: User):
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data={"sub": user.email, "uid": new_user_id}, expires_delta=access_token_expires
         )
 
         return {"access_token": access_token, "token_type": "bearer", "user_id": new_user_id}
     finally:
         cur.close()
-        conn.close()
 
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    conn = get_db_connection()
+def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    conn: psycopg2.extensions.connection = Depends(get_db),
+):
     cur = conn.cursor()
 
     # Get user by email
@@ -138,7 +160,6 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     hashed_password = auth_record[0]
 
     cur.close()
-    conn.close()
 
     if not verify_password(form_data.password, hashed_password):
         raise HTTPException(
@@ -149,7 +170,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": form_data.username}, expires_delta=access_token_expires
+        data={"sub": form_data.username, "uid": user_id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer", "user_id": user_id}
 
@@ -6,6 +6,7 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 from app.models.conversation import ConversationPreviewOut, SendMessageOut, OpenConversationOut
 from app.services.conversations_service import (
+    MESSAGE_PAGE_SIZE,
     get_conversations,
     send_message,
     open_conversation,
@@ -65,12 +66,18 @@ def post_send_message(payload: SendMessageRequest) -> SendMessageOut:
 def get_conversation(
     friend_user_id: int,
     user_id: int = Query(..., description="Current user id"),
+    limit: int = Query(default=MESSAGE_PAGE_SIZE, ge=1, le=200, description="messages per page"),
+    before: Optional[str] = Query(default=None, description="next_before from a previous page (older messages)"),
+    after: Optional[str] = Query(default=None, description="next_after from a previous page (newer messages)"),
 ) -> OpenConversationOut:
     """
-    GET /conversations/conversation/{friend_user_id}?user_id=123
+    GET /conversations/conversation/{friend_user_id}?user_id=123&limit=50&before=<next_before>
+    Newest page first; messages within a page are oldest to newest.
     """
     try:
-        return open_conversation(user_id=user_id, friend_id=friend_user_id)
+        return open_conversation(user_id=user_id, friend_id=friend_user_id, limit=limit, before=before, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -81,12 +88,13 @@ def get_conversation(
 )
 def get_most_recent_conversation(
     user_id: int = Query(..., description="Current user id"),
+    limit: int = Query(default=MESSAGE_PAGE_SIZE, ge=1, le=200, description="messages per page"),
 ) -> OpenConversationOut:
     """
     GET /conversations/conversation?user_id=123
-    Opens the most recent conversation (by Conversations.last_messaged).
+    Opens the most recent conversation (by Conversations.last_messaged), newest page of messages.
     """
     try:
-        return open_conversation(user_id=user_id, friend_id=None)
+        return open_conversation(user_id=user_id, friend_id=None, limit=limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
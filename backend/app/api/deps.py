@@ -1,8 +1,19 @@
-from typing import AsyncGenerator
+from typing import Iterator
 
-async def get_db() -> AsyncGenerator[None, None]:
+import psycopg2.extensions
+
+from app.services.helpers.db_helpers import get_conn
+
+
+def get_db() -> Iterator[psycopg2.extensions.connection]:
     """
-    Mock dependency to satisfy imports.
-    In a real app, this would yield a database session.
+    Request-scoped database connection from the shared pool.
+
+    Returned to the pool (rolled back if left mid-transaction) after the
+    response is sent.
     """
-    yield None
+    conn = get_conn()
+    try:
+        yield conn
+    finally:
+        conn.close()
@@ -1,51 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 import psycopg2
-import os
+from app.api.deps import get_db
 from app.schemas.post import PostCreate
+from app.services.helpers.post_tags import derive_post_tags
+from app.services.helpers.embedding_worker import notify_new_post
+from app.services.helpers.feed_cache import invalidate_new_post
 from pydantic import BaseModel
 
 router = APIRouter()
 
-def get_db_connection():
-    print("Attempting to connect to the database...")
-    try:
-        conn = psycopg2.connect(
-            host=os.environ.get("DB_HOST"),
-            database=os.environ.get("DB_NAME"),
-            user=os.environ.get("DB_USER"),
-            password=os.environ.get("DB_PASSWORD"),
-        )
-        print("Database connection successful.")
-        return conn
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        raise
-
 @router.post("/posts")
-def create_post(post: PostCreate):
+def create_post(post: PostCreate, conn: psycopg2.extensions.connection = Depends(get_db)):
     print(f"Received request to create post: {post.dict()}")
-    conn = None
+    cur = conn.cursor()
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
         print("Executing INSERT statement...")
         cur.execute(
-            """INSERT INTO Posts (user_id, post_content, capacity, start_time, end_time, location_str, is_event)
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING PostID""",
-            (post.user_id, post.post_content, post.capacity, post.start_time, post.end_time, post.location_str, True)
+            """INSERT INTO Posts (user_id, post_content, tags, capacity, start_time, end_time, location_str, is_event)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING PostID""",
+            (post.user_id, post.post_content, derive_post_tags(post.post_content), post.capacity, post.start_time, post.end_time, post.location_str, True)
         )
         post_id = cur.fetchone()[0]
         print(f"Post created with ID: {post_id}")
         conn.commit()
+        notify_new_post()
+        invalidate_new_post()
         return {"PostID": post_id}
     except Exception as e:
         print(f"An error occurred: {e}")
-        if conn:
-            conn.rollback()
-            print("Transaction rolled back.")
+        conn.rollback()
+        print("Transaction rolled back.")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if conn:
-            cur.close()
-            conn.close()
-            print("Database connection closed.")
+        cur.close()
@@ -1,15 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from jose import JWTError, jwt
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from .auth import oauth2_scheme, SECRET_KEY, ALGORITHM, get_db_connection, TokenData
+from .auth import oauth2_scheme, get_db_connection, TokenData, decode_access_token
+from ..services.helpers.principal_cache import cached_principal
 
 router = APIRouter()
 
+# columns read by get_current_user (keeps embedding / recs-cache columns off the wire)
+SQL_PROFILE_COLUMNS = """
+    userID, Name, Age, Email, pronouns, isStudent, university, currentCity, travelingTo,
+    languages, hometown, agePreference, verifiedStudentsOnly, culturalIdentity, ethnicity,
+    religion, culturalSimilarityImportance, culturalComfortLevel, languageMatchImportant,
+    purposeOfStay, lookingFor, socialVibe, whoCanSeePosts, hideLocationUntilFriends,
+    meetupPreference, boundaries, bio, AboutMe, Friends
+"""
+
 class AgePreference(BaseModel):
     enabled: bool = True
     range: int = 25
@@ -58,30 +67,35 @@ class UserProfile(BaseModel):
     # flag to indicate if profile setup is complete
     profileComplete: bool = False
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    token_data = decode_access_token(token)
+    # cached per user until a profile write (see principal_cache)
+    profile = cached_principal(
+        "profile", token_data.user_id, token_data.email, lambda: _load_current_user(token_data)
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-    
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return profile
+
+
+def _load_current_user(token_data: TokenData) -> Tuple[Optional[UserProfile], Optional[int]]:
+    """Fetch the token's user (by uid claim, else email); returns (profile, user id)."""
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM Users WHERE Email = %s", (token_data.email,))
+    if token_data.user_id is not None:
+        cur.execute(f"SELECT {SQL_PROFILE_COLUMNS} FROM Users WHERE userID = %s", (token_data.user_id,))
+    else:
+        cur.execute(f"SELECT {SQL_PROFILE_COLUMNS} FROM Users WHERE Email = %s", (token_data.email,))
     user = cur.fetchone()
     cur.close()
     conn.close()
     
     if user is None:
-        raise credentials_exception
+        return None, None
     
     # check if profile setup is complete (has required fields filled)
     profile_complete = bool(
@@ -133,7 +147,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         },
         "profileComplete": profile_complete,
     }
-    return UserProfile(**user_dict)
+    return UserProfile(**user_dict), user["userid"]
 
 
 @router.get("/users/me", response_model=UserProfile)
@@ -1,18 +1,31 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from jose import JWTError, jwt
 import psycopg2
 import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 from ..schemas.profile import ProfileOut
 from ..schemas.post import CreatePostIn, PostOut
 
-from .auth import oauth2_scheme, SECRET_KEY, ALGORITHM, get_db_connection, TokenData
+from .auth import oauth2_scheme, get_db_connection, TokenData, decode_access_token
+from ..services.helpers.principal_cache import cached_principal
+from ..services.helpers.post_tags import derive_post_tags
+from ..services.helpers.embedding_worker import notify_new_post
+from ..services.helpers.feed_cache import invalidate_new_post
+from ..services.helpers.profile_cards import get_cards
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
+# explicit list (no embedding / recs-cache columns); positions match the user[...] reads below
+SQL_PROFILE_COLUMNS = """
+    userID, Name, Age, Email, pronouns, isStudent, university, currentCity, travelingTo,
+    languages, hometown, agePreference, verifiedStudentsOnly, culturalIdentity, ethnicity,
+    religion, culturalSimilarityImportance, culturalComfortLevel, languageMatchImportant,
+    purposeOfStay, lookingFor, socialVibe, whoCanSeePosts, hideLocationUntilFriends,
+    meetupPreference, boundaries, bio, AboutMe, Friends, BlockedUsers, recs, event_recs_emb
+"""
+
 class AgePreference(BaseModel):
     enabled: bool
     range: int
@@ -59,30 +72,35 @@ class UserProfile(BaseModel):
     recs: Optional[List[dict]] = None
     event_recs: Optional[List[dict]] = None
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    token_data = decode_access_token(token)
+    # cached per user until a profile write (see principal_cache)
+    profile = cached_principal(
+        "profile_router", token_data.user_id, token_data.email, lambda: _load_current_user(token_data)
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-    
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return profile
+
+
+def _load_current_user(token_data: TokenData) -> Tuple[Optional[UserProfile], Optional[int]]:
+    """Fetch the token's user (by uid claim, else email); returns (profile, user id)."""
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM Users WHERE Email = %s", (token_data.email,))
+    if token_data.user_id is not None:
+        cur.execute(f"SELECT {SQL_PROFILE_COLUMNS} FROM Users WHERE userID = %s", (token_data.user_id,))
+    else:
+        cur.execute(f"SELECT {SQL_PROFILE_COLUMNS} FROM Users WHERE Email = %s", (token_data.email,))
     user = cur.fetchone()
     cur.close()
     conn.close()
     
     if user is None:
-        raise credentials_exception
+        return None, None
     
     # Convert tuple to dictionary and construct UserProfile
     user_dict = {
@@ -126,7 +144,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             "culturalSimilarity": 50
         }
     }
-    return UserProfile(**user_dict)
+    return UserProfile(**user_dict), user[0]
 
 
 @router.get("/users/me", response_model=UserProfile)
@@ -134,10 +152,10 @@ async def read_users_me(current_user: UserProfile = Depends(get_current_user)):
     return current_user
 
 @router.get("/users/{user_id}", response_model=UserProfile)
-async def read_user_profile(user_id: int):
+def read_user_profile(user_id: int):
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM Users WHERE userID = %s", (user_id,))
+    cur.execute(f"SELECT {SQL_PROFILE_COLUMNS} FROM Users WHERE userID = %s", (user_id,))
     user = cur.fetchone()
     cur.close()
     conn.close()
@@ -188,7 +206,7 @@ async def read_user_profile(user_id: int):
     return UserProfile(**user_dict)
 
 @router.get("/info/", response_model=ProfileOut)
-async def profile_info(user_id: int):
+def profile_info(user_id: int):
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute("SELECT userID, Name, bio FROM Users WHERE userID = %s", (user_id,))
@@ -201,10 +219,10 @@ async def profile_info(user_id: int):
 
 
 @router.post("/post/", response_model=PostOut)
-async def create_post(payload: CreatePostIn):
+def create_post(payload: CreatePostIn):
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM Users WHERE userID = %s", (payload.author_id,))
+    cur.execute("SELECT 1 FROM Users WHERE userID = %s", (payload.author_id,))
     author = cur.fetchone()
     if not author:
         raise HTTPException(status_code=404, detail="author not found")
@@ -214,33 +232,38 @@ async def create_post(payload: CreatePostIn):
     next_post_id = cur.fetchone()[0]
 
     cur.execute(
-        "INSERT INTO Posts (PostID, user_id, post_content) VALUES (%s, %s, %s) RETURNING PostID, user_id, post_content",
-        (next_post_id, payload.author_id, payload.content)
+        "INSERT INTO Posts (PostID, user_id, post_content, tags) VALUES (%s, %s, %s, %s) RETURNING PostID, user_id, post_content",
+        (next_post_id, payload.author_id, payload.content, derive_post_tags(payload.content))
     )
     post = cur.fetchone()
     conn.commit()
     cur.close()
     conn.close()
+    notify_new_post()
+    invalidate_new_post()
     return PostOut(id=str(post[0]), author_id=str(post[1]), content=post[2] or "", is_event=payload.is_event)
 
 
 @router.get("/posts/{user_id}")
-async def get_user_posts(user_id: int):
+def get_user_posts(user_id: int):
     """get all posts by a specific user"""
     try: 
         conn = get_db_connection()
         cur = conn.cursor()
         cur.execute(
             """
-                SELECT p.PostID, p.user_id, p.post_content, p.capacity, p.start_time, p.end_time, p.location_str, p.is_event, p.time_posted, u.Name, u.currentCity
+                SELECT p.PostID, p.user_id, p.post_content, p.capacity, p.start_time, p.end_time, p.location_str, p.is_event, p.time_posted
                 FROM Posts p
-                JOIN Users u ON p.user_id = u.userID
                 WHERE p.user_id = %s;
             """, (user_id,)
         )
         posts = cur.fetchall()
+        # author name / location from the shared card cache
+        author = get_cards([user_id], conn).get(user_id)
         cur.close()
         conn.close()
+        if author is None:
+            return []
         response_posts = [
             {
                 "id": post[0],
@@ -252,8 +275,8 @@ async def get_user_posts(user_id: int):
                 "location_str": post[6],
                 "is_event": post[7],
                 "time_posted": post[8],
-                "author_name": post[9],
-                "author_location": post[10]
+                "author_name": author["name"],
+                "author_location": author["currentCity"]
             }
             for post in posts
         ]
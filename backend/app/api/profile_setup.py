@@ -6,8 +6,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
-from .auth import get_db_connection, oauth2_scheme, SECRET_KEY, ALGORITHM
-from jose import jwt, JWTError
+from .auth import get_db_connection, oauth2_scheme, decode_access_token
+from ..services.helpers.feed_cache import invalidate_user
+from ..services.helpers.principal_cache import cached_principal, invalidate_principal
+from ..services.helpers.profile_cards import invalidate_cards
 
 router = APIRouter()
 
@@ -67,20 +69,23 @@ class Step6MatchFilters(BaseModel):
 # -----------------------------
 def get_current_user_email(token: str = Depends(oauth2_scheme)) -> str:
     """Extract email from JWT token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    return decode_access_token(token).email
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str | None = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        return email
-    except JWTError:
-        raise credentials_exception
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """
+    userID of the token's user: the "uid" claim, or a cached email lookup for
+    tokens issued before the claim existed
+    """
+    token_data = decode_access_token(token)
+    if token_data.user_id is not None:
+        return token_data.user_id
+
+    def load():
+        user_id = get_user_id_by_email(token_data.email)
+        return user_id, user_id
+
+    return cached_principal("user_id", None, token_data.email, load)
 
 
 def get_user_id_by_email(email: str) -> int:
@@ -101,6 +106,13 @@ def get_user_id_by_email(email: str) -> int:
         conn.close()
 
 
+def profile_changed(user_id: int) -> None:
+    """Drop everything cached from the user's row: feeds showing them, principal, card."""
+    invalidate_user(user_id)
+    invalidate_principal(user_id)
+    invalidate_cards([user_id])
+
+
 def list_to_csv(value: Optional[List[str]]) -> Optional[str]:
     """
     Schema has ethnicity/religion as VARCHAR(255), but your API sends List[str].
@@ -115,13 +127,12 @@ def list_to_csv(value: Optional[List[str]]) -> Optional[str]:
 # Endpoints
 # -----------------------------
 @router.post("/profile/setup/step1")
-async def update_step1(data: Step1BasicInfo, token: str = Depends(oauth2_scheme)):
+def update_step1(data: Step1BasicInfo, token: str = Depends(oauth2_scheme)):
     """
     Save Step 1: Basic Information
     - fullName, age, pronouns, isStudent, university, currentCity, languages, hometown
     """
-    email = get_current_user_email(token)
-    user_id = get_user_id_by_email(email)
+    user_id = get_current_user_id(token)
 
     conn = get_db_connection()
     cur = conn.cursor()
@@ -152,6 +163,7 @@ async def update_step1(data: Step1BasicInfo, token: str = Depends(oauth2_scheme)
             ),
         )
         conn.commit()
+        profile_changed(user_id)
 
         # Debug: SELECT and print the updated data
         cur.execute(
@@ -184,13 +196,12 @@ async def update_step1(data: Step1BasicInfo, token: str = Depends(oauth2_scheme)
 
 
 @router.post("/profile/setup/step2")
-async def update_step2(data: Step2CulturalInfo, token: str = Depends(oauth2_scheme)):
+def update_step2(data: Step2CulturalInfo, token: str = Depends(oauth2_scheme)):
     """
     Save Step 2: Cultural Information
     - culturalIdentity, ethnicity, religion, culturalSimilarityImportance, culturalComfortLevel, languageMatchImportant
     """
-    email = get_current_user_email(token)
-    user_id = get_user_id_by_email(email)
+    user_id = get_current_user_id(token)
 
     conn = get_db_connection()
     cur = conn.cursor()
@@ -217,6 +228,7 @@ async def update_step2(data: Step2CulturalInfo, token: str = Depends(oauth2_sche
             ),
         )
         conn.commit()
+        profile_changed(user_id)
 
         # Debug: SELECT and print the updated data
         cur.execute(
@@ -248,14 +260,13 @@ async def update_step2(data: Step2CulturalInfo, token: str = Depends(oauth2_sche
 
 
 @router.post("/profile/setup/step3")
-async def update_step3(data: Step3TravelIntent, token: str = Depends(oauth2_scheme)):
+def update_step3(data: Step3TravelIntent, token: str = Depends(oauth2_scheme)):
     """
     Save Step 3: Travel + Intent
     - lookingFor, socialVibe, purposeOfStay
     (availability is accepted but not stored in schema)
     """
-    email = get_current_user_email(token)
-    user_id = get_user_id_by_email(email)
+    user_id = get_current_user_id(token)
 
     conn = get_db_connection()
     cur = conn.cursor()
@@ -276,6 +287,7 @@ async def update_step3(data: Step3TravelIntent, token: str = Depends(oauth2_sche
             ),
         )
         conn.commit()
+        profile_changed(user_id)
 
         # Debug: SELECT and print the updated data
         cur.execute(
@@ -303,7 +315,7 @@ async def update_step3(data: Step3TravelIntent, token: str = Depends(oauth2_sche
 
 
 @router.post("/profile/setup/step4")
-async def update_step4(data: Step4SafetyComfort, token: str = Depends(oauth2_scheme)):
+def update_step4(data: Step4SafetyComfort, token: str = Depends(oauth2_scheme)):
     """
     Save Step 4: Safety + Comfort
     - whoCanSeePosts, hideLocationUntilFriends, meetupPreference, boundaries
@@ -314,8 +326,7 @@ async def update_step4(data: Step4SafetyComfort, token: str = Depends(oauth2_sch
       - hideLocationUntilFriends  -> hidelocationuntilfriends
       - meetupPreference          -> meetuppreference
     """
-    email = get_current_user_email(token)
-    user_id = get_user_id_by_email(email)
+    user_id = get_current_user_id(token)
 
     conn = get_db_connection()
     cur = conn.cursor()
@@ -339,6 +350,7 @@ async def update_step4(data: Step4SafetyComfort, token: str = Depends(oauth2_sch
             ),
         )
         conn.commit()
+        profile_changed(user_id)
 
         # Debug: SELECT and print the updated data
         cur.execute(
@@ -367,14 +379,13 @@ async def update_step4(data: Step4SafetyComfort, token: str = Depends(oauth2_sch
 
 
 @router.post("/profile/setup/step5")
-async def update_step5(data: Step5ProfileCustomization, token: str = Depends(oauth2_scheme)):
+def update_step5(data: Step5ProfileCustomization, token: str = Depends(oauth2_scheme)):
     """
     Save Step 5: Profile Customization
     - bio, AboutMe
     (interests/badges are accepted but not stored in schema)
     """
-    email = get_current_user_email(token)
-    user_id = get_user_id_by_email(email)
+    user_id = get_current_user_id(token)
 
     conn = get_db_connection()
     cur = conn.cursor()
@@ -393,6 +404,7 @@ async def update_step5(data: Step5ProfileCustomization, token: str = Depends(oau
             ),
         )
         conn.commit()
+        profile_changed(user_id)
 
         # Debug: SELECT and print the updated data
         cur.execute(
@@ -419,14 +431,13 @@ async def update_step5(data: Step5ProfileCustomization, token: str = Depends(oau
 
 
 @router.post("/profile/setup/step6")
-async def update_step6(data: Step6MatchFilters, token: str = Depends(oauth2_scheme)):
+def update_step6(data: Step6MatchFilters, token: str = Depends(oauth2_scheme)):
     """
     Save Step 6: Match Filters
     - agePreference, verifiedStudentsOnly
     (culturalSimilarity is accepted but not stored in schema)
     """
-    email = get_current_user_email(token)
-    user_id = get_user_id_by_email(email)
+    user_id = get_current_user_id(token)
 
     # agePreference is stored as INT in schema. Your incoming data is a dict.
     # We'll try to pull a numeric "range" safely; otherwise default to 5.
@@ -453,6 +464,7 @@ async def update_step6(data: Step6MatchFilters, token: str = Depends(oauth2_sche
             ),
         )
         conn.commit()
+        profile_changed(user_id)
 
         # Debug: SELECT and print the updated data
         cur.execute(
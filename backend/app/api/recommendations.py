@@ -1,30 +1,85 @@
 """
 recommendation api endpoints
 
+GET /api/recommendations/refresh                  (starts or joins the background refresh job)
+GET /api/recommendations/refresh/{job_id}
+POST /api/recommendations/refresh/{job_id}/cancel
+POST /api/recommendations/shuffle?user_id=<id>
+GET /api/recommendations/feed?user_id=<id>&limit=20&cursor=<next_cursor>
 GET /api/recommendations/people?user_id=<id>&limit=20
 GET /api/recommendations/posts?user_id=<id>&limit=30
+GET /api/recommendations/embedding-worker
+GET /api/recommendations/cache-stats
 """
 
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException
 
 from app.models.recommendation import PersonRecommendation, PostRecommendation
-from app.services.recommender_service import recommend_people, recommend_posts, recommend_mixed_feed, refresh_feed
+from app.services.recommender_service import InvalidCursor, recommend_feed, recommend_people, recommend_posts, recommend_mixed_feed
+from app.services.refresh_jobs import cancel_job, get_job, start_refresh_job
+from app.services.helpers.embedding_worker import get_embedding_worker
+from app.services.helpers.feed_cache import feed_cache
+from app.api.deps import get_db
+from app.services.helpers.feed_shuffle import clear_shuffle_seed, set_shuffle_seed
 
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 
 
-@router.get("/refresh")
-def refresh_recommendations(refresh: bool = Query(default=True, description="incorporate some randomness")):
+@router.get("/refresh", status_code=202)
+def refresh_recommendations(
+    refresh: bool = Query(default=True, description="incorporate some randomness"),
+    workers: int = Query(default=1, ge=1, le=64, description="worker processes to shard users across"),
+    incremental: bool = Query(default=False, description="only recompute people recs for users that changed"),
+):
     """
-    Refresh user recommendations.
+    Start a background refresh of user recommendations.
+
+    Returns the job (poll GET /refresh/{job_id}). If a refresh is already
+    running, that job is returned instead of starting another one
+    ("started": false).
     """
-    res = refresh_feed(refresh)
-    
-    if res == "success":
-        return True
-    else:
-        return False
+    job, started = start_refresh_job(refresh=refresh, workers=workers, incremental=incremental)
+    return {"started": started, **job.to_dict()}
+
+
+@router.get("/refresh/{job_id}")
+def get_refresh_job(job_id: str):
+    """
+    Refresh job status: queued / running / cancelling / succeeded / failed / cancelled,
+    plus users processed and seconds per stage, and the refresh report
+    (workers, incremental, per-stage timings) once it succeeded.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="refresh job not found")
+    return job.to_dict()
+
+
+@router.post("/refresh/{job_id}/cancel")
+def cancel_refresh_job(job_id: str):
+    """
+    Cancel a refresh job; stages already finished keep their results.
+    """
+    job = cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="refresh job not found")
+    return job.to_dict()
+
+@router.post("/shuffle")
+def shuffle_recommendations(
+    user_id: str = Query(..., description="user id whose feed to shuffle"),
+    reset: bool = Query(default=False, description="go back to ranked order"),
+    conn=Depends(get_db),
+):
+    """
+    Shuffle one user's feed without recomputing recs: stores a new seed that
+    the posts / people / all-recs endpoints apply at read time
+    """
+    if reset:
+        clear_shuffle_seed(conn, int(user_id))
+        return {"user_id": int(user_id), "seed": None}
+    return {"user_id": int(user_id), "seed": set_shuffle_seed(conn, int(user_id))}
 
 @router.get("/all-recs")
 def get_all_recommendations(
@@ -35,8 +90,25 @@ def get_all_recommendations(
     """
     return recommend_mixed_feed(int(user_id), limit)
 
+@router.get("/feed")
+def get_feed(
+    user_id: str = Query(..., description="user id to get the feed for"),
+    limit: int = Query(default=20, ge=1, le=50, description="items per page"),
+    cursor: str | None = Query(default=None, description="next_cursor from the previous page"),
+):
+    """
+    Unified posts + people feed for infinite scroll: returns one page of
+    items plus next_cursor (null on the last page); restarted is true when
+    the cursor's feed was rebuilt and this is its first page again
+    """
+    uid = int(user_id)
+    try:
+        return recommend_feed(uid, limit=limit, cursor=cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
 @router.get("/people", response_model=list[PersonRecommendation])
-async def get_people_recommendations(
+def get_people_recommendations(
     user_id: str = Query(..., description="user id to get recommendations for"),
     limit: int = Query(default=20, ge=1, le=50, description="max number of results")
 ):
@@ -56,7 +128,7 @@ async def get_people_recommendations(
 
 
 @router.get("/posts", response_model=list[PostRecommendation])
-async def get_post_recommendations(
+def get_post_recommendations(
     user_id: str = Query(..., description="user id to get recommendations for"),
     limit: int = Query(default=30, ge=1, le=50, description="max number of results")
 ):
@@ -73,3 +145,20 @@ async def get_post_recommendations(
     """
     results = recommend_posts(int(user_id), limit=limit)
     return results
+
+
+@router.get("/embedding-worker")
+def get_embedding_worker_stats():
+    """
+    background post embedding worker: throughput (posts_per_sec), queue_depth
+    (posts still without an embedding), batch counters and the last error
+    """
+    return get_embedding_worker().stats()
+
+
+@router.get("/cache-stats")
+def get_feed_cache_stats():
+    """
+    hydrated feed cache: hits, misses, hit_rate, size, evictions, expired, invalidations
+    """
+    return feed_cache.stats()
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 import psycopg2
-import os
 from pydantic import BaseModel
 import logging
+from app.api.deps import get_db
+from app.services.helpers.profile_cards import get_cards
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,27 +13,10 @@ class RsvpRequest(BaseModel):
 
 router = APIRouter()
 
-def get_db_connection():
-    logger.info("Attempting to connect to the database...")
-    try:
-        conn = psycopg2.connect(
-            host=os.environ.get("DB_HOST"),
-            database=os.environ.get("DB_NAME"),
-            user=os.environ.get("DB_USER"),
-            password=os.environ.get("DB_PASSWORD"),
-        )
-        logger.info("Database connection successful.")
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        raise
-
 @router.post("/posts/{post_id}/rsvp")
-def rsvp_to_post(post_id: int, rsvp_request: RsvpRequest):
-    conn = None
+def rsvp_to_post(post_id: int, rsvp_request: RsvpRequest, conn: psycopg2.extensions.connection = Depends(get_db)):
+    cur = conn.cursor()
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
         
         logger.info(f"Fetching RSVP list for user {rsvp_request.userId}")
         cur.execute("SELECT RSVP FROM Users WHERE userID = %s", (rsvp_request.userId,))
@@ -55,21 +39,15 @@ def rsvp_to_post(post_id: int, rsvp_request: RsvpRequest):
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except Exception as e:
         logger.error(f"An error occurred while RSVPing: {e}")
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if conn:
-            cur.close()
-            conn.close()
-            logger.info("Database connection closed.")
+        cur.close()
 
 @router.get("/users/{user_id}/rsvps")
-def get_rsvpd_posts(user_id: int):
-    conn = None
+def get_rsvpd_posts(user_id: int, conn: psycopg2.extensions.connection = Depends(get_db)):
+    cur = conn.cursor()
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
 
         logger.info(f"Fetching RSVP list for user {user_id}")
         cur.execute("SELECT RSVP FROM Users WHERE userID = %s", (user_id,))
@@ -86,13 +64,15 @@ def get_rsvpd_posts(user_id: int):
 
         logger.info(f"Fetching posts with IDs: {rsvp_list}")
         query = """
-            SELECT p.PostID, p.user_id, p.post_content, p.capacity, p.start_time, p.end_time, p.location_str, p.is_event, p.time_posted, u.Name, u.currentCity
+            SELECT p.PostID, p.user_id, p.post_content, p.capacity, p.start_time, p.end_time, p.location_str, p.is_event, p.time_posted
             FROM Posts p
-            JOIN Users u ON p.user_id = u.userID
             WHERE p.PostID = ANY(%s)
         """
         cur.execute(query, (rsvp_list,))
-        posts = cur.fetchall()
+        # author name / location from the shared card cache; posts without a known author are skipped
+        rows = cur.fetchall()
+        authors = get_cards((post[1] for post in rows), conn)
+        posts = [post for post in rows if post[1] in authors]
         logger.info(f"Found {len(posts)} posts")
         
         response_posts = [
@@ -106,8 +86,8 @@ def get_rsvpd_posts(user_id: int):
                 "location_str": post[6],
                 "is_event": post[7],
                 "time_posted": post[8],
-                "author_name": post[9],
-                "author_location": post[10]
+                "author_name": authors[post[1]]["name"],
+                "author_location": authors[post[1]]["currentCity"]
             }
             for post in posts
         ]
@@ -119,7 +99,4 @@ def get_rsvpd_posts(user_id: int):
         logger.error(f"An error occurred while fetching RSVPed posts: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if conn:
-            cur.close()
-            conn.close()
-            logger.info("Database connection closed.")
+        cur.close()
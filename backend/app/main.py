@@ -8,6 +8,10 @@ Merged FastAPI application:
 - Auth and Profile setup endpoints
 - CORS + health check preserved
 """
+import os
+from contextlib import asynccontextmanager
+
+import anyio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -23,9 +27,57 @@ from app.api.recommendations import router as recommendations_router
 from app.api.posts import router as posts_router
 from app.api.rsvps import router as rsvps_router
 from app.api import auth, profile_setup
+from app.services.conversations_service import has_last_message_columns
+from app.services.helpers.db_helpers import close_pool, get_conn, init_pool, pool_stats
+from app.services.helpers.embedding_worker import get_embedding_worker
+from app.services.helpers.feed_shuffle import ensure_recs_seed_column
+from app.services.helpers.post_tags import ensure_post_tags_column
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # route handlers that touch the database are plain `def`: FastAPI runs them
+    # in this bounded thread pool, so a slow query never blocks the event loop
+    threads = int(os.getenv("API_THREADS", "40"))
+    if threads > 0:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+
+    # one connection pool per process, sized by DB_POOL_MIN / DB_POOL_MAX
+    try:
+        init_pool()
+    except Exception as e:
+        # DB down at startup: requests open connections on demand until restart
+        print(f"Could not create connection pool: {e}")
 
+    # users.recs_seed (read-time feed shuffle) and posts.tags (written by
+    # create_post) on databases created before they existed
+    try:
+        conn = get_conn()
+        try:
+            ensure_recs_seed_column(conn)
+            ensure_post_tags_column(conn)
+            # catalog check only: the preview migration is a separate command
+            if not has_last_message_columns(conn):
+                print("Conversations.last_message_* missing (inbox reads Messages): "
+                      "run python -m app.services.conversations_service --migrate")
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Could not ensure users.recs_seed / posts.tags: {e}")
 
-app = FastAPI(title="Travelmate API")
+    # embed posts created through the API in the background (EMBED_WORKER=0 to disable)
+    worker = get_embedding_worker() if os.getenv("EMBED_WORKER", "1") == "1" else None
+    if worker is not None:
+        worker.start()
+    try:
+        yield
+    finally:
+        if worker is not None:
+            worker.stop()
+        close_pool()
+
+
+app = FastAPI(title="Travelmate API", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -50,6 +102,12 @@ async def health_check():
     return {"ok": True}
 
 
+@app.get("/api/health/db-pool")
+async def db_pool_stats():
+    # size / in_use / utilisation and checkout wait times; null when unpooled
+    return {"pool": pool_stats()}
+
+
 @app.get("/")
 async def root():
     return {
@@ -67,8 +125,16 @@ async def root():
             "GET /conversations/conversation?user_id=123",
             "GET /settings/",
             "GET /api/health",
+            "GET /api/health/db-pool",
+            "GET /api/recommendations/feed?user_id=<id>&limit=20&cursor=<next_cursor>",
             "GET /api/recommendations/people?user_id=<id>&limit=20",
             "GET /api/recommendations/posts?user_id=<id>&limit=20",
+            "GET /api/recommendations/refresh",
+            "GET /api/recommendations/refresh/{job_id}",
+            "POST /api/recommendations/refresh/{job_id}/cancel",
+            "POST /api/recommendations/shuffle?user_id=<id>",
+            "GET /api/recommendations/embedding-worker",
+            "GET /api/recommendations/cache-stats",
         ],
     }
 
@@ -15,6 +15,8 @@ class OpenConversationOut(BaseModel):
     friend_user_id: Optional[int] = None
     friend_name: Optional[str] = None
     messages: List[SendMessageOut] = []
+    next_before: Optional[str] = None
+    next_after: Optional[str] = None
 
 
 class ConversationPreviewOut(BaseModel):
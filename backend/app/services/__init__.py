@@ -8,6 +8,11 @@ from .helpers.similarity_helpers import (
     mutual_friends_score,
     recency_score,
     culture_score,
+    CategoryVocab,
+    PersonFeatures,
+    PeopleBlock,
+    encode_person,
+    score_people_block,
 )
 
 __all__ = [
@@ -20,4 +25,9 @@ __all__ = [
     "mutual_friends_score",
     "recency_score",
     "culture_score",
+    "CategoryVocab",
+    "PersonFeatures",
+    "PeopleBlock",
+    "encode_person",
+    "score_people_block",
 ]
@@ -1,9 +1,178 @@
+"""
+Conversations and messages.
+
+Databases created before the inbox preview (Conversations.last_message_*)
+and the ordered history index existed need a one-time migration; until it
+has run, the inbox falls back to reading the newest message per conversation:
+
+cd backend
+python -m app.services.conversations_service --migrate
+"""
 from __future__ import annotations
 
-from typing import Optional, List, Dict, Any
+import base64
+import binascii
+import json
+import sys
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
 
+import psycopg2
 from psycopg2.extras import RealDictCursor
 from app.services.helpers.db_helpers import get_conn
+from app.services.helpers.profile_cards import get_cards
+
+# characters of the last message kept on Conversations for the inbox preview
+LAST_MESSAGE_SNIPPET_CHARS = 200
+
+# messages per open_conversation page when no limit is given
+MESSAGE_PAGE_SIZE = 50
+
+SQL_LAST_MESSAGE_COLUMNS_EXIST = """
+SELECT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'conversations' AND column_name = 'last_message_at'
+);
+"""
+
+# migration: Conversations.last_message_* (inbox preview) and the ordered
+# history index, for databases created before they existed
+SQL_ADD_LAST_MESSAGE_COLUMNS = """
+ALTER TABLE Conversations
+    ADD COLUMN IF NOT EXISTS last_message_id INT,
+    ADD COLUMN IF NOT EXISTS last_message_snippet TEXT,
+    ADD COLUMN IF NOT EXISTS last_message_sender INT,
+    ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMPTZ;
+"""
+
+# one statement each: CONCURRENTLY can't run in a transaction block
+SQL_MIGRATE_CONVERSATION_INDEXES = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_conversation_time ON Messages (conversationID, timestamp, messageID);",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_users ON Conversations (user_a, user_b);",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_user_b ON Conversations (user_b);",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_messages_conversation;",
+)
+
+# newest message per conversation -> Conversations.last_message_*; one
+# backward probe of idx_messages_conversation_time per conversation in scope
+SQL_BACKFILL_LAST_MESSAGE = """
+UPDATE Conversations c
+SET last_message_id = m.messageID,
+    last_message_snippet = LEFT(m.message_content, %(snippet_chars)s),
+    last_message_sender = m.senderID,
+    last_message_at = m.timestamp
+FROM Conversations c2
+CROSS JOIN LATERAL (
+    SELECT messageID, senderID, message_content, timestamp
+    FROM Messages
+    WHERE conversationID = c2.conversationID
+    ORDER BY timestamp DESC, messageID DESC
+    LIMIT 1
+) m
+WHERE c.conversationID = c2.conversationID
+  {only_missing};
+"""
+
+# inbox on databases that haven't run the migration yet
+SQL_GET_CONVERSATIONS_UNMIGRATED = """
+    SELECT
+        c.conversationID,
+        CASE WHEN c.user_a = %s THEN c.user_b ELSE c.user_a END AS friend_user_id,
+        m.message_content AS last_message,
+        m.timestamp AS last_message_time,
+        c.last_messaged
+    FROM Conversations c
+    LEFT JOIN LATERAL (
+        SELECT message_content, timestamp
+        FROM Messages
+        WHERE conversationID = c.conversationID
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) m ON TRUE
+    WHERE c.user_a = %s OR c.user_b = %s
+    ORDER BY c.last_messaged DESC;
+"""
+
+# set once the columns are seen; not cached while missing, so the migration
+# takes effect without a restart
+_has_preview_columns = False
+
+
+def has_last_message_columns(conn: psycopg2.extensions.connection) -> bool:
+    """Whether Conversations.last_message_* exist (catalog lookup until they do)."""
+    global _has_preview_columns
+    if not _has_preview_columns:
+        with conn.cursor() as cur:
+            cur.execute(SQL_LAST_MESSAGE_COLUMNS_EXIST)
+            _has_preview_columns = bool(cur.fetchone()[0])
+    return _has_preview_columns
+
+
+def backfill_last_messages(conn: psycopg2.extensions.connection, only_missing: bool = False) -> int:
+    """
+    Recompute Conversations.last_message_* from Messages (after bulk loads that
+    bypass send_message); returns conversations updated.
+
+    only_missing=True only visits conversations without a preview.
+    """
+    only = "AND c2.last_message_id IS NULL" if only_missing else ""
+    with conn.cursor() as cur:
+        cur.execute(
+            SQL_BACKFILL_LAST_MESSAGE.format(only_missing=only),
+            {"snippet_chars": LAST_MESSAGE_SNIPPET_CHARS},
+        )
+        updated = cur.rowcount
+    conn.commit()
+    return updated
+
+
+def migrate_last_message_columns(conn: psycopg2.extensions.connection) -> int:
+    """
+    One-time migration: add the preview columns, build the history / inbox
+    indexes without blocking writes (CONCURRENTLY), drop the index they
+    replace, and backfill the previews. Idempotent; returns conversations
+    backfilled.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_ADD_LAST_MESSAGE_COLUMNS)
+    conn.commit()
+
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for statement in SQL_MIGRATE_CONVERSATION_INDEXES:
+                cur.execute(statement)
+    finally:
+        conn.autocommit = autocommit
+    return backfill_last_messages(conn, only_missing=True)
+
+
+def _encode_message_cursor(message: Dict[str, Any]) -> str:
+    raw = json.dumps(
+        {"t": message["timestamp"].isoformat(), "m": message["messageid"]},
+        separators=(",", ":"),
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_message_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Cursor -> (timestamp, messageID) of a message; ValueError if malformed."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        ts = datetime.fromisoformat(raw["t"])
+        message_id = int(raw["m"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise ValueError("invalid cursor") from e
+    if ts.tzinfo is None:
+        raise ValueError("invalid cursor")
+    return ts, message_id
+
+
+def _friend_name(cards: Dict[int, Dict[str, Any]], friend_user_id: Optional[int]) -> str:
+    card = cards.get(friend_user_id) if friend_user_id is not None else None
+    return (card["display_name"] if card else None) or "Traveler"
+
 
 def get_conversations(user_id: int) -> List[Dict[str, Any]]:
     """
@@ -11,34 +180,43 @@ def get_conversations(user_id: int) -> List[Dict[str, Any]]:
     ordered by most recent first.
 
     should return friend_name, timestamp, last_message
+
+    The last message comes from the preview kept on the Conversations row
+    (see send_message), so Messages is never read here (until the migration
+    has run, it is looked up per conversation instead).
     """
     sql_get_conversations = """
         SELECT
             c.conversationID,
             CASE WHEN c.user_a = %s THEN c.user_b ELSE c.user_a END AS friend_user_id,
-            COALESCE(u.name, SPLIT_PART(u.email, '@', 1), 'Traveler') AS friend_name,
-            m.message_content AS last_message,
-            m.timestamp AS last_message_time,
+            c.last_message_snippet AS last_message,
+            c.last_message_at AS last_message_time,
             c.last_messaged
         FROM Conversations c
-        LEFT JOIN Users u
-          ON u.userID = CASE WHEN c.user_a = %s THEN c.user_b ELSE c.user_a END
-        LEFT JOIN LATERAL (
-            SELECT message_content, timestamp
-            FROM Messages
-            WHERE conversationID = c.conversationID
-            ORDER BY timestamp DESC
-            LIMIT 1
-        ) m ON TRUE
         WHERE c.user_a = %s OR c.user_b = %s
         ORDER BY c.last_messaged DESC;
     """
 
     conn = get_conn()
     try:
+        if not has_last_message_columns(conn):
+            sql_get_conversations = SQL_GET_CONVERSATIONS_UNMIGRATED
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql_get_conversations, (user_id, user_id, user_id, user_id))
-            return cur.fetchall()
+            cur.execute(sql_get_conversations, (user_id, user_id, user_id))
+            rows = cur.fetchall()
+        # friend names from the shared card cache
+        cards = get_cards((r["friend_user_id"] for r in rows), conn)
+        return [
+            {
+                "conversationid": r["conversationid"],
+                "friend_user_id": r["friend_user_id"],
+                "friend_name": _friend_name(cards, r["friend_user_id"]),
+                "last_message": r["last_message"],
+                "last_message_time": r["last_message_time"],
+                "last_messaged": r["last_messaged"],
+            }
+            for r in rows
+        ]
     finally:
         conn.close()
 
@@ -53,7 +231,7 @@ def send_message(
 
     - Ensures a 1:1 conversation exists (create if missing)
     - Inserts message
-    - Updates Conversations.last_messaged
+    - Updates Conversations.last_messaged and the last-message preview
     Returns basic info about the created message.
     """
     if not message_content or not message_content.strip():
@@ -81,14 +259,26 @@ def send_message(
         RETURNING messageID, conversationID, senderID, message_content, timestamp;
     """
 
+    # the preview only moves forward: a concurrent send that committed a newer
+    # message first keeps its preview
     sql_touch_conversation = """
         UPDATE Conversations
-        SET last_messaged = NOW()
-        WHERE conversationID = %s;
+        SET last_messaged = NOW(),
+            last_message_id = %(message_id)s,
+            last_message_snippet = LEFT(%(content)s, %(snippet_chars)s),
+            last_message_sender = %(sender_id)s,
+            last_message_at = %(sent_at)s
+        WHERE conversationID = %(conversation_id)s
+          AND (last_message_at IS NULL
+               OR (last_message_at, last_message_id) < (%(sent_at)s, %(message_id)s));
     """
 
     conn = get_conn()
     try:
+        if not has_last_message_columns(conn):
+            sql_touch_conversation = """
+                UPDATE Conversations SET last_messaged = NOW() WHERE conversationID = %(conversation_id)s;
+            """
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             # ensure consistent ordering for the unique constraint
             a, b = (user_id, friend_id) if user_id < friend_id else (friend_id, user_id)
@@ -112,8 +302,15 @@ def send_message(
             if not msg_row:
                 raise RuntimeError("Failed to insert message")
 
-            # keep last_messaged correct
-            cur.execute(sql_touch_conversation, (convo_id,))
+            # keep last_messaged and the inbox preview correct
+            cur.execute(sql_touch_conversation, {
+                "conversation_id": convo_id,
+                "message_id": msg_row["messageid"],
+                "content": msg_row["message_content"],
+                "snippet_chars": LAST_MESSAGE_SNIPPET_CHARS,
+                "sender_id": msg_row["senderid"],
+                "sent_at": msg_row["timestamp"],
+            })
 
         conn.commit()
         return msg_row
@@ -128,20 +325,38 @@ def send_message(
 def open_conversation(
     user_id: int,
     friend_id: Optional[int] = None,
+    limit: int = MESSAGE_PAGE_SIZE,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Retrieves all messages between user_id and their friend, friend_id, ordered from least to most recent.
+    Retrieves one page of messages between user_id and their friend, friend_id, ordered from least to most recent.
     If friend_id is not given, open the conversation between the user and the MOST RECENT
     friend who they conversed with.
 
+    Pages are keyset-paginated on (timestamp, messageID) over
+    idx_messages_conversation_time, so every page costs the same however long
+    the thread is:
+      - no cursor: the newest `limit` messages
+      - before:    the `limit` messages just older than that cursor (scrolling up)
+      - after:     the `limit` messages just newer than that cursor (new messages)
+    Cursors are opaque strings; ValueError if malformed or both are given.
+
     Returns:
       {
         "conversationID": int | None,
         "friend_user_id": int | None,
         "friend_name": str | None,
-        "messages": [ {messageID, senderID, message_content, timestamp}, ... ]
+        "messages": [ {messageID, senderID, message_content, timestamp}, ... ],
+        "next_before": str | None,   # older page, None when this page reaches the start
+        "next_after": str | None,    # poll for newer messages from here
       }
     """
+    if before and after:
+        raise ValueError("pass either before or after, not both")
+    before_key = _decode_message_cursor(before) if before else None
+    after_key = _decode_message_cursor(after) if after else None
+
     sql_get_most_recent_convo = """
         SELECT
             conversationID,
@@ -159,17 +374,21 @@ def open_conversation(
            OR (user_a = %s AND user_b = %s);
     """
 
-    sql_get_friend_name = """
-        SELECT COALESCE(name, SPLIT_PART(email, '@', 1), 'Traveler') AS name
-        FROM Users
-        WHERE userID = %s;
-    """
-
-    sql_get_messages_for_convos = """
-        SELECT messageID, senderID, message_content, timestamp
-        FROM Messages
-        WHERE conversationID = ANY(%s)
-        ORDER BY timestamp ASC;
+    # one index range scan per conversation id (duplicates for a pair are
+    # rare), merged and cut to the page; fetches limit + 1 to detect more
+    sql_get_messages_page = """
+        SELECT m.messageID, m.senderID, m.message_content, m.timestamp
+        FROM UNNEST(%(convo_ids)s::int[]) AS c(conversationID)
+        CROSS JOIN LATERAL (
+            SELECT messageID, senderID, message_content, timestamp
+            FROM Messages
+            WHERE conversationID = c.conversationID
+              {keyset}
+            ORDER BY timestamp {direction}, messageID {direction}
+            LIMIT %(n)s
+        ) m
+        ORDER BY m.timestamp {direction}, m.messageID {direction}
+        LIMIT %(n)s;
     """
 
     conn = get_conn()
@@ -180,7 +399,8 @@ def open_conversation(
                 cur.execute(sql_get_most_recent_convo, (user_id, user_id, user_id))
                 row = cur.fetchone()
                 if not row:
-                    return {"conversationID": None, "friend_user_id": None, "friend_name": None, "messages": []}
+                    return {"conversationID": None, "friend_user_id": None, "friend_name": None, "messages": [],
+                            "next_before": None, "next_after": None}
                 friend_user_id = row["friend_user_id"]
                 # get all conversations with this friend (in case of duplicates)
                 a, b = (user_id, friend_user_id) if user_id < friend_user_id else (friend_user_id, user_id)
@@ -193,13 +413,13 @@ def open_conversation(
             convo_rows = cur.fetchall()
             if not convo_rows:
                 # no conversation yet: return empty thread metadata (still show friend name if exists)
-                cur.execute(sql_get_friend_name, (friend_user_id,))
-                f = cur.fetchone()
                 return {
                     "conversationID": None,
                     "friend_user_id": friend_user_id,
-                    "friend_name": f["name"] if f else "Traveler",
+                    "friend_name": _friend_name(get_cards([friend_user_id], conn), friend_user_id),
                     "messages": [],
+                    "next_before": None,
+                    "next_after": None,
                 }
 
             # collect all conversation ids (handles duplicates)
@@ -208,25 +428,57 @@ def open_conversation(
             primary_convo_id = convo_ids[0]
 
             # get friend name
-            cur.execute(sql_get_friend_name, (friend_user_id,))
-            friend_row = cur.fetchone()
-            friend_name = friend_row["name"] if friend_row else "Traveler"
-
-            # get messages from ALL conversations between this pair
-            cur.execute(sql_get_messages_for_convos, (convo_ids,))
+            friend_name = _friend_name(get_cards([friend_user_id], conn), friend_user_id)
+
+            # get one page of messages from ALL conversations between this pair
+            params: Dict[str, Any] = {"convo_ids": convo_ids, "n": limit + 1}
+            if after_key is not None:
+                keyset, direction = "AND (timestamp, messageID) > (%(ts)s, %(mid)s)", "ASC"
+                params["ts"], params["mid"] = after_key
+            elif before_key is not None:
+                keyset, direction = "AND (timestamp, messageID) < (%(ts)s, %(mid)s)", "DESC"
+                params["ts"], params["mid"] = before_key
+            else:
+                keyset, direction = "", "DESC"
+            cur.execute(sql_get_messages_page.format(keyset=keyset, direction=direction), params)
             messages = cur.fetchall()
 
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if after_key is None:
+            # fetched newest first: show oldest first
+            messages.reverse()
+            older = has_more
+        else:
+            # the after cursor itself is older than this page
+            older = bool(messages)
+
+        if messages:
+            next_after = _encode_message_cursor(messages[-1])
+        else:
+            next_after = after
         return {
             "conversationID": primary_convo_id,
             "friend_user_id": friend_user_id,
             "friend_name": friend_name,
             "messages": messages,
+            "next_before": _encode_message_cursor(messages[0]) if older else None,
+            "next_after": next_after,
         }
     finally:
         conn.close()
 
 
 if __name__ == "__main__":
+    if "--migrate" in sys.argv[1:]:
+        conn = get_conn()
+        try:
+            print("backfilled:", migrate_last_message_columns(conn))
+            print("Conversations.last_message_* ready")
+        finally:
+            conn.close()
+        sys.exit(0)
+
     test_user_id = 482193
     test_friend_id = 739205
 
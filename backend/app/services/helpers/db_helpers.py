@@ -1,12 +1,280 @@
+"""
+Database connections.
+
+get_conn() is the one way the app opens a connection. Inside the API a
+process-wide pool is created by the FastAPI lifespan (init_pool); get_conn()
+then checks out a pooled connection and conn.close() hands it back (rolled
+back if a transaction was left open). Outside the API (db/ scripts, refresh
+worker processes) there is no pool and get_conn() opens a new connection.
+
+Code that keeps a connection for a long time or relies on session state
+(advisory locks, the embedding worker) should use connect() instead, so it
+does not hold a pool slot.
+
+Configuration (env):
+    DB_NAME / DB_USER / DB_PASSWORD / DB_HOST / DB_PORT
+    DB_POOL_MIN               connections opened at startup (default: 1)
+    DB_POOL_MAX               max open connections per process (default: 10)
+    DB_POOL_TIMEOUT           seconds to wait for a free connection (default: 10)
+"""
+
+from __future__ import annotations
+
 import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
 import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
 
-def get_conn() -> psycopg2.extensions.connection:
-    """Create and return a new database connection."""
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def connect(connection_factory: Any = None) -> psycopg2.extensions.connection:
+    """Open a new (unpooled) database connection."""
     return psycopg2.connect(
         dbname=os.getenv("DB_NAME", "hacks13"),
         user=os.getenv("DB_USER", "jennifer"),
         password=os.getenv("DB_PASSWORD", ""),
         host=os.getenv("DB_HOST", "localhost"),
         port=os.getenv("DB_PORT", "5432"),
+        connection_factory=connection_factory,
     )
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose close() returns it to its pool."""
+
+    _pool: Optional["ConnectionPool"] = None
+    _checked_out = False
+
+    def close(self) -> None:
+        pool = self._pool
+        if pool is None:
+            super().close()
+        elif self._checked_out:
+            pool.putconn(self)
+        # already back in the pool: nothing to do
+
+    def _close_for_real(self) -> None:
+        self._pool = None
+        if not self.closed:
+            super().close()
+
+    def __del__(self) -> None:
+        # a connection leaked without close() frees its slot when collected
+        pool = self._pool
+        if pool is not None and self._checked_out:
+            pool._forget(self)
+
+
+class ConnectionPool:
+    """
+    Thread-safe bounded pool: getconn() blocks up to `timeout` seconds when
+    all maxconn connections are checked out (PoolError after that).
+
+    stats() reports size, in_use, utilisation and checkout wait times.
+    """
+
+    def __init__(self, minconn: int = 1, maxconn: int = 10, timeout: float = 10.0) -> None:
+        self.minconn = max(0, int(minconn))
+        self.maxconn = max(1, int(maxconn), self.minconn)
+        self.timeout = float(timeout)
+        self._cond = threading.Condition()
+        self._idle: List[PooledConnection] = []
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._stats: Dict[str, Any] = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "opened": 0,
+            "discarded": 0,
+            "peak_in_use": 0,
+        }
+        for _ in range(self.minconn):
+            self._idle.append(self._open())
+            self._size += 1
+
+    def _open(self) -> PooledConnection:
+        conn = connect(connection_factory=PooledConnection)
+        conn._pool = self
+        self._stats["opened"] += 1
+        return conn
+
+    def getconn(self) -> PooledConnection:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        conn: Optional[PooledConnection] = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if candidate.closed:
+                        self._size -= 1
+                        self._stats["discarded"] += 1
+                        continue
+                    conn = candidate
+                    break
+                if conn is not None or self._size < self.maxconn:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolError(f"no free connection after {self.timeout:g}s ({self.maxconn} in use)")
+                waited = True
+                self._cond.wait(remaining)
+
+            if conn is None:
+                # reserve the slot, open outside the lock
+                self._size += 1
+            self._in_use += 1
+            waited_for = time.monotonic() - started
+            self._stats["checkouts"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._in_use)
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_seconds_total"] += waited_for
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited_for)
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+        conn._checked_out = True
+        return conn
+
+    def putconn(self, conn: PooledConnection) -> None:
+        """Return a checked-out connection (this is what conn.close() calls)."""
+        conn._checked_out = False
+        discard = self._closed or bool(conn.closed)
+        if not discard:
+            try:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if not discard and conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+        if discard:
+            conn._close_for_real()
+
+    def _forget(self, conn: PooledConnection) -> None:
+        conn._checked_out = False
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        """Close idle connections now; checked-out ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn._close_for_real()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out = dict(self._stats)
+            out["size"] = self._size
+            out["in_use"] = self._in_use
+            out["idle"] = len(self._idle)
+        out["min"] = self.minconn
+        out["max"] = self.maxconn
+        out["utilisation"] = round(out["in_use"] / self.maxconn, 4)
+        out["avg_wait_ms"] = round(1000 * out["wait_seconds_total"] / out["checkouts"], 3) if out["checkouts"] else None
+        out["wait_seconds_total"] = round(out["wait_seconds_total"], 6)
+        out["wait_seconds_max"] = round(out["wait_seconds_max"], 6)
+        return out
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(
+    minconn: Optional[int] = None,
+    maxconn: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> ConnectionPool:
+    """Create the process-wide pool (sized from DB_POOL_* unless given); idempotent."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                minconn=minconn if minconn is not None else _env_int("DB_POOL_MIN", 1),
+                maxconn=maxconn if maxconn is not None else _env_int("DB_POOL_MAX", 10),
+                timeout=timeout if timeout is not None else _env_float("DB_POOL_TIMEOUT", 10.0),
+            )
+        return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.closeall()
+
+
+def get_pool() -> Optional[ConnectionPool]:
+    return _pool
+
+
+def pool_stats() -> Optional[Dict[str, Any]]:
+    """Stats of the process-wide pool, or None when running unpooled."""
+    pool = _pool
+    return pool.stats() if pool is not None else None
+
+
+def get_conn() -> psycopg2.extensions.connection:
+    """
+    Return a database connection; call close() when done.
+
+    Pooled when init_pool() has run in this process, a new connection otherwise.
+    """
+    pool = _pool
+    if pool is not None:
+        return pool.getconn()
+    return connect()
@@ -0,0 +1,160 @@
+"""
+Persistent embedding cache keyed by (model name, normalized text hash).
+
+Reseeding, post edits and templated mock posts keep producing the same texts;
+each one would otherwise cost a model forward pass. Vectors are stored as
+float32 blobs in a local SQLite file, so any producer (embedding_worker,
+db/mock_data/generate_posts.py) can look texts up before encoding.
+
+Configuration (env):
+    EMBED_CACHE               0 = don't use the cache (default: 1)
+    EMBED_CACHE_PATH          SQLite file (default: backend/.cache/embeddings.sqlite3)
+
+    cache = EmbeddingCache()
+    encode = cached_encoder(lambda texts: model.encode(texts), "all-MiniLM-L6-v2", cache)
+    vectors = encode(texts)          # only misses reach the model
+    cache.stats()                    # {"hits", "misses", "hit_rate", "entries"}
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".cache", "embeddings.sqlite3"
+)
+
+_WS_RE = re.compile(r"\s+")
+
+SQL_CREATE_CACHE = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    dim INTEGER NOT NULL,
+    vec BLOB NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """NFKC, trimmed, whitespace runs collapsed; case is kept (it can matter to the model)."""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WS_RE.sub(" ", text).strip()
+
+
+def text_hash(text: Optional[str]) -> bytes:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """SQLite-backed (model, text hash) -> float32 vector store; safe to share across threads."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = os.path.abspath(path or os.getenv("EMBED_CACHE_PATH") or DEFAULT_CACHE_PATH)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute(SQL_CREATE_CACHE)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, hashes: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Cached vectors for the given text hashes (missing hashes are absent)."""
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # stay under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vec FROM embeddings WHERE model = ? AND text_hash IN ({marks})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[bytes(h)] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: Sequence[tuple]) -> None:
+        """Store (text_hash, vector) pairs."""
+        rows = []
+        for h, vec in items:
+            arr = np.ascontiguousarray(vec, dtype=np.float32)
+            rows.append((model, h, int(arr.shape[0]), arr.tobytes()))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            hits, misses = self.hits, self.misses
+        looked_up = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / looked_up, 4) if looked_up else None,
+            "entries": int(entries),
+            "path": self.path,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def cached_encoder(
+    encode: Callable[[List[str]], Any],
+    model: str,
+    cache: EmbeddingCache,
+) -> Callable[[List[str]], np.ndarray]:
+    """
+    Wrap encode(texts) -> (n, d) so only texts not yet cached reach the model.
+
+    Identical texts within one call are encoded once. Returns an (n, d) float32
+    array in input order.
+    """
+
+    def encode_cached(texts: List[str]) -> np.ndarray:
+        hashes = [text_hash(t) for t in texts]
+        found = cache.get_many(model, hashes)
+
+        pending: Dict[bytes, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in pending:
+                pending[h] = t
+        # repeats within the call count as hits: they don't cost a forward pass
+        cache.record(hits=len(texts) - len(pending), misses=len(pending))
+
+        if pending:
+            fresh = np.asarray(encode(list(pending.values())), dtype=np.float32)
+            new_items = list(zip(pending.keys(), fresh))
+            cache.put_many(model, new_items)
+            found.update(new_items)
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack([found[h] for h in hashes])
+
+    return encode_cached
+
+
+def cache_enabled() -> bool:
+    return os.getenv("EMBED_CACHE", "1") != "0"
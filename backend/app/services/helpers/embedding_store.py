@@ -0,0 +1,345 @@
+"""
+Compact (quantized) copies of post / user embeddings in side tables.
+
+post_embedding / user_embedding are full-precision float vectors on the wide
+Posts / Users rows. post_embeddings_q / user_embeddings_q hold the same
+vectors as int8 codes with a per-vector scale (d + 4 bytes instead of 4d) or
+as float16 (2d bytes), keyed by id. The in-process ranking path
+(store_post_recs_emb without pgvector) reads these instead of the
+full-precision columns when EMB_QUANT is set, dequantizing on read.
+
+Configuration (env):
+    EMB_QUANT                 int8 | float16 | unset = off   (default: off)
+
+cd backend
+python -m app.services.helpers.embedding_store      # sync side tables + print recall vs full precision
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.services.helpers.db_helpers import get_conn
+
+QUANT_DTYPES = ("int8", "float16")
+
+SQL_CREATE_QUANTIZED = """
+CREATE TABLE IF NOT EXISTS post_embeddings_q (
+    postID INT PRIMARY KEY REFERENCES Posts(PostID) ON DELETE CASCADE,
+    dtype TEXT NOT NULL,
+    scale REAL NOT NULL,
+    codes BYTEA NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_embeddings_q (
+    userID INT PRIMARY KEY REFERENCES Users(userID) ON DELETE CASCADE,
+    dtype TEXT NOT NULL,
+    scale REAL NOT NULL,
+    codes BYTEA NOT NULL
+);
+"""
+
+SQL_QUANTIZED_EXIST = """
+SELECT to_regclass('public.post_embeddings_q') IS NOT NULL
+   AND to_regclass('public.user_embeddings_q') IS NOT NULL;
+"""
+
+# posts embedded since the last sync (or stored with another dtype)
+SQL_POSTS_TO_QUANTIZE = """
+SELECT p.postid, p.post_embedding::real[]::text
+FROM posts p
+LEFT JOIN post_embeddings_q q ON q.postid = p.postid
+WHERE p.post_embedding IS NOT NULL
+  AND (q.postid IS NULL OR q.dtype <> %(dtype)s {stale});
+"""
+
+SQL_USERS_TO_QUANTIZE = """
+SELECT userid, user_embedding::real[]::text
+FROM users
+WHERE user_embedding IS NOT NULL
+{user_filter};
+"""
+
+SQL_UPSERT_POSTS_Q = """
+INSERT INTO post_embeddings_q (postid, dtype, scale, codes)
+VALUES %s
+ON CONFLICT (postid) DO UPDATE
+SET dtype = EXCLUDED.dtype, scale = EXCLUDED.scale, codes = EXCLUDED.codes;
+"""
+
+SQL_UPSERT_USERS_Q = """
+INSERT INTO user_embeddings_q (userid, dtype, scale, codes)
+VALUES %s
+ON CONFLICT (userid) DO UPDATE
+SET dtype = EXCLUDED.dtype, scale = EXCLUDED.scale, codes = EXCLUDED.codes;
+"""
+
+# users whose embedding was cleared (no embedded posts left)
+SQL_DELETE_STALE_USERS_Q = """
+DELETE FROM user_embeddings_q q
+USING users u
+WHERE u.userid = q.userid
+  AND u.user_embedding IS NULL;
+"""
+
+SQL_POSTS_Q = """
+SELECT q.postid, p.user_id, q.dtype, q.scale, q.codes
+FROM post_embeddings_q q
+JOIN posts p ON p.postid = q.postid;
+"""
+
+SQL_USERS_Q = """
+SELECT userid, dtype, scale, codes
+FROM user_embeddings_q
+{user_filter};
+"""
+
+
+def quant_dtype() -> Optional[str]:
+    """Configured compact dtype ('int8' / 'float16'), or None when quantized storage is off."""
+    dtype = os.getenv("EMB_QUANT", "").strip().lower()
+    return dtype if dtype in QUANT_DTYPES else None
+
+
+def parse_pg_array(text: str) -> np.ndarray:
+    """'{0.1,0.2,...}' or '[0.1,0.2,...]' -> float32 vector."""
+    return np.fromstring(text[1:-1], dtype=np.float32, sep=",")
+
+
+def fetch_vectors(
+    conn: psycopg2.extensions.connection,
+    sql: str,
+    params: Dict[str, Any],
+) -> Tuple[List[tuple], np.ndarray]:
+    """Run sql -> (key columns..., embedding text) rows; returns (keys, float32 matrix)."""
+    keys: List[tuple] = []
+    vectors: List[np.ndarray] = []
+    with conn.cursor(name="emb_stream") as cur:
+        cur.itersize = 5000
+        cur.execute(sql, params)
+        for row in cur:
+            keys.append(row[:-1])
+            vectors.append(parse_pg_array(row[-1]))
+    conn.commit()
+    if not vectors:
+        return keys, np.empty((0, 0), dtype=np.float32)
+    return keys, np.vstack(vectors)
+
+
+# ----------------------------
+# (de)quantization
+# ----------------------------
+
+def quantize(vectors: np.ndarray, dtype: str = "int8") -> Tuple[List[bytes], np.ndarray]:
+    """
+    (n, d) float32 -> (per-row code bytes, (n,) float32 scales).
+
+    int8 is symmetric per row (scale = max|x| / 127); float16 stores scale 1.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        codes = vectors.astype(np.float16)
+        scales = np.ones(vectors.shape[0], dtype=np.float32)
+    elif dtype == "int8":
+        peak = np.abs(vectors).max(axis=1) if vectors.size else np.zeros(vectors.shape[0], dtype=np.float32)
+        peak[peak == 0] = 1.0
+        scales = (peak / 127.0).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    else:
+        raise ValueError(f"unsupported quantized dtype: {dtype}")
+    return [row.tobytes() for row in codes], scales
+
+
+def dequantize(codes: bytes, scale: float, dtype: str) -> np.ndarray:
+    """One stored row back to a float32 vector."""
+    if dtype == "float16":
+        return np.frombuffer(codes, dtype=np.float16).astype(np.float32)
+    return np.frombuffer(codes, dtype=np.int8).astype(np.float32) * np.float32(scale)
+
+
+def dequantize_rows(rows: List[tuple]) -> np.ndarray:
+    """[(dtype, scale, codes), ...] -> (n, d) float32 matrix."""
+    if not rows:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack([dequantize(bytes(codes), scale, dtype) for dtype, scale, codes in rows])
+
+
+# ----------------------------
+# side tables
+# ----------------------------
+
+def ensure_quantized_tables(conn: psycopg2.extensions.connection) -> None:
+    """Create the side tables if missing (catalog check first: no DDL once they exist)."""
+    with conn.cursor() as cur:
+        cur.execute(SQL_QUANTIZED_EXIST)
+        if not cur.fetchone()[0]:
+            cur.execute(SQL_CREATE_QUANTIZED)
+    conn.commit()
+
+
+def _upsert(conn, sql: str, keys: List[tuple], vectors: np.ndarray, dtype: str) -> int:
+    if not keys:
+        return 0
+    codes, scales = quantize(vectors, dtype)
+    rows = [
+        (int(k[0]), dtype, float(s), psycopg2.Binary(c))
+        for k, c, s in zip(keys, codes, scales)
+    ]
+    with conn.cursor() as cur:
+        execute_values(cur, sql, rows, page_size=1000)
+    conn.commit()
+    return len(rows)
+
+
+def sync_post_embeddings_q(
+    conn: psycopg2.extensions.connection,
+    dtype: Optional[str] = None,
+    only_missing: bool = True,
+) -> int:
+    """
+    Quantize post embeddings into post_embeddings_q.
+
+    Post embeddings are written once (embedding_worker / seed), so by default
+    only posts without a compact row (or stored with another dtype) are
+    processed; only_missing=False requantizes every post.
+    Returns the number of rows written.
+    """
+    dtype = dtype or quant_dtype() or "int8"
+    ensure_quantized_tables(conn)
+    stale = "" if only_missing else "OR TRUE"
+    keys, vectors = fetch_vectors(conn, SQL_POSTS_TO_QUANTIZE.format(stale=stale), {"dtype": dtype})
+    return _upsert(conn, SQL_UPSERT_POSTS_Q, keys, vectors, dtype)
+
+
+def sync_user_embeddings_q(
+    conn: psycopg2.extensions.connection,
+    dtype: Optional[str] = None,
+    user_ids: Optional[List[int]] = None,
+) -> int:
+    """
+    Quantize users' current user_embedding into user_embeddings_q.
+
+    Centroids move with every post write (posts_user_embedding_sync), so the
+    given users (default: all) are always rewritten.
+    Returns the number of rows written.
+    """
+    dtype = dtype or quant_dtype() or "int8"
+    ensure_quantized_tables(conn)
+    user_filter = "" if user_ids is None else "AND userid = ANY(%(user_ids)s)"
+    keys, vectors = fetch_vectors(
+        conn, SQL_USERS_TO_QUANTIZE.format(user_filter=user_filter), {"user_ids": user_ids}
+    )
+    written = _upsert(conn, SQL_UPSERT_USERS_Q, keys, vectors, dtype)
+    with conn.cursor() as cur:
+        cur.execute(SQL_DELETE_STALE_USERS_Q)
+    conn.commit()
+    return written
+
+
+def load_post_embeddings_q(conn: psycopg2.extensions.connection) -> Tuple[List[int], List[int], np.ndarray]:
+    """Dequantized post side table: (post ids, author ids, (n, d) float32)."""
+    with conn.cursor() as cur:
+        cur.execute(SQL_POSTS_Q)
+        rows = cur.fetchall()
+    conn.commit()
+    post_ids = [int(r[0]) for r in rows]
+    owners = [-1 if r[1] is None else int(r[1]) for r in rows]
+    return post_ids, owners, dequantize_rows([r[2:] for r in rows])
+
+
+def load_user_embeddings_q(
+    conn: psycopg2.extensions.connection,
+    user_ids: Optional[List[int]] = None,
+) -> Tuple[List[int], np.ndarray]:
+    """Dequantized user side table: (user ids, (n, d) float32)."""
+    user_filter = "" if user_ids is None else "WHERE userid = ANY(%(user_ids)s)"
+    with conn.cursor() as cur:
+        cur.execute(SQL_USERS_Q.format(user_filter=user_filter), {"user_ids": user_ids})
+        rows = cur.fetchall()
+    conn.commit()
+    return [int(r[0]) for r in rows], dequantize_rows([r[1:] for r in rows])
+
+
+def measure_quantized_recall(
+    conn: psycopg2.extensions.connection,
+    k: int = 50,
+    sample_users: int = 200,
+) -> Dict[str, Any]:
+    """
+    Recall of the top-k posts ranked from the side tables vs full precision.
+
+    Both rankings are exact (vector_search.topk_cosine); the difference is only
+    the stored representation. Returns {"dtype", "users", "k", "recall",
+    "recall_delta", "max_abs_error", "bytes_per_vector_full", "bytes_per_vector_q"}.
+    """
+    from app.services.helpers.vector_search import EmbeddingMatrix, topk_cosine
+
+    full_keys, full_posts = fetch_vectors(
+        conn, "SELECT postid, user_id, post_embedding::real[]::text FROM posts WHERE post_embedding IS NOT NULL;", {}
+    )
+    q_ids, q_owners, q_posts = load_post_embeddings_q(conn)
+    user_keys, user_vecs = fetch_vectors(
+        conn,
+        "SELECT userid, user_embedding::real[]::text FROM users WHERE user_embedding IS NOT NULL ORDER BY random() LIMIT %(n)s;",
+        {"n": sample_users},
+    )
+    if not full_keys or not q_ids or not user_keys:
+        return {"users": 0, "k": k, "recall": None}
+
+    uids = [int(u[0]) for u in user_keys]
+    q_uids, q_users = load_user_embeddings_q(conn, uids)
+    q_user_pos = {u: i for i, u in enumerate(q_uids)}
+    keep = [i for i, u in enumerate(uids) if u in q_user_pos]
+    uids = [uids[i] for i in keep]
+    user_vecs = user_vecs[keep]
+    q_users = q_users[[q_user_pos[u] for u in uids]]
+
+    full = EmbeddingMatrix.build(
+        ids=[r[0] for r in full_keys], vectors=full_posts, owners=[-1 if r[1] is None else r[1] for r in full_keys]
+    )
+    compact = EmbeddingMatrix.build(ids=q_ids, vectors=q_posts, owners=q_owners)
+    exact_ids, _ = topk_cosine(user_vecs, full, k, query_ids=uids)
+    approx_ids, _ = topk_cosine(q_users, compact, k, query_ids=uids)
+
+    recalls = []
+    for e, a in zip(exact_ids, approx_ids):
+        e = set(int(x) for x in e if x >= 0)
+        if e:
+            recalls.append(len(e & set(int(x) for x in a if x >= 0)) / len(e))
+
+    pos = {pid: i for i, pid in enumerate(q_ids)}
+    rows = [i for i, r in enumerate(full_keys) if int(r[0]) in pos]
+    max_err = float(np.abs(full_posts[rows] - q_posts[[pos[int(full_keys[i][0])] for i in rows]]).max()) if rows else None
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT dtype, octet_length(codes) FROM post_embeddings_q LIMIT 1;")
+        dtype, code_bytes = cur.fetchone()
+    conn.commit()
+
+    recall = sum(recalls) / len(recalls) if recalls else None
+    return {
+        "dtype": dtype,
+        "users": len(recalls),
+        "k": k,
+        "recall": None if recall is None else round(recall, 4),
+        "recall_delta": None if recall is None else round(recall - 1.0, 4),
+        "max_abs_error": max_err,
+        "bytes_per_vector_full": 4 * full_posts.shape[1],
+        "bytes_per_vector_q": int(code_bytes) + 4,
+    }
+
+
+if __name__ == "__main__":
+    conn = get_conn()
+    try:
+        dtype = quant_dtype() or "int8"
+        print("posts:", sync_post_embeddings_q(conn, dtype, only_missing=False))
+        print("users:", sync_user_embeddings_q(conn, dtype))
+        print(measure_quantized_recall(conn))
+    finally:
+        conn.close()
@@ -0,0 +1,349 @@
+"""
+Background embedding worker for posts without a post_embedding.
+
+Posts created through the API are inserted with post_embedding NULL. The
+worker keeps one SentenceTransformer loaded (same model as
+db/mock_data/generate_posts.py), claims un-embedded posts in micro-batches
+(session advisory locks taken with pg_try_advisory_lock, so several workers /
+processes skip each other's posts), commits the claim, encodes each batch on
+CPU without holding row locks and writes the vectors back with one
+UPDATE ... FROM (VALUES ...) that only fills posts still NULL, so edits to a
+post during the encode never wait on the worker. Writing post_embedding also fires the
+posts_user_embedding_sync trigger, so the author's user_embedding follows.
+Texts already in the embedding cache (see embedding_cache) skip the model.
+
+Configuration (env):
+    EMBED_WORKER              1 = start with the API (default: 1)
+    EMBED_MODEL               sentence-transformers model (default: all-MiniLM-L6-v2)
+    EMBED_BATCH_SIZE          posts per claimed batch / encode call (default: 64)
+    EMBED_THREADS             torch CPU threads, 0 = torch default (default: 0)
+    EMBED_POLL_SECONDS        idle wait between queue checks (default: 2.0)
+    EMBED_MAX_BACKOFF         longest wait after repeated errors, seconds (default: 300)
+    EMBED_CACHE / EMBED_CACHE_PATH   see embedding_cache
+
+cd backend
+python -m app.services.helpers.embedding_worker     # embed the whole backlog once and print stats
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.services.helpers.db_helpers import connect
+from app.services.helpers.embedding_cache import EmbeddingCache, cache_enabled, cached_encoder
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# advisory lock namespace (first key) for claimed posts
+CLAIM_LOCK_CLASS = 7201
+
+# LIMIT in the subquery so only returned candidates get locked
+SQL_CLAIM_UNEMBEDDED = """
+SELECT c.postid, c.content
+FROM (
+    SELECT postid, COALESCE(post_content, '') AS content
+    FROM posts
+    WHERE post_embedding IS NULL
+    ORDER BY postid
+    LIMIT %(n)s
+) c
+WHERE pg_try_advisory_lock(%(cls)s, c.postid);
+"""
+
+SQL_RELEASE_CLAIMED = """
+SELECT pg_advisory_unlock(%s, postid) FROM unnest(%s::int[]) AS postid;
+"""
+
+SQL_STORE_EMBEDDINGS = """
+UPDATE posts p
+SET post_embedding = v.emb
+FROM (VALUES %s) AS v(postid, emb)
+WHERE p.postid = v.postid
+  AND p.post_embedding IS NULL;
+"""
+
+SQL_QUEUE_DEPTH = """
+SELECT COUNT(*) FROM posts WHERE post_embedding IS NULL;
+"""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def load_encoder(
+    model_name: str = EMBED_MODEL,
+    threads: int = 0,
+    cache: Optional[EmbeddingCache] = None,
+) -> Callable[[List[str]], Any]:
+    """
+    Load the sentence-transformers model once; returns encode(texts) -> (n, d) array.
+
+    Vectors are L2-normalized, matching generate_posts.py. With a cache, only
+    texts not cached for this model are encoded.
+    """
+    if threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(texts: List[str]):
+        return model.encode(
+            texts,
+            batch_size=max(len(texts), 1),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+    if cache is not None:
+        return cached_encoder(encode, model_name, cache)
+    return encode
+
+
+class EmbeddingWorker:
+    """
+    Embeds un-embedded posts in micro-batches on a daemon thread.
+
+        worker = EmbeddingWorker()
+        worker.start()      # loads the model on the worker thread
+        worker.notify()     # new post inserted: wake up now instead of at the next poll
+        worker.stats()      # throughput / queue depth
+        worker.stop()
+
+    encoder is any callable texts -> (n, d) array; defaults to load_encoder().
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        threads: Optional[int] = None,
+        poll_seconds: Optional[float] = None,
+        encoder: Optional[Callable[[List[str]], Any]] = None,
+        connect: Callable[[], psycopg2.extensions.connection] = connect,
+    ) -> None:
+        self.batch_size = max(1, batch_size or _env_int("EMBED_BATCH_SIZE", 64))
+        self.threads = threads if threads is not None else _env_int("EMBED_THREADS", 0)
+        self.poll_seconds = poll_seconds if poll_seconds is not None else _env_float("EMBED_POLL_SECONDS", 2.0)
+        self.max_backoff = max(self.poll_seconds, _env_float("EMBED_MAX_BACKOFF", 300.0))
+        self._encoder = encoder
+        self._connect = connect
+        self.cache: Optional[EmbeddingCache] = None
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "running": False,
+            "embedded": 0,
+            "batches": 0,
+            "encode_seconds": 0.0,
+            "write_seconds": 0.0,
+            "last_batch_size": 0,
+            "queue_depth": None,
+            "errors": 0,
+            "last_error": None,
+        }
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self) -> None:
+        """Wake the worker (call after inserting a post)."""
+        self._wake.set()
+
+    # ---- work ----
+
+    def _encode(self, texts: List[str]):
+        if self._encoder is None:
+            self.cache = EmbeddingCache() if cache_enabled() else None
+            self._encoder = load_encoder(threads=self.threads, cache=self.cache)
+        return self._encoder(texts)
+
+    def _claim_and_embed(self, conn: psycopg2.extensions.connection) -> int:
+        """
+        Embed one micro-batch; returns posts claimed (0 = queue empty).
+
+        The claim is committed before encoding: only the advisory locks stay
+        held, and they are released once the vectors are written (or on error).
+        """
+        with conn.cursor() as cur:
+            cur.execute(SQL_CLAIM_UNEMBEDDED, {"n": self.batch_size, "cls": CLAIM_LOCK_CLASS})
+            claimed: Sequence[Tuple[int, str]] = cur.fetchall()
+        conn.commit()
+        if not claimed:
+            return 0
+
+        try:
+            started = time.perf_counter()
+            vectors = self._encode([text for _, text in claimed])
+            encoded = time.perf_counter()
+
+            rows = [(int(pid), [float(x) for x in vec]) for (pid, _), vec in zip(claimed, vectors)]
+            with conn.cursor() as cur:
+                execute_values(cur, SQL_STORE_EMBEDDINGS, rows, template="(%s, %s::real[])", page_size=len(rows))
+            conn.commit()
+            written = time.perf_counter()
+        finally:
+            self._release(conn, [int(pid) for pid, _ in claimed])
+
+        with self._lock:
+            self._stats["embedded"] += len(rows)
+            self._stats["batches"] += 1
+            self._stats["encode_seconds"] += encoded - started
+            self._stats["write_seconds"] += written - encoded
+            self._stats["last_batch_size"] = len(rows)
+        return len(rows)
+
+    def _release(self, conn: psycopg2.extensions.connection, post_ids: List[int]) -> None:
+        if conn.closed:
+            return  # session locks went with the connection
+        try:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute(SQL_RELEASE_CLAIMED, (CLAIM_LOCK_CLASS, post_ids))
+            conn.commit()
+        except psycopg2.Error:
+            conn.close()
+
+    def _queue_depth(self, conn: psycopg2.extensions.connection) -> int:
+        with conn.cursor() as cur:
+            cur.execute(SQL_QUEUE_DEPTH)
+            depth = int(cur.fetchone()[0])
+        conn.commit()
+        with self._lock:
+            self._stats["queue_depth"] = depth
+        return depth
+
+    def run_once(self, conn: Optional[psycopg2.extensions.connection] = None) -> int:
+        """Drain the current backlog on the calling thread; returns posts embedded."""
+        own = conn is None
+        conn = conn or self._connect()
+        total = 0
+        try:
+            while not self._stopping.is_set():
+                n = self._claim_and_embed(conn)
+                total += n
+                if n < self.batch_size:
+                    break
+            self._queue_depth(conn)
+        finally:
+            if own:
+                conn.close()
+        return total
+
+    def _run(self) -> None:
+        with self._lock:
+            self._stats["running"] = True
+        conn = None
+        failures = 0
+        try:
+            while not self._stopping.is_set():
+                wait = self.poll_seconds
+                try:
+                    if conn is None or conn.closed:
+                        conn = self._connect()
+                    self.run_once(conn)
+                    failures = 0
+                except ImportError as e:
+                    # model dependencies missing: nothing this worker can do
+                    self._record_error(e)
+                    print(f"Embedding worker disabled: {e}")
+                    return
+                except Exception as e:
+                    self._record_error(e)
+                    failures += 1
+                    # back off exponentially while the error persists
+                    wait = min(self.poll_seconds * 2 ** min(failures - 1, 16), self.max_backoff)
+                    print(f"Embedding worker error ({failures} in a row, retrying in {wait:.1f}s): {e}")
+                    if conn is not None and not conn.closed:
+                        try:
+                            conn.rollback()
+                        except psycopg2.Error:
+                            conn.close()
+
+                if failures:
+                    # new posts don't cut a backoff short; stop() still does
+                    self._stopping.wait(wait)
+                else:
+                    self._wake.wait(wait)
+                self._wake.clear()
+        finally:
+            if conn is not None and not conn.closed:
+                conn.close()
+            with self._lock:
+                self._stats["running"] = False
+
+    def _record_error(self, e: Exception) -> None:
+        with self._lock:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = f"{type(e).__name__}: {e}"
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, posts/sec over encode+write time, last measured queue depth and cache hit rate."""
+        with self._lock:
+            out = dict(self._stats)
+        busy = out["encode_seconds"] + out["write_seconds"]
+        out["posts_per_sec"] = round(out["embedded"] / busy, 2) if busy > 0 else None
+        out["encode_seconds"] = round(out["encode_seconds"], 3)
+        out["write_seconds"] = round(out["write_seconds"], 3)
+        out["batch_size"] = self.batch_size
+        out["cache"] = self.cache.stats() if self.cache is not None else None
+        return out
+
+
+_worker: Optional[EmbeddingWorker] = None
+
+
+def get_embedding_worker() -> EmbeddingWorker:
+    """Process-wide worker (created on first use, not started)."""
+    global _worker
+    if _worker is None:
+        _worker = EmbeddingWorker()
+    return _worker
+
+
+def notify_new_post() -> None:
+    """Wake the process-wide worker if it is running (no-op otherwise)."""
+    if _worker is not None:
+        _worker.notify()
+
+
+if __name__ == "__main__":
+    worker = EmbeddingWorker()
+    print(worker.run_once())
+    print(worker.stats())
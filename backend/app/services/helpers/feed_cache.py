@@ -0,0 +1,197 @@
+"""
+In-process cache of hydrated feed results (recommend_posts / recommend_people).
+
+Stored recs only change on refresh, yet every feed load re-reads the recs
+arrays and re-runs the hydration join. Results are cached per
+(user_id, kind, limit) in an LRU bounded by size and TTL.
+
+Each entry also records which users it shows ("refs"), so it can be
+dropped when one of them changes:
+  - recs writers (write_recs, store_post_recs_emb) invalidate the owners of
+    the rows they rewrite
+  - profile updates invalidate that user's own feeds and every cached card /
+    post that shows them as person or author
+  - new posts invalidate cached fallback (recent posts) feeds
+
+The cache is per process: with several API workers, or for writes made from
+another process (refresh worker pool, db/ scripts), entries age out after
+FEED_CACHE_TTL seconds.
+
+Configuration (env):
+    FEED_CACHE_SIZE           max cached feeds, 0 = disabled (default: 2048)
+    FEED_CACHE_TTL            seconds an entry stays valid (default: 60)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+# refs tag for feeds built from the "recent posts" fallback
+FALLBACK_POSTS = ("fallback", "posts")
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class TTLCache:
+    """
+    Thread-safe LRU with per-entry expiry and tag-based invalidation.
+
+    get() refreshes recency; set() evicts least-recently-used entries beyond
+    maxsize. invalidate(tags) drops every entry whose key owner or refs match.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 60.0) -> None:
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        # key -> (expires_at, value, tags)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, frozenset]]" = OrderedDict()
+        # tag -> keys holding it
+        self._by_tag: Dict[Hashable, Set[Hashable]] = {}
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+        # bumped on every invalidation; a load that raced one is not stored
+        self.generation = 0
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[Hashable] = (),
+        generation: Optional[int] = None,
+    ) -> None:
+        """Store value; skipped if generation is given and an invalidation happened since."""
+        if self.maxsize <= 0:
+            return
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, tags: Iterable[Hashable]) -> int:
+        """Drop every entry tagged with any of tags; returns how many were dropped."""
+        with self._lock:
+            keys: Set[Hashable] = set()
+            for tag in tags:
+                keys |= self._by_tag.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            self._stats["invalidations"] += len(keys)
+            self.generation += 1
+            return len(keys)
+
+    def clear(self) -> int:
+        with self._lock:
+            dropped = len(self._data)
+            self._stats["invalidations"] += dropped
+            self._data.clear()
+            self._by_tag.clear()
+            self.generation += 1
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["size"] = len(self._data)
+        looked_up = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / looked_up, 4) if looked_up else None
+        out["maxsize"] = self.maxsize
+        out["ttl"] = self.ttl
+        return out
+
+
+feed_cache = TTLCache(
+    maxsize=int(_env_number("FEED_CACHE_SIZE", 2048)),
+    ttl=_env_number("FEED_CACHE_TTL", 60.0),
+)
+
+
+def owner_tag(user_id: int) -> tuple:
+    """Tag on every feed built for user_id."""
+    return ("owner", int(user_id))
+
+
+def user_tag(user_id: int) -> tuple:
+    """Tag on every feed that shows user_id (as a person card or post author)."""
+    return ("user", int(user_id))
+
+
+def cached_feed(
+    user_id: int,
+    kind: str,
+    limit: int,
+    load: Callable[[], Tuple[list, Iterable[Hashable]]],
+) -> list:
+    """
+    Return the cached feed for (user_id, kind, limit), or build and cache it.
+
+    load() returns (result, refs): refs are the extra tags (user_tag,
+    FALLBACK_POSTS) whose invalidation should drop this entry.
+    """
+    key = (int(user_id), kind, int(limit))
+    hit = feed_cache.get(key)
+    if hit is not None:
+        return list(hit)
+    generation = feed_cache.generation
+    result, refs = load()
+    feed_cache.set(key, result, tags=(owner_tag(user_id), *refs), generation=generation)
+    return list(result)
+
+
+def invalidate_feeds(user_ids: Optional[Iterable[int]] = None) -> int:
+    """Drop the cached feeds of user_ids (None = everyone), e.g. after their recs were rewritten."""
+    if user_ids is None:
+        return feed_cache.clear()
+    return feed_cache.invalidate(owner_tag(u) for u in user_ids)
+
+
+def invalidate_user(user_id: int) -> int:
+    """Profile changed: drop the user's own feeds and every cached feed that displays them."""
+    return feed_cache.invalidate((owner_tag(user_id), user_tag(user_id)))
+
+
+def invalidate_new_post() -> int:
+    """A post was created: feeds built from the recent-posts fallback are stale."""
+    return feed_cache.invalidate((FALLBACK_POSTS,))
@@ -0,0 +1,112 @@
+"""
+Read-time feed shuffle.
+
+"Shuffle my feed" used to mean recomputing every user's recs with
+refresh=True just to store them in random order. Instead, users.recs_seed
+holds a per-user seed next to the (ranked) recs, and recommend_posts /
+recommend_people / recommend_mixed_feed apply a deterministic permutation
+of the stored candidates at read time: O(k) per request, and reshuffling a
+feed is one UPDATE.
+
+recs_seed NULL = ranked order.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import List, Optional, Sequence, TypeVar
+
+import psycopg2
+
+from app.services.helpers.feed_cache import invalidate_feeds
+
+T = TypeVar("T")
+
+SQL_ADD_SEED_COLUMN = """
+ALTER TABLE users ADD COLUMN IF NOT EXISTS recs_seed INT;
+"""
+
+SQL_SEED_COLUMN_EXISTS = """
+SELECT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'users' AND column_name = 'recs_seed'
+);
+"""
+
+SQL_SET_SEED = """
+UPDATE users SET recs_seed = %s WHERE userid = %s;
+"""
+
+# one new seed per user in scope (refresh=True without recomputing recs)
+SQL_RESEED_USERS = """
+UPDATE users
+SET recs_seed = floor(random() * 2147483647)::int
+{user_filter};
+"""
+
+SQL_GET_SEED = """
+SELECT recs_seed FROM users WHERE userid = %s;
+"""
+
+
+def ensure_recs_seed_column(conn: psycopg2.extensions.connection) -> None:
+    """
+    Add users.recs_seed on databases created before it existed.
+
+    Catalog check first: the ALTER (ACCESS EXCLUSIVE on users, queued behind
+    any running refresh) only happens when the column is missing.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_SEED_COLUMN_EXISTS)
+        if not cur.fetchone()[0]:
+            cur.execute(SQL_ADD_SEED_COLUMN)
+    conn.commit()
+
+
+def shuffled(items: Sequence[T], seed: Optional[int]) -> List[T]:
+    """Deterministic permutation of items for seed (a copy; ranked order if seed is None)."""
+    out = list(items)
+    if seed is not None:
+        random.Random(seed).shuffle(out)
+    return out
+
+
+def set_shuffle_seed(
+    conn: psycopg2.extensions.connection,
+    user_id: int,
+    seed: Optional[int] = None,
+) -> Optional[int]:
+    """Store a new feed seed for user_id (random if not given); returns it."""
+    if seed is None:
+        seed = random.randrange(1, 2**31 - 1)
+    with conn.cursor() as cur:
+        cur.execute(SQL_SET_SEED, (seed, user_id))
+    conn.commit()
+    invalidate_feeds([user_id])
+    return seed
+
+
+def clear_shuffle_seed(conn: psycopg2.extensions.connection, user_id: int) -> None:
+    """Back to ranked order for user_id."""
+    with conn.cursor() as cur:
+        cur.execute(SQL_SET_SEED, (None, user_id))
+    conn.commit()
+    invalidate_feeds([user_id])
+
+
+def reseed_users(conn: psycopg2.extensions.connection, user_ids: Optional[List[int]] = None) -> int:
+    """New random seed for user_ids (default: everyone); returns rows updated."""
+    user_filter = "" if user_ids is None else "WHERE userid = ANY(%(user_ids)s)"
+    with conn.cursor() as cur:
+        cur.execute(SQL_RESEED_USERS.format(user_filter=user_filter), {"user_ids": user_ids})
+        updated = cur.rowcount
+    conn.commit()
+    invalidate_feeds(user_ids)
+    return updated
+
+
+def get_shuffle_seed(conn: psycopg2.extensions.connection, user_id: int) -> Optional[int]:
+    with conn.cursor() as cur:
+        cur.execute(SQL_GET_SEED, (user_id,))
+        row = cur.fetchone()
+    return row[0] if row else None
@@ -0,0 +1,113 @@
+"""
+Post tag sets for goals_match scoring.
+
+Tags are derived once per post (on create / seed) and stored in posts.tags
+(TEXT[]), so scoring doesn't re-tokenize the same content for every viewer.
+
+Backfill existing posts:
+
+cd backend
+python -m app.services.helpers.post_tags
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.services.helpers.db_helpers import get_conn
+
+MAX_POST_TAGS = 12
+
+_WORD_RE = re.compile(r"[a-zA-Z']{2,}")
+
+SQL_ADD_TAGS_COLUMN = """
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS tags TEXT[];
+"""
+
+SQL_TAGS_COLUMN_EXISTS = """
+SELECT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'posts' AND column_name = 'tags'
+);
+"""
+
+SQL_POSTS_FOR_BACKFILL = """
+SELECT postid, COALESCE(post_content, '') AS post_content
+FROM posts
+{where};
+"""
+
+SQL_UPDATE_TAGS = """
+UPDATE posts p
+SET tags = v.tags
+FROM (VALUES %s) AS v(postid, tags)
+WHERE p.postid = v.postid;
+"""
+
+
+def derive_post_tags(content: str | None, max_tags: int = MAX_POST_TAGS) -> List[str]:
+    """
+    Lowercase word tokens of the post content, unique, in first-seen order.
+
+    Stands in for post.tags from the demo algorithm (the schema has no
+    user-entered tags): goals_match = jaccard(user.goals, post.tags).
+    """
+    text = (content or "").lower()
+    tokens = _WORD_RE.findall(text)
+    # keep unique, stable order
+    seen = set()
+    tags: List[str] = []
+    for t in tokens:
+        if t in seen:
+            continue
+        seen.add(t)
+        tags.append(t)
+        if len(tags) >= max_tags:
+            break
+    return tags
+
+
+def ensure_post_tags_column(conn: psycopg2.extensions.connection) -> None:
+    """
+    Add posts.tags on databases created before it existed (create_post writes it).
+
+    Catalog check first, so the ALTER (and its lock) only happens once.
+    Existing posts keep NULL tags until backfill_post_tags runs.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_TAGS_COLUMN_EXISTS)
+        if not cur.fetchone()[0]:
+            cur.execute(SQL_ADD_TAGS_COLUMN)
+    conn.commit()
+
+
+def backfill_post_tags(conn: psycopg2.extensions.connection, only_missing: bool = True) -> int:
+    """
+    Compute posts.tags for existing posts (adds the column if missing).
+
+    only_missing=False recomputes every post, e.g. after changing derive_post_tags.
+
+    Returns the number of posts updated.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_ADD_TAGS_COLUMN)
+        cur.execute(SQL_POSTS_FOR_BACKFILL.format(where="WHERE tags IS NULL" if only_missing else ""))
+        rows = [(int(pid), derive_post_tags(content)) for pid, content in cur.fetchall()]
+
+        if rows:
+            execute_values(cur, SQL_UPDATE_TAGS, rows, template="(%s, %s::text[])", page_size=1000)
+    conn.commit()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    conn = get_conn()
+    try:
+        print(backfill_post_tags(conn))
+        print("Stored post tags into posts.tags")
+    finally:
+        conn.close()
@@ -0,0 +1,60 @@
+"""
+In-process cache of authenticated principals (token -> user id / profile).
+
+get_current_user used to decode the JWT, then look the user up by email and
+fetch the full profile row on every authenticated request. Tokens now carry
+the user id ("uid" claim), and the resolved principal is cached per
+(kind, user id) -- or per (kind, email) for tokens issued before the claim
+existed -- in a TTLCache (see feed_cache).
+
+Entries are tagged with the user id; profile writes call
+invalidate_principal(user_id). Writes made from another process age out
+after PRINCIPAL_CACHE_TTL seconds.
+
+Configuration (env):
+    PRINCIPAL_CACHE_SIZE      max cached principals, 0 = disabled (default: 4096)
+    PRINCIPAL_CACHE_TTL       seconds an entry stays valid (default: 60)
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, Tuple
+
+from app.services.helpers.feed_cache import TTLCache, _env_number
+
+principal_cache = TTLCache(
+    maxsize=int(_env_number("PRINCIPAL_CACHE_SIZE", 4096)),
+    ttl=_env_number("PRINCIPAL_CACHE_TTL", 60.0),
+)
+
+
+def principal_tag(user_id: int) -> tuple:
+    return ("principal", int(user_id))
+
+
+def cached_principal(
+    kind: str,
+    user_id: Optional[int],
+    email: Optional[str],
+    load: Callable[[], Tuple[Any, Optional[int]]],
+) -> Any:
+    """
+    Return the cached principal of `kind` for the token's user, or load and cache it.
+
+    Keyed by user_id when the token carries one, by email otherwise. load()
+    returns (value, user_id); a None value (unknown user) is not cached.
+    """
+    key = (kind, "uid", int(user_id)) if user_id is not None else (kind, "email", email)
+    hit = principal_cache.get(key)
+    if hit is not None:
+        return hit
+    generation = principal_cache.generation
+    value, loaded_id = load()
+    if value is not None and loaded_id is not None:
+        principal_cache.set(key, value, tags=(principal_tag(loaded_id),), generation=generation)
+    return value
+
+
+def invalidate_principal(user_id: int) -> int:
+    """The user's row changed: drop every cached principal for them."""
+    return principal_cache.invalidate((principal_tag(user_id),))
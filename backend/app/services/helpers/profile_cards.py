@@ -0,0 +1,125 @@
+"""
+Shared cache of user "cards" (the public profile fields shown next to posts,
+people recs and conversations).
+
+Feeds, RSVP / post listings and conversations all need the same few user
+columns for whoever they show. get_cards() is a multi-get over an in-process
+TTLCache (see feed_cache): hits come from memory, all misses are fetched
+with one WHERE userid = ANY(...) query. profile_setup writers call
+invalidate_cards(); writes from other processes age out after
+PROFILE_CARD_CACHE_TTL seconds.
+
+Cards are shared between requests: treat them as read-only.
+
+Configuration (env):
+    PROFILE_CARD_CACHE_SIZE   max cached cards, 0 = disabled (default: 8192)
+    PROFILE_CARD_CACHE_TTL    seconds a card stays valid (default: 300)
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from app.services.helpers.db_helpers import get_conn
+from app.services.helpers.feed_cache import TTLCache, _env_number
+
+# display_name: name, else the email's local part (never the email itself)
+SQL_GET_CARDS = """
+SELECT
+    userid,
+    name,
+    COALESCE(name, SPLIT_PART(email, '@', 1)) AS display_name,
+    pronouns,
+    currentCity AS "currentCity",
+    travelingTo AS "travelingTo",
+    age,
+    bio,
+    languages,
+    lookingFor AS "lookingFor",
+    culturalIdentity AS "culturalIdentity",
+    isStudent AS "isStudent",
+    university
+FROM users
+WHERE userid = ANY(%s);
+"""
+
+card_cache = TTLCache(
+    maxsize=int(_env_number("PROFILE_CARD_CACHE_SIZE", 8192)),
+    ttl=_env_number("PROFILE_CARD_CACHE_TTL", 300.0),
+)
+
+
+def card_tag(user_id: int) -> tuple:
+    return ("card", int(user_id))
+
+
+def get_cards(
+    user_ids: Iterable[int],
+    conn: Optional[psycopg2.extensions.connection] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Cards for user_ids as {userid: card}; unknown users are left out.
+
+    Misses are loaded with a single query on conn (or a pooled connection
+    if none is given).
+    """
+    ids = {int(u) for u in user_ids if u is not None}
+    cards: Dict[int, Dict[str, Any]] = {}
+    missing: List[int] = []
+    for uid in ids:
+        card = card_cache.get(uid)
+        if card is None:
+            missing.append(uid)
+        else:
+            cards[uid] = card
+    if not missing:
+        return cards
+
+    generation = card_cache.generation
+    own = conn is None
+    conn = conn or get_conn()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(SQL_GET_CARDS, (missing,))
+            rows = cur.fetchall()
+        if own:
+            conn.commit()
+    finally:
+        if own:
+            conn.close()
+
+    for row in rows:
+        card = dict(row)
+        card["languages"] = card["languages"] or []
+        card["lookingFor"] = card["lookingFor"] or []
+        card["culturalIdentity"] = card["culturalIdentity"] or []
+        uid = int(card["userid"])
+        cards[uid] = card
+        card_cache.set(uid, card, tags=(card_tag(uid),), generation=generation)
+    return cards
+
+
+def person_card(card: Dict[str, Any]) -> Dict[str, Any]:
+    """Card as returned by the people recs endpoints."""
+    return {
+        "userid": card["userid"],
+        "name": card["name"] or f"User {card['userid']}",
+        "pronouns": card["pronouns"],
+        "currentCity": card["currentCity"],
+        "travelingTo": card["travelingTo"],
+        "age": card["age"],
+        "bio": card["bio"],
+        "languages": card["languages"],
+        "lookingFor": card["lookingFor"],
+        "culturalIdentity": card["culturalIdentity"],
+        "isStudent": card["isStudent"],
+        "university": card["university"],
+    }
+
+
+def invalidate_cards(user_ids: Iterable[int]) -> int:
+    """Those users' profiles changed: drop their cached cards."""
+    return card_cache.invalidate(card_tag(u) for u in user_ids)
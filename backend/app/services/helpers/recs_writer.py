@@ -0,0 +1,119 @@
+"""
+Bulk writer for the users.*_recs columns.
+
+Every recs producer computes one JSON payload per user; instead of an UPDATE
+(and often a commit) per user, payloads are streamed into a temp staging
+table with COPY and applied with a single UPDATE ... FROM. Rows whose stored
+recs are already identical are skipped, so unchanged users cause no new
+tuple versions (WAL / bloat) on the wide users table.
+
+Committed writes also drop the affected users' cached feeds (feed_cache).
+
+    from app.services.helpers.recs_writer import write_recs
+    write_recs(conn, "people_recs", [(userid, payload), ...])
+"""
+
+from __future__ import annotations
+
+import io
+import json
+from typing import Any, Iterable, Tuple
+
+import psycopg2
+
+from app.services.helpers.feed_cache import invalidate_feeds
+
+# recs columns that may be bulk-written (column names can't be parameterized)
+RECS_COLUMNS = ("people_recs", "event_recs_dis", "event_recs_emb")
+
+SQL_RECS_COLUMN_TYPE = """
+SELECT udt_name
+FROM information_schema.columns
+WHERE table_name = 'users'
+  AND column_name = %s
+  AND table_schema = ANY(current_schemas(false));
+"""
+
+
+def _copy_escape(text: str) -> str:
+    """Escape a value for COPY ... FROM STDIN text format."""
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _recs_column_expr(conn: psycopg2.extensions.connection, column: str) -> str:
+    """
+    SQL expression converting the staged JSON array (s.recs) to the column's type.
+
+    event_recs_emb is JSONB[]; event_recs_dis is JSONB in schema.sql but JSONB[]
+    in schema_novector.sql / setup_db.py, so the type is looked up rather than assumed.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_RECS_COLUMN_TYPE, (column,))
+        row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"users.{column} does not exist")
+    if row[0] == "_jsonb":
+        return "ARRAY(SELECT jsonb_array_elements(s.recs))"
+    return "s.recs"
+
+
+def write_recs(
+    conn: psycopg2.extensions.connection,
+    column: str,
+    recs: Iterable[Tuple[int, Any]],
+    commit: bool = True,
+) -> int:
+    """
+    Store (userid, payload) pairs into users.<column> in one set-based statement.
+
+    payload is any JSON-serializable list (e.g. [{"userid": 1, ...}] or [12, 34]).
+    The staging table is dropped at commit; with commit=False the caller owns
+    the transaction (e.g. to apply changelog bookkeeping atomically) and
+    should call feed_cache.invalidate_feeds for the users after committing.
+
+    Returns the number of users staged.
+    """
+    if column not in RECS_COLUMNS:
+        raise ValueError(f"unsupported recs column: {column}")
+
+    buf = io.StringIO()
+    user_ids = []
+    for uid, payload in recs:
+        buf.write(f"{int(uid)}\t{_copy_escape(json.dumps(payload))}\n")
+        user_ids.append(int(uid))
+    staged = len(user_ids)
+
+    if staged == 0:
+        if commit:
+            conn.commit()
+        return 0
+
+    buf.seek(0)
+    stage = f"_stage_{column}"
+    value_expr = _recs_column_expr(conn, column)
+
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {stage};")
+        cur.execute(f"CREATE TEMP TABLE {stage} (userid INT, recs JSONB) ON COMMIT DROP;")
+        cur.copy_expert(f"COPY {stage} (userid, recs) FROM STDIN", buf)
+        # temp tables have no stats until analyzed; lets the planner hash-join
+        cur.execute(f"ANALYZE {stage};")
+        cur.execute(
+            f"""
+            UPDATE users u
+            SET {column} = {value_expr}
+            FROM {stage} s
+            WHERE u.userid = s.userid
+              AND u.{column} IS DISTINCT FROM {value_expr};
+            """
+        )
+
+    if commit:
+        conn.commit()
+        invalidate_feeds(user_ids)
+    return staged
@@ -5,7 +5,9 @@ all functions are pure and unit-testable
 designed to be deterministic with no randomness
 """
 
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from typing import Iterable
 
 
 # configurable set of high-signal languages
@@ -132,18 +134,21 @@ def mutual_friends_score(
     return min(mutual_count, 5) / 5
 
 
-def recency_score(dt: datetime, window_days: int = 14) -> float:
+def recency_score(dt: datetime, window_days: int = 14, now: datetime | None = None) -> float:
     """
     compute recency score with linear decay
     
     1.0 if dt is within 1 day of now
     decays linearly to 0.0 at window_days
+
+    pass `now` to score a batch against one fixed time
     """
     if dt is None:
         return 0.0
 
     # Ensure both are timezone-aware
-    now = datetime.now(timezone.utc)
+    if now is None:
+        now = datetime.now(timezone.utc)
 
     # If dt somehow came in naive, assume UTC
     if dt.tzinfo is None:
@@ -200,3 +205,202 @@ def post_location_match(
     # simple heuristic: check if they share a city name
     # this is intentionally vague to match coarse locations
     return 0.5
+
+
+# ---------------------------------------------------------------------------
+# batch people scoring (one viewer vs a columnar block of candidates)
+# ---------------------------------------------------------------------------
+
+# same weights as the per-candidate people score
+PEOPLE_SCORE_WEIGHTS: dict[str, float] = {
+    "location": 0.30,
+    "goals": 0.25,
+    "culture": 0.20,
+    "language": 0.15,
+    "mutual_friends": 0.05,
+}
+
+
+class CategoryVocab:
+    """
+    interns category values (goals, languages, cultures) to bit positions
+
+    a list of categories becomes an int bitset, so set overlap is a bitwise
+    and plus a popcount instead of building python sets for every pair
+    """
+
+    def __init__(self) -> None:
+        self._bits: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+    def bit(self, value) -> int:
+        """return the bit for value, interning it if unseen"""
+        pos = self._bits.get(value)
+        if pos is None:
+            pos = len(self._bits)
+            self._bits[value] = pos
+        return 1 << pos
+
+    def encode(self, values) -> int:
+        """encode a list of categories as a bitset (duplicates collapse like set())"""
+        mask = 0
+        for v in values or ():
+            mask |= self.bit(v)
+        return mask
+
+    def lookup(self, values) -> int:
+        """bitset of already-interned values; unseen values are ignored"""
+        mask = 0
+        for v in values or ():
+            pos = self._bits.get(v)
+            if pos is not None:
+                mask |= 1 << pos
+        return mask
+
+
+@dataclass(frozen=True)
+class PersonFeatures:
+    """interned scoring features for one user"""
+
+    user_id: int
+    current_city: str | None
+    destination_city: str | None
+    goals: int
+    languages: int
+    cultures: int
+    friends: frozenset
+
+
+def encode_person(
+    vocab: CategoryVocab,
+    user_id: int,
+    current_city: str | None,
+    destination_city: str | None,
+    goals: list[str],
+    languages: list[str],
+    cultures: list[str],
+    friends,
+) -> PersonFeatures:
+    """encode one user's raw attributes into PersonFeatures"""
+    return PersonFeatures(
+        user_id=user_id,
+        current_city=current_city,
+        destination_city=destination_city,
+        goals=vocab.encode(goals),
+        languages=vocab.encode(languages),
+        cultures=vocab.encode(cultures),
+        friends=frozenset(friends or ()),
+    )
+
+
+@dataclass
+class PeopleBlock:
+    """columnar block of candidates; column i describes candidate ids[i]"""
+
+    ids: list[int] = field(default_factory=list)
+    current_city: list = field(default_factory=list)
+    destination_city: list = field(default_factory=list)
+    goals: list[int] = field(default_factory=list)
+    languages: list[int] = field(default_factory=list)
+    cultures: list[int] = field(default_factory=list)
+    friends: list[frozenset] = field(default_factory=list)
+
+    @classmethod
+    def from_features(cls, people: Iterable[PersonFeatures]) -> "PeopleBlock":
+        block = cls()
+        for p in people:
+            block.ids.append(p.user_id)
+            block.current_city.append(p.current_city)
+            block.destination_city.append(p.destination_city)
+            block.goals.append(p.goals)
+            block.languages.append(p.languages)
+            block.cultures.append(p.cultures)
+            block.friends.append(p.friends)
+        return block
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def score_people_block(
+    viewer: PersonFeatures,
+    block: PeopleBlock,
+    vocab: CategoryVocab,
+) -> list[float]:
+    """
+    score one viewer against every candidate in block
+
+    same result as combining location_score, jaccard(goals), culture_score,
+    language_score and mutual_friends_score per candidate with
+    PEOPLE_SCORE_WEIGHTS, but the viewer side is encoded once and each
+    candidate costs a few bitwise ops
+
+    returns scores aligned with block.ids
+    """
+    w_loc = PEOPLE_SCORE_WEIGHTS["location"]
+    w_goals = PEOPLE_SCORE_WEIGHTS["goals"]
+    w_culture = PEOPLE_SCORE_WEIGHTS["culture"]
+    w_lang = PEOPLE_SCORE_WEIGHTS["language"]
+    w_mutual = PEOPLE_SCORE_WEIGHTS["mutual_friends"]
+
+    v_city = viewer.current_city
+    v_dest = viewer.destination_city
+    v_goals = viewer.goals
+    v_langs = viewer.languages
+    v_lang_count = v_langs.bit_count()
+    v_cultures = viewer.cultures
+    v_friends = viewer.friends
+    high_signal = vocab.lookup(HIGH_SIGNAL_LANGS)
+
+    scores: list[float] = []
+    for c_city, c_dest, c_goals, c_langs, c_cultures, c_friends in zip(
+        block.current_city,
+        block.destination_city,
+        block.goals,
+        block.languages,
+        block.cultures,
+        block.friends,
+    ):
+        # location (mirrors location_score)
+        if v_city == c_city:
+            loc = 1.0
+        elif (
+            (v_dest and c_dest and v_dest == c_dest)
+            or (v_dest and v_dest == c_city)
+            or (c_dest and c_dest == v_city)
+        ):
+            loc = 0.8
+        else:
+            loc = 0.0
+
+        # goals (jaccard)
+        union = (v_goals | c_goals).bit_count()
+        goals = (v_goals & c_goals).bit_count() / union if union else 0.0
+
+        # culture (any overlap)
+        culture = 1.0 if v_cultures & c_cultures else 0.0
+
+        # language (overlap coefficient + high-signal boost)
+        shared_langs = v_langs & c_langs
+        c_lang_count = c_langs.bit_count()
+        if v_lang_count and c_lang_count:
+            lang = shared_langs.bit_count() / min(v_lang_count, c_lang_count)
+        else:
+            lang = 0.0
+        if shared_langs & high_signal:
+            lang = min(1.0, lang + 0.25)
+
+        # mutual friends
+        mutual = min(len(v_friends & c_friends), 5) / 5
+
+        scores.append(float(
+            w_loc * loc +
+            w_goals * goals +
+            w_culture * culture +
+            w_lang * lang +
+            w_mutual * mutual
+        ))
+
+    return scores
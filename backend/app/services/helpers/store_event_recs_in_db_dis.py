@@ -13,6 +13,7 @@ from __future__ import annotations
 import os
 import re
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Set, Tuple
 
 import psycopg2
@@ -23,25 +24,21 @@ from app.services.helpers.similarity_helpers import (
     recency_score,
     post_location_match,
 )
+from app.services.helpers.db_helpers import get_conn
+from app.services.helpers.post_tags import derive_post_tags
+from app.services.helpers.recs_writer import write_recs
 
 # diversity constraints
 MAX_POSTS_SAME_AUTHOR = 3
 
+# weight of recency_score in score_post (applied at read time for stored recs)
+POST_RECENCY_WEIGHT = 0.10
+
 
 # -----------------------------
 # DB helpers
 # -----------------------------
 
-def get_conn() -> psycopg2.extensions.connection:
-    return psycopg2.connect(
-        dbname=os.getenv("DB_NAME", "hacks13"),
-        user=os.getenv("DB_USER", "jennifer"),
-        password=os.getenv("DB_PASSWORD", ""),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "5432"),
-    )
-
-
 def _table_exists(conn: psycopg2.extensions.connection, table_name: str) -> bool:
     sql = """
     SELECT EXISTS (
@@ -56,6 +53,26 @@ def _table_exists(conn: psycopg2.extensions.connection, table_name: str) -> bool
         return bool(cur.fetchone()[0])
 
 
+def _column_exists(conn: psycopg2.extensions.connection, table_name: str, column_name: str) -> bool:
+    sql = """
+    SELECT EXISTS (
+      SELECT 1
+      FROM information_schema.columns
+      WHERE table_schema = 'public'
+        AND table_name = %s
+        AND column_name = %s
+    );
+    """
+    with conn.cursor() as cur:
+        cur.execute(sql, (table_name.lower(), column_name.lower()))
+        return bool(cur.fetchone()[0])
+
+
+def _post_tags_column(conn: psycopg2.extensions.connection) -> str:
+    """posts.tags if the column exists (see post_tags.backfill_post_tags), else NULL."""
+    return "p.tags" if _column_exists(conn, "posts", "tags") else "NULL::text[]"
+
+
 # -----------------------------
 # Data access (viewer + graph)
 # -----------------------------
@@ -72,10 +89,11 @@ FROM users
 WHERE userid = %s;
 """
 
+# containment form so idx_users_blockedusers (GIN) serves it instead of a seq scan
 SQL_BLOCKED_BY = """
 SELECT userid
 FROM users
-WHERE %s = ANY(COALESCE(BlockedUsers, ARRAY[]::int[]));
+WHERE BlockedUsers @> ARRAY[%s]::int[];
 """
 
 SQL_GET_FRIENDS_FOR_USERS = """
@@ -152,33 +170,6 @@ WHERE userid = ANY(%s);
 """
 
 
-# -----------------------------
-# Lightweight tag extraction (for goals_match)
-# -----------------------------
-
-_WORD_RE = re.compile(r"[a-zA-Z']{2,}")
-
-def _derive_post_tags_from_content(content: str, max_tags: int = 12) -> List[str]:
-    """
-    Your demo algorithm had post.tags; your DB schema doesn't.
-    To preserve the 'goals_match = jaccard(user.goals, post.tags)' logic,
-    we derive simple tags from the content text.
-    """
-    text = (content or "").lower()
-    tokens = _WORD_RE.findall(text)
-    # keep unique, stable order
-    seen = set()
-    tags: List[str] = []
-    for t in tokens:
-        if t in seen:
-            continue
-        seen.add(t)
-        tags.append(t)
-        if len(tags) >= max_tags:
-            break
-    return tags
-
-
 # -----------------------------
 # Core algorithm data structures
 # -----------------------------
@@ -276,7 +267,7 @@ def generate_post_candidates(
 # scoring (DB-backed)
 # ---------------------------------------------------------------------------
 
-def score_post(
+def score_post_base(
     viewer: Dict[str, Any],
     post_row: Dict[str, Any],
     author_row: Dict[str, Any],
@@ -284,15 +275,10 @@ def score_post(
     friend_rsvp_count: int,
 ) -> float:
     """
-    SAME scoring logic as your state version, but using DB fields:
+    Time-independent part of score_post (everything except recency).
 
-    score =
-      0.35 * friend_author +
-      0.20 * rsvpd_by_friends_norm +
-      0.20 * location_match +
-      0.15 * goals_match +
-      0.10 * post_recency +
-      0.05 if author.verified_student
+    Stored per (viewer, post) in event_recs_dis so recency can be applied at
+    read time (apply_post_recency) instead of going stale in the stored order.
     """
     post_author_id = str(post_row["author_id"])
 
@@ -310,13 +296,13 @@ def score_post(
     )
 
     # goals match: jaccard(user.goals, post.tags)
+    # tags are precomputed into posts.tags; derive only for rows not backfilled yet
     viewer_goals = viewer.get("goals") or []
-    post_tags = _derive_post_tags_from_content(post_row.get("content") or "")
+    post_tags = post_row.get("tags")
+    if post_tags is None:
+        post_tags = derive_post_tags(post_row.get("post_content"))
     goals_match = jaccard(viewer_goals, post_tags)
 
-    # recency
-    recent = recency_score(post_row.get("time_posted"))
-
     # verified bonus (map to isStudent)
     verified_bonus = 0.05 if bool(author_row.get("verified_student")) else 0.0
 
@@ -325,13 +311,35 @@ def score_post(
         0.20 * rsvpd_norm +
         0.20 * loc_match +
         0.15 * goals_match +
-        0.10 * recent +
         verified_bonus
     )
 
     return float(score)
 
 
+def score_post(
+    viewer: Dict[str, Any],
+    post_row: Dict[str, Any],
+    author_row: Dict[str, Any],
+    user_friends: Set[str],
+    friend_rsvp_count: int,
+    now: datetime | None = None,
+) -> float:
+    """
+    SAME scoring logic as your state version, but using DB fields:
+
+    score =
+      0.35 * friend_author +
+      0.20 * rsvpd_by_friends_norm +
+      0.20 * location_match +
+      0.15 * goals_match +
+      0.10 * post_recency +
+      0.05 if author.verified_student
+    """
+    base = score_post_base(viewer, post_row, author_row, user_friends, friend_rsvp_count)
+    return base + POST_RECENCY_WEIGHT * recency_score(post_row.get("time_posted"), now=now)
+
+
 # ---------------------------------------------------------------------------
 # reranking for fairness and diversity (same logic)
 # ---------------------------------------------------------------------------
@@ -419,13 +427,14 @@ def recommend_posts(
     candidate_ints = [int(pid) for pid in candidate_ids]
 
     # ---- fetch post rows in bulk ----
-    sql_get_posts_bulk = """
+    sql_get_posts_bulk = f"""
     SELECT
       p.postid,
       p.user_id AS author_id,
       COALESCE(p.location_str, '') AS coarse_location,
       p.time_posted,
-      COALESCE(p.post_content, '') AS post_content
+      COALESCE(p.post_content, '') AS post_content,
+      {_post_tags_column(conn)} AS tags
     FROM posts p
     WHERE p.postid = ANY(%s);
     """
@@ -456,8 +465,39 @@ def recommend_posts(
             for r in cur.fetchall():
                 friend_rsvp_count_by_post[str(r["post_id"])] = int(r["friend_rsvp_count"])
 
+    recs = _rank_post_candidates(
+        user_id=user_id,
+        viewer=viewer,
+        user_friends=user_friends,
+        candidate_ids=candidate_ids,
+        posts_by_id=posts_by_id,
+        authors_by_id=authors_by_id,
+        friend_rsvp_count_by_post=friend_rsvp_count_by_post,
+        limit=limit,
+    )
+    return [rec["postid"] for rec in recs]
+
+
+def _rank_post_candidates(
+    user_id: str,
+    viewer: Dict[str, Any],
+    user_friends: Set[str],
+    candidate_ids: List[str],
+    posts_by_id: Dict[str, Dict[str, Any]],
+    authors_by_id: Dict[str, Dict[str, Any]],
+    friend_rsvp_count_by_post: Dict[str, int],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    Score + rerank candidate posts (shared by the per-user and batch paths).
+
+    Returns rec items {"postid", "score_base", "time_posted"} in ranked order.
+    """
+    now = datetime.now(timezone.utc)
+
     # ---- 2) score ----
     scored: List[ScoredCandidate] = []
+    base_by_id: Dict[str, float] = {}
     for pid_str in candidate_ids:
         post = posts_by_id.get(pid_str)
         if not post:
@@ -466,16 +506,17 @@ def recommend_posts(
         if not author:
             continue
 
-        score = score_post(
+        base = score_post_base(
             viewer=viewer,
             post_row=post,
             author_row=author,
             user_friends=user_friends,
             friend_rsvp_count=friend_rsvp_count_by_post.get(pid_str, 0),
         )
+        base_by_id[pid_str] = base
         scored.append(ScoredCandidate(
             id=pid_str,
-            score=score,
+            score=base + POST_RECENCY_WEIGHT * recency_score(post.get("time_posted"), now=now),
             author_id=str(post["author_id"]),
         ))
 
@@ -486,7 +527,7 @@ def recommend_posts(
     reranked = rerank_posts(str(user_id), scored, limit)
 
     # ---- 4) build response ----
-    results: List[int] = []
+    results: List[Dict[str, Any]] = []
     for sc in reranked:
         post = posts_by_id.get(sc.id)
         if not post:
@@ -495,54 +536,311 @@ def recommend_posts(
         if not author:
             continue
 
-        results.append(post["postid"])
+        time_posted = post.get("time_posted")
+        results.append({
+            "postid": post["postid"],
+            "score_base": base_by_id[sc.id],
+            "time_posted": time_posted.isoformat() if time_posted else None,
+        })
 
     return results
 
 
+# ---------------------------------------------------------------------------
+# batch mode: load posts / authors / friend graph once for all viewers
+# ---------------------------------------------------------------------------
+
+SQL_GET_ALL_VIEWERS = """
+SELECT
+  userid,
+  COALESCE(currentCity, '') AS currentcity,
+  travelingTo AS travelingto,
+  COALESCE(lookingFor, ARRAY[]::text[]) AS goals,
+  COALESCE(Friends, ARRAY[]::int[]) AS friends,
+  COALESCE(BlockedUsers, ARRAY[]::int[]) AS blockedusers
+FROM users;
+"""
+
+SQL_GET_ALL_POSTS = """
+SELECT
+  p.postid,
+  p.user_id AS author_id,
+  COALESCE(p.location_str, '') AS coarse_location,
+  p.time_posted,
+  COALESCE(p.post_content, '') AS post_content,
+  {tags} AS tags
+FROM posts p;
+"""
+
+SQL_GET_ALL_AUTHORS = """
+SELECT
+  userid,
+  COALESCE(name, '') AS name,
+  COALESCE(isStudent, false) AS verified_student
+FROM users;
+"""
 
-def store_post_recs_dis(conn: psycopg2.extensions.connection, limit: int = 30, refresh: bool = False) -> int:
+SQL_GET_ALL_RSVPS = """
+SELECT post_id, user_id
+FROM postrsvps;
+"""
+
+
+@dataclass
+class PostIndex:
+    """
+    In-memory view of users / posts / postrsvps for batch candidate generation.
+
+    viewers / friends / blocked_by / posts_by_author / rsvps_by_user / rsvpers_by_post
+    are keyed by int id; posts_by_id / authors_by_id are keyed by str id, like
+    the per-user path. rsvps_by_user / rsvpers_by_post are None when the
+    postrsvps table doesn't exist.
     """
-    Compute + STORE event_recs_dis for ALL users.
+    viewers: Dict[int, Dict[str, Any]]
+    blocked_by: Dict[int, Set[int]]
+    posts_by_id: Dict[str, Dict[str, Any]]
+    posts_by_author: Dict[int, List[Dict[str, Any]]]
+    authors_by_id: Dict[str, Dict[str, Any]]
+    rsvps_by_user: Optional[Dict[int, Set[int]]]
+    rsvpers_by_post: Optional[Dict[int, List[int]]]
+
+
+def load_post_index(conn: psycopg2.extensions.connection) -> PostIndex:
+    """Load everything recommend_posts needs for every viewer in four scans."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(SQL_GET_ALL_VIEWERS)
+        viewer_rows = cur.fetchall()
+        cur.execute(SQL_GET_ALL_POSTS.format(tags=_post_tags_column(conn)))
+        post_rows = cur.fetchall()
+        cur.execute(SQL_GET_ALL_AUTHORS)
+        author_rows = cur.fetchall()
+
+    index = PostIndex(
+        viewers={}, blocked_by={}, posts_by_id={}, posts_by_author={},
+        authors_by_id={str(r["userid"]): r for r in author_rows},
+        rsvps_by_user=None, rsvpers_by_post=None,
+    )
 
-    Assumes users.event_recs_dis is type JSONB (not JSONB[]), and we store
-    a JSON array of ints like: [123, 456, 789].
+    for v in viewer_rows:
+        uid = int(v["userid"])
+        index.viewers[uid] = v
+        for blocked_id in v.get("blockedusers") or []:
+            if blocked_id is not None:
+                index.blocked_by.setdefault(int(blocked_id), set()).add(uid)
+
+    for r in post_rows:
+        index.posts_by_id[str(r["postid"])] = r
+        if r["author_id"] is not None:
+            index.posts_by_author.setdefault(int(r["author_id"]), []).append(r)
+
+    if _table_exists(conn, "postrsvps"):
+        index.rsvps_by_user = {}
+        index.rsvpers_by_post = {}
+        with conn.cursor() as cur:
+            cur.execute(SQL_GET_ALL_RSVPS)
+            for post_id, user_id in cur.fetchall():
+                if post_id is None or user_id is None:
+                    continue
+                index.rsvps_by_user.setdefault(int(user_id), set()).add(int(post_id))
+                # list, not set: COUNT(*) in SQL counts duplicate rsvp rows
+                index.rsvpers_by_post.setdefault(int(post_id), []).append(int(user_id))
+
+    return index
+
+
+def _like(value: str, pattern: str) -> bool:
+    """SQL LIKE (default escape) on Python strings."""
+    regex = []
+    chars = iter(pattern)
+    for ch in chars:
+        if ch == "\\":
+            regex.append(re.escape(next(chars, "\\")))
+        elif ch == "%":
+            regex.append(".*")
+        elif ch == "_":
+            regex.append(".")
+        else:
+            regex.append(re.escape(ch))
+    return re.fullmatch("".join(regex), value, flags=re.DOTALL) is not None
+
+
+def generate_post_candidates_from_index(
+    index: PostIndex,
+    user_id: str,
+    viewer: Dict[str, Any],
+    user_friends: Set[str],
+    excluded_authors: Set[str],
+) -> List[str]:
+    """In-memory equivalent of generate_post_candidates (same three sources and exclusions)."""
+    candidates: Set[int] = set()
 
-    If refresh=True, the recommendations are randomly shuffled before storing.
+    friends_int = [int(x) for x in user_friends] if user_friends else []
+    excluded_int = {int(x) for x in excluded_authors} if excluded_authors else set()
+
+    viewer_city = (viewer.get("currentcity") or "").strip().lower()
+    viewer_dest = (viewer.get("travelingto") or None)
+    viewer_dest_lower = viewer_dest.strip().lower() if isinstance(viewer_dest, str) and viewer_dest.strip() else None
+
+    def allowed(post: Dict[str, Any]) -> bool:
+        return post["author_id"] is not None and int(post["author_id"]) not in excluded_int
+
+    # ---- (1) posts by friends ----
+    for f in friends_int:
+        if f in excluded_int:
+            continue
+        for post in index.posts_by_author.get(f, ()):
+            candidates.add(int(post["postid"]))
+
+    # ---- (2) posts rsvpd by friends (optional table) ----
+    if friends_int and index.rsvps_by_user is not None:
+        for f in friends_int:
+            for pid in index.rsvps_by_user.get(f, ()):
+                post = index.posts_by_id.get(str(pid))
+                if post is not None and allowed(post):
+                    candidates.add(pid)
+
+    # ---- (3) posts by friends-of-friends in same city/destination ----
+    fof_ids: Set[int] = set()
+    for f in friends_int:
+        friend_row = index.viewers.get(f)
+        if friend_row is not None:
+            fof_ids.update(friend_row.get("friends") or [])
+
+    fof_ids.discard(int(user_id))
+    fof_ids.difference_update(set(friends_int))
+
+    if fof_ids:
+        city_like = f"%{viewer_city}%" if viewer_city else "%"
+        dest_like = f"%{viewer_dest_lower}%" if viewer_dest_lower else None
+
+        for a in fof_ids:
+            if a is None or a in excluded_int:
+                continue
+            for post in index.posts_by_author.get(a, ()):
+                location = post["coarse_location"].lower()
+                if _like(location, city_like) or (dest_like is not None and _like(location, dest_like)):
+                    candidates.add(int(post["postid"]))
+
+    return [str(pid) for pid in candidates]
+
+
+def recommend_posts_from_index(index: PostIndex, user_id: str, limit: int = 30) -> List[Dict[str, Any]]:
+    """
+    Batch equivalent of recommend_posts: same candidates, scores and reranking, no queries.
+
+    Returns the rec items stored in event_recs_dis: {"postid", "score_base", "time_posted"}.
+    """
+    viewer = index.viewers.get(int(user_id))
+    if not viewer:
+        return []
+
+    user_friends: Set[str] = {str(x) for x in (viewer.get("friends") or [])}
+    user_blocked: Set[str] = {str(x) for x in (viewer.get("blockedusers") or [])}
+    blocked_by: Set[str] = {str(x) for x in index.blocked_by.get(int(user_id), ())}
+
+    excluded_authors: Set[str] = user_blocked | blocked_by
+
+    candidate_ids = generate_post_candidates_from_index(
+        index=index,
+        user_id=str(user_id),
+        viewer=viewer,
+        user_friends=user_friends,
+        excluded_authors=excluded_authors,
+    )
+    if not candidate_ids:
+        return []
+
+    friend_rsvp_count_by_post: Dict[str, int] = {}
+    if user_friends and index.rsvpers_by_post is not None:
+        friends_int = {int(x) for x in user_friends}
+        for pid_str in candidate_ids:
+            count = sum(1 for u in index.rsvpers_by_post.get(int(pid_str), ()) if u in friends_int)
+            if count:
+                friend_rsvp_count_by_post[pid_str] = count
+
+    return _rank_post_candidates(
+        user_id=user_id,
+        viewer=viewer,
+        user_friends=user_friends,
+        candidate_ids=candidate_ids,
+        posts_by_id=index.posts_by_id,
+        authors_by_id=index.authors_by_id,
+        friend_rsvp_count_by_post=friend_rsvp_count_by_post,
+        limit=limit,
+    )
+
+
+def apply_post_recency(recs: List[Any], now: datetime | None = None) -> List[Any]:
+    """
+    Read-time ranking for stored event_recs_dis items.
+
+    Re-sorts items by score_base + POST_RECENCY_WEIGHT * recency_score(time_posted, now),
+    so stored recs don't drift as posts age between batch runs. O(k log k) in the
+    stored list size. Lists without score_base on every item (legacy int lists,
+    refresh=True shuffles) are returned in stored order.
+    """
+    if not recs or not all(isinstance(r, dict) and "score_base" in r for r in recs):
+        return list(recs or [])
+
+    if now is None:
+        now = datetime.now(timezone.utc)
+
+    def read_score(rec: Dict[str, Any]) -> float:
+        time_posted = rec.get("time_posted")
+        dt = datetime.fromisoformat(time_posted) if time_posted else None
+        return float(rec["score_base"]) + POST_RECENCY_WEIGHT * recency_score(dt, now=now)
+
+    # stable sort: ties keep the batch order
+    return sorted(recs, key=lambda r: -read_score(r))
+
+
+def store_post_recs_dis(
+    conn: psycopg2.extensions.connection,
+    limit: int = 30,
+    refresh: bool = False,
+    user_ids: Optional[List[int]] = None,
+) -> int:
+    """
+    Compute + STORE event_recs_dis for ALL users (or only `user_ids`, e.g. one refresh shard).
+
+    Stores a JSON array of rec items like:
+      [{"postid": 123, "score_base": 0.55, "time_posted": "2026-01-31T12:00:00+00:00"}, ...]
+    score_base leaves out recency, which recommender_service applies at read time
+    (apply_post_recency). users.event_recs_dis is JSONB in schema.sql and JSONB[]
+    in the no-vector schema; write_recs handles both.
+
+    If refresh=True, the recommendations are randomly shuffled before storing
+    (stored without score_base so the read side keeps the shuffled order).
+
+    Posts, authors, rsvps and the friend graph are loaded once (load_post_index)
+    and every viewer is ranked in memory; output matches recommend_posts.
 
     Returns the number of users updated.
     """
-    from psycopg2.extras import Json
     import random
 
-    updated = 0
-    # fetch all user ids
-    with conn.cursor() as cur:
-        cur.execute("SELECT userid FROM users;")
-        all_user_ids = [int(r[0]) for r in cur.fetchall()]
+    if user_ids is None:
+        # fetch all user ids
+        with conn.cursor() as cur:
+            cur.execute("SELECT userid FROM users;")
+            all_user_ids = [int(r[0]) for r in cur.fetchall()]
+    else:
+        all_user_ids = [int(u) for u in user_ids]
 
-    # compute + store for each user
+    index = load_post_index(conn)
+
+    # compute for each user, then store in one batch
+    staged = []
     for uid in all_user_ids:
-        post_ids = recommend_posts(conn, uid, limit)  # List[int]
+        recs = recommend_posts_from_index(index, uid, limit)
 
         if refresh:
-            random.shuffle(post_ids)
-
-        post_ids = post_ids[:limit]
+            random.shuffle(recs)
+            recs = [{"postid": r["postid"], "time_posted": r["time_posted"]} for r in recs]
 
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE users
-                SET event_recs_dis = %s::jsonb
-                WHERE userid = %s;
-                """,
-                (Json(post_ids), uid),
-            )
-        updated += 1
+        staged.append((uid, recs[:limit]))
 
-    conn.commit()
-    return updated
+    return write_recs(conn, "event_recs_dis", staged)
 
 if __name__ == "__main__":
     limit_env = os.getenv("EVENT_RECS_LIMIT", "30")
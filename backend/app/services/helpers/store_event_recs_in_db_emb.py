@@ -13,35 +13,107 @@ from typing import List, Dict, Any, Optional
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from app.services.helpers.feed_cache import invalidate_feeds
+from app.services.helpers.user_embeddings import backfill_missing_user_embeddings
+from app.services.helpers.vector_index import check_post_recall, set_search_params
+
 import os
 
-def store_user_avg_embedding(conn: psycopg2.extensions.connection) -> None:
-    """Compute user_embedding from avg post_embedding only if missing."""
-    sql_calculate_user_embeddings = """
+SQL_EMBEDDING_COLUMN_TYPE = """
+SELECT udt_name
+FROM information_schema.columns
+WHERE table_name = 'posts'
+  AND column_name = 'post_embedding'
+  AND table_schema = ANY(current_schemas(false));
+"""
+
+
+def embedding_engine(conn: psycopg2.extensions.connection) -> Optional[str]:
+    """
+    How post embeddings are stored: 'pgvector' (vector columns), 'numpy'
+    (REAL[] columns from schema_novector.sql, searched in-process), or None.
+    EMB_ENGINE=numpy forces the in-process engine on a pgvector database.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_EMBEDDING_COLUMN_TYPE)
+        row = cur.fetchone()
+    if row is None:
+        return None
+    if row[0] == "vector" and os.getenv("EMB_ENGINE", "").lower() != "numpy":
+        return "pgvector"
+    return "numpy"
+
+
+def store_user_avg_embedding(conn: psycopg2.extensions.connection, user_ids: Optional[List[int]] = None) -> None:
+    """
+    Compute user_embedding from avg post_embedding only if missing.
+
+    If user_ids is given, only those users are considered (e.g. one refresh shard).
+
+    Where the posts_user_embedding_sync trigger is installed (see
+    user_embeddings), centroids are already kept current on every post write;
+    only users whose posts predate the trigger are rebuilt here.
+    """
+    engine = embedding_engine(conn)
+    if engine is None:
+        return
+    if backfill_missing_user_embeddings(conn, user_ids=user_ids) is not None:
+        return
+    if engine == "numpy":
+        _store_user_avg_embedding_numpy(conn, user_ids)
+        return
+
+    user_filter = "" if user_ids is None else "AND p.user_id = ANY(%(user_ids)s)"
+
+    sql_calculate_user_embeddings = f"""
         UPDATE users u
         SET user_embedding = avg_embeddings.avg_vec
         FROM (
             SELECT p.user_id, avg(p.post_embedding) AS avg_vec
             FROM posts p
             WHERE p.post_embedding IS NOT NULL
+            {user_filter}
             GROUP BY p.user_id
         ) avg_embeddings
         WHERE u.userid = avg_embeddings.user_id
         AND u.user_embedding IS NULL;
     """
     with conn.cursor() as cur:
-        cur.execute(sql_calculate_user_embeddings)
+        cur.execute(sql_calculate_user_embeddings, {"user_ids": user_ids})
     conn.commit()
 
 
-def store_post_recs_emb(conn: psycopg2.extensions.connection, refresh: bool = False) -> None:
+def store_post_recs_emb(
+    conn: psycopg2.extensions.connection,
+    refresh: bool = False,
+    user_ids: Optional[List[int]] = None,
+    recall_sample: int = 0,
+) -> Optional[Dict[str, Any]]:
     """
     Store top 50 candidate posts ranked by embedding distance into users.event_recs_emb.
 
     If refresh=True, keep the same 50 candidates but store them in random order
     (Postgres-side shuffle) instead of distance order.
+
+    If user_ids is given, only those users' recs are recomputed (e.g. one refresh shard).
+
+    The per-user nearest-posts lateral is served by the ANN index on
+    posts.post_embedding (created at setup, see vector_index; this only sets
+    the search parameters). With recall_sample > 0, returns
+    check_post_recall() for that many users.
+
+    Without pgvector (REAL[] embedding columns) the same top 50 are computed
+    exactly in-process with vector_search (see _store_post_recs_emb_numpy).
     """
+    engine = embedding_engine(conn)
+    if engine is None:
+        return None
+    if engine == "numpy":
+        _store_post_recs_emb_numpy(conn, refresh=refresh, user_ids=user_ids)
+        return None
+
     order_clause = "ORDER BY random()" if refresh else "ORDER BY p.distance"
+    user_filter = "" if user_ids is None else "WHERE u2.userid = ANY(%(user_ids)s)"
 
     sql_events_cg = f"""
         UPDATE users u
@@ -68,16 +140,158 @@ def store_post_recs_emb(conn: psycopg2.extensions.connection, refresh: bool = Fa
                 ORDER BY (p.post_embedding <=> u2.user_embedding)
                 LIMIT 50
             ) p ON TRUE
+            {user_filter}
             GROUP BY u2.userid
         ) recs
         WHERE u.userid = recs.userid;
     """
 
+    set_search_params(conn, k=50)
+
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql_events_cg)
+        cur.execute(sql_events_cg, {"user_ids": user_ids})
+    conn.commit()
+    invalidate_feeds(user_ids)
+
+    if recall_sample > 0:
+        return check_post_recall(conn, sample_users=recall_sample, k=50)
+    return None
+
+
+
+# ----------------------------
+# In-process engine (no pgvector): REAL[] columns + vector_search
+# ----------------------------
+
+# stream rows; embeddings come back as text and are parsed in C by numpy
+SQL_POST_EMBEDDINGS = """
+SELECT postid, user_id, post_embedding::text
+FROM posts
+WHERE post_embedding IS NOT NULL;
+"""
+
+SQL_USER_EMBEDDINGS = """
+SELECT userid, user_embedding::text
+FROM users
+WHERE user_embedding IS NOT NULL
+{user_filter};
+"""
+
+SQL_POSTS_FOR_MISSING_USER_EMBEDDINGS = """
+SELECT p.user_id, p.post_embedding::text
+FROM posts p
+JOIN users u ON u.userid = p.user_id
+WHERE p.post_embedding IS NOT NULL
+  AND u.user_embedding IS NULL
+{user_filter};
+"""
+
+SQL_UPDATE_USER_EMBEDDINGS = """
+UPDATE users u
+SET user_embedding = v.emb
+FROM (VALUES %s) AS v(userid, emb)
+WHERE u.userid = v.userid;
+"""
+
+
+def _store_user_avg_embedding_numpy(conn: psycopg2.extensions.connection, user_ids: Optional[List[int]] = None) -> None:
+    """REAL[] version of store_user_avg_embedding (mean of the user's post embeddings, only if missing)."""
+    import numpy as np
+    from psycopg2.extras import execute_values
+
+    from app.services.helpers.embedding_store import fetch_vectors
+
+    user_filter = "" if user_ids is None else "AND p.user_id = ANY(%(user_ids)s)"
+    keys, vectors = fetch_vectors(
+        conn, SQL_POSTS_FOR_MISSING_USER_EMBEDDINGS.format(user_filter=user_filter), {"user_ids": user_ids}
+    )
+    if not keys:
+        return
+
+    owners = np.array([k[0] for k in keys], dtype=np.int64)
+    uniq, inverse = np.unique(owners, return_inverse=True)
+    sums = np.zeros((len(uniq), vectors.shape[1]), dtype=np.float64)
+    np.add.at(sums, inverse, vectors)
+    means = (sums / np.bincount(inverse)[:, None]).astype(np.float32)
+
+    rows = [(int(uid), means[i].tolist()) for i, uid in enumerate(uniq)]
+    with conn.cursor() as cur:
+        execute_values(cur, SQL_UPDATE_USER_EMBEDDINGS, rows, template="(%s, %s::real[])", page_size=1000)
     conn.commit()
 
 
+def _store_post_recs_emb_numpy(
+    conn: psycopg2.extensions.connection,
+    refresh: bool = False,
+    user_ids: Optional[List[int]] = None,
+    k: int = 50,
+) -> int:
+    """
+    Exact top-k posts per user by cosine distance, in-process (no pgvector).
+
+    Same payload as the SQL path ({"postid", "distance"} in distance order, or
+    shuffled if refresh=True); users without an embedding are left untouched.
+    EMB_INT8=1 stores the post matrix as int8 codes (4x less memory).
+
+    With EMB_QUANT set, embeddings are read from the compact side tables
+    (see embedding_store; synced here first) instead of the full-precision
+    columns.
+
+    Returns the number of users updated.
+    """
+    import random
+
+    from app.services.helpers import embedding_store
+    from app.services.helpers.recs_writer import write_recs
+    from app.services.helpers.vector_search import EmbeddingMatrix, topk_cosine
+
+    dtype = embedding_store.quant_dtype()
+    if dtype is not None:
+        embedding_store.sync_post_embeddings_q(conn, dtype)
+        embedding_store.sync_user_embeddings_q(conn, dtype, user_ids=user_ids)
+        post_ids, owners, post_vectors = embedding_store.load_post_embeddings_q(conn)
+    else:
+        post_keys, post_vectors = embedding_store.fetch_vectors(conn, SQL_POST_EMBEDDINGS, {})
+        post_ids = [pk[0] for pk in post_keys]
+        owners = [-1 if pk[1] is None else pk[1] for pk in post_keys]
+    if not post_ids:
+        return 0
+    matrix = EmbeddingMatrix.build(
+        ids=post_ids,
+        vectors=post_vectors,
+        owners=owners,
+        int8=os.getenv("EMB_INT8", "0") == "1",
+    )
+    del post_vectors
+
+    if dtype is not None:
+        uids, user_vectors = embedding_store.load_user_embeddings_q(conn, user_ids)
+    else:
+        user_filter = "" if user_ids is None else "AND userid = ANY(%(user_ids)s)"
+        user_keys, user_vectors = embedding_store.fetch_vectors(
+            conn, SQL_USER_EMBEDDINGS.format(user_filter=user_filter), {"user_ids": user_ids}
+        )
+        uids = [int(uk[0]) for uk in user_keys]
+    if not uids:
+        return 0
+
+    post_ids, distances = topk_cosine(user_vectors, matrix, k, query_ids=uids)
+
+    staged = []
+    for row, uid in enumerate(uids):
+        recs = [
+            {"postid": int(pid), "distance": float(dist)}
+            for pid, dist in zip(post_ids[row], distances[row])
+            if pid >= 0
+        ]
+        if not recs:
+            continue
+        if refresh:
+            random.shuffle(recs)
+        staged.append((uid, recs))
+
+    return write_recs(conn, "event_recs_emb", staged)
+
 
 def get_event_recs_emb(conn: psycopg2.extensions.connection, user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
     """
@@ -156,18 +370,12 @@ def get_event_recs_emb(conn: psycopg2.extensions.connection, user_id: int, limit
         ]
 
 if __name__ == "__main__":
-    import os
-    conn = psycopg2.connect(
-        dbname=os.getenv("DB_NAME", "hacks13"),
-        user=os.getenv("DB_USER", "jennifer"),
-        password=os.getenv("DB_PASSWORD", ""),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "5432"),
-    )
+    from app.services.helpers.db_helpers import get_conn
+    conn = get_conn()
 
     store_user_avg_embedding(conn)
     print("Stored user embeddings")
-    store_post_recs_emb(conn)
+    print(store_post_recs_emb(conn, recall_sample=int(os.getenv("EMB_RECALL_SAMPLE", "20"))))
     print("Stored event recommendations")
     
     test_user_id = 482193
@@ -9,18 +9,20 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
 
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2.extras import RealDictCursor
 
 from app.services.helpers.similarity_helpers import (
-    jaccard,
-    language_score,
-    location_score,
-    mutual_friends_score,  # we will provide friends sets from DB
-    culture_score,
+    CategoryVocab,
+    PeopleBlock,
+    PersonFeatures,
+    encode_person,
+    score_people_block,
 )
+from app.services.helpers.feed_cache import invalidate_feeds
+from app.services.helpers.recs_writer import write_recs
 
 # diversity constraints (same as your algorithm)
 MAX_SAME_PRIMARY_CULTURE = 6
@@ -58,16 +60,17 @@ WHERE userid = %s;
 """
 
 # users who have blocked viewer: their Blocked array contains viewer_id
+# (containment form so idx_users_blockedusers (GIN) serves it instead of a seq scan)
 SQL_BLOCKED_BY = """
 SELECT userid
 FROM users
-WHERE %s = ANY(COALESCE(BlockedUsers, ARRAY[]::int[]));
+WHERE BlockedUsers @> ARRAY[%s]::int[];
 """
 
 # 1) Friends-of-friends candidates
 # - unnest viewer friends
 # - join their friends
-# - exclude self + viewer friends + viewer blocked + blocked_by
+# - exclude self + viewer friends + viewer blocked + blocked_by (ids from SQL_BLOCKED_BY)
 SQL_FOF_CANDIDATES = """
 WITH
 viewer AS (
@@ -78,11 +81,6 @@ viewer AS (
   FROM users
   WHERE userid = %s
 ),
-blocked_by AS (
-  SELECT userid
-  FROM users
-  WHERE %s = ANY(COALESCE(BlockedUsers, ARRAY[]::int[]))
-),
 fof AS (
   SELECT DISTINCT
     f2 AS candidate_id,
@@ -99,7 +97,7 @@ FROM fof
 WHERE candidate_id <> viewer_id
   AND NOT (candidate_id = ANY(viewer_friends))
   AND NOT (candidate_id = ANY(viewer_blocked))
-  AND candidate_id NOT IN (SELECT userid FROM blocked_by);
+  AND candidate_id <> ALL(%s::int[]);  -- blocked_by
 """
 
 # 2) Location-based candidates (same currentCity/travelingTo patterns)
@@ -110,18 +108,13 @@ WITH viewer AS (
          COALESCE(BlockedUsers, ARRAY[]::int[]) AS BlockedUsers
   FROM users
   WHERE userid = %s
-),
-blocked_by AS (
-  SELECT userid
-  FROM users
-  WHERE %s = ANY(COALESCE(BlockedUsers, ARRAY[]::int[]))
 )
 SELECT u.userid AS candidate_id
 FROM users u, viewer v
 WHERE u.userid <> v.userid
   AND u.userid <> ALL(v.Friends)
   AND u.userid <> ALL(v.BlockedUsers)
-  AND u.userid NOT IN (SELECT userid FROM blocked_by)
+  AND u.userid <> ALL(%s::int[])  -- blocked_by
   AND (
     u.currentCity = v.currentCity
     OR (v.travelingTo IS NOT NULL AND u.currentCity = v.travelingTo)
@@ -142,18 +135,13 @@ WITH viewer AS (
          COALESCE(BlockedUsers, ARRAY[]::int[]) AS BlockedUsers
   FROM users
   WHERE userid = %s
-),
-blocked_by AS (
-  SELECT userid
-  FROM users
-  WHERE %s = ANY(COALESCE(BlockedUsers, ARRAY[]::int[]))
 )
 SELECT u.userid AS candidate_id
 FROM users u, viewer v
 WHERE u.userid <> v.userid
   AND u.userid <> ALL(v.Friends)
   AND u.userid <> ALL(v.BlockedUsers)
-  AND u.userid NOT IN (SELECT userid FROM blocked_by)
+  AND u.userid <> ALL(%s::int[])  -- blocked_by
   AND (
     COALESCE(u.lookingFor, ARRAY[]::text[]) && v.goals
     OR COALESCE(u.languages, ARRAY[]::text[]) && v.langs
@@ -175,73 +163,10 @@ FROM users
 WHERE userid = ANY(%s);
 """
 
-SQL_UPDATE_PEOPLE_RECS = """
-UPDATE users
-SET people_recs = %s
-WHERE userid = %s;
-"""
-
-
 # ----------------------------
 # Score + rerank 
 # ----------------------------
 
-def _score_person_from_rows(viewer: Dict[str, Any], cand: Dict[str, Any], friends_map: Dict[int, set[int]]) -> float:
-    """
-    Compute the deterministic recommendation score between a viewer and a candidate user.
-
-    Inputs:
-        viewer: Dict[str, Any]
-            The user we're generating recs for, with info like userid, currentcity, travelingto, languages,
-            culturalidentity, lookingfor, friends.
-
-        cand: Dict[str, Any]
-            A single user row, representing the candidate.
-
-        friends_map: Dict[int, set[int]]
-            Mapping of user_id -> set of friend user_ids for viewer and all candidates.
-            Used to compute mutual friends score.
-
-    Output:
-        float
-            Final weighted compatibility score between viewer and candidate.
-    """
-    # map demo fields to DB fields
-    viewer_city = viewer["currentcity"]
-    viewer_dest = viewer["travelingto"]
-    cand_city = cand["currentcity"]
-    cand_dest = cand["travelingto"]
-
-    loc = location_score(viewer_city, viewer_dest, cand_city, cand_dest)
-
-    goals = jaccard(viewer["lookingfor"], cand["lookingfor"])
-    culture = culture_score(viewer["culturalidentity"], cand["culturalidentity"])
-    lang = language_score(viewer["languages"], cand["languages"])
-
-    # mutual friends
-    viewer_id = str(viewer["userid"])
-    cand_id = str(cand["userid"])
-
-    # convert friends_map to the structure mutual_friends_score expects: dict[str,set[str]]
-    friends_for_algo: Dict[str, set[str]] = {
-        str(uid): {str(x) for x in s} for uid, s in friends_map.items()
-    }
-    mutual = mutual_friends_score(viewer_id, cand_id, friends_for_algo)
-
-    # you also don't have verified_student in schema; using verifiedStudentsOnly is a preference.
-    verified_bonus = 0.0
-
-    score = (
-        0.30 * loc +
-        0.25 * goals +
-        0.20 * culture +
-        0.15 * lang +
-        0.05 * mutual +
-        verified_bonus
-    )
-    return float(score)
-
-
 def _rerank_people(
     viewer_id: str,
     scored: List[ScoredCandidate],
@@ -317,6 +242,116 @@ def _rerank_people(
     return result
 
 
+# ----------------------------
+# Score + rerank + serialize (shared by per-user and bulk paths)
+# ----------------------------
+
+def _person_features(vocab: CategoryVocab, row: Dict[str, Any]) -> PersonFeatures:
+    """Encode a users row (viewer or candidate) for batch scoring."""
+    return encode_person(
+        vocab,
+        user_id=int(row["userid"]),
+        current_city=row.get("currentcity"),
+        destination_city=row.get("travelingto"),
+        goals=row.get("lookingfor") or [],
+        languages=row.get("languages") or [],
+        cultures=row.get("culturalidentity") or [],
+        friends=row.get("friends") or [],
+    )
+
+
+def _score_people(
+    vocab: CategoryVocab,
+    viewer: PersonFeatures,
+    candidates: List[PersonFeatures],
+) -> List[ScoredCandidate]:
+    """Score all candidates for one viewer in a single batch call."""
+    block = PeopleBlock.from_features(candidates)
+    scores = score_people_block(viewer, block, vocab)
+    return [ScoredCandidate(id=str(cid), score=s) for cid, s in zip(block.ids, scores)]
+
+
+def _rank_people_payload(
+    vocab: CategoryVocab,
+    viewer: PersonFeatures,
+    candidates: List[PersonFeatures],
+    candidate_rows_by_id: Dict[str, Dict[str, Any]],
+    limit: int,
+    refresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Score, rerank and serialize one viewer's candidates into the users.people_recs payload.
+
+    Inputs:
+        vocab: CategoryVocab
+            Vocabulary the viewer and candidate features were encoded with.
+
+        viewer: PersonFeatures
+            The user we're generating recs for.
+
+        candidates: List[PersonFeatures]
+            Encoded candidate users (friends included, for mutual friends).
+
+        candidate_rows_by_id: Dict[str, Dict[str, Any]]
+            Mapping from candidate user_id (string) to DB row dict (for rerank + tags).
+
+        limit: int
+            Maximum number of recommendations to keep.
+
+        refresh: bool
+            If True, keep the same top `limit` results but return them in random order.
+
+    Output:
+        List[Dict[str, Any]]
+            [{"userid", "mutual_friends_count", "tags", "score"}, ...] in stored order.
+    """
+    import random
+
+    # score every candidate in one batch
+    scored = _score_people(vocab, viewer, candidates)
+    scored.sort(key=lambda x: (-x.score, x.id))
+
+    # rerank (fairness/diversity)
+    reranked = _rerank_people(
+        viewer_id=str(viewer.user_id),
+        scored=scored,
+        candidate_rows_by_id=candidate_rows_by_id,
+        limit=limit,
+    )
+
+    # If refresh=True, randomize ordering of the selected results
+    if refresh and reranked:
+        random.shuffle(reranked)
+
+    # serialize payload
+    payload: List[Dict[str, Any]] = []
+    friends_by_id = {str(c.user_id): c.friends for c in candidates}
+
+    for sc in reranked:
+        cand = candidate_rows_by_id.get(sc.id)
+        if not cand:
+            continue
+
+        mutual_count = len(viewer.friends & friends_by_id.get(sc.id, frozenset()))
+
+        tags: List[str] = []
+        tags.extend((cand.get("lookingfor") or [])[:2])
+        tags.extend((cand.get("languages") or [])[:2])
+        tags.extend((cand.get("culturalidentity") or [])[:2])
+        tags = tags[:6]
+
+        payload.append(
+            {
+                "userid": int(sc.id),
+                "mutual_friends_count": mutual_count,
+                "tags": tags,
+                "score": sc.score,
+            }
+        )
+
+    return payload
+
+
 # ----------------------------
 # Public API: store people recs for all users
 # ----------------------------
@@ -329,9 +364,11 @@ def store_people_recs(conn: psycopg2.extensions.connection, limit: int = 50, ref
       - store users.people_recs
 
     If refresh=True, keep the same top `limit` results but store them in random order.
+
+    This is the per-user SQL path; store_people_recs_bulk produces the same payload
+    from a single scan of the users table. Payloads are written in one batch at the end.
     """
-    import random
-    from psycopg2.extras import Json, RealDictCursor
+    staged: List[tuple] = []
 
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         cur.execute("SELECT userid FROM users;")
@@ -345,17 +382,18 @@ def store_people_recs(conn: psycopg2.extensions.connection, limit: int = 50, ref
         if not viewer:
             continue
 
-        viewer_id_str = str(uid)
-
-        # candidate generation via SQL
+        # candidate generation via SQL (blocked_by looked up once, via the GIN index)
         with conn.cursor() as cur:
-            cur.execute(SQL_FOF_CANDIDATES, (uid, uid))
+            cur.execute(SQL_BLOCKED_BY, (uid,))
+            blocked_by = [r[0] for r in cur.fetchall()]
+
+            cur.execute(SQL_FOF_CANDIDATES, (uid, blocked_by))
             fof = {r[0] for r in cur.fetchall()}
 
-            cur.execute(SQL_LOCATION_CANDIDATES, (uid, uid))
+            cur.execute(SQL_LOCATION_CANDIDATES, (uid, blocked_by))
             loc = {r[0] for r in cur.fetchall()}
 
-            cur.execute(SQL_OVERLAP_CANDIDATES, (uid, uid))
+            cur.execute(SQL_OVERLAP_CANDIDATES, (uid, blocked_by))
             ovl = {r[0] for r in cur.fetchall()}
 
         candidate_ids = list(fof | loc | ovl)
@@ -367,78 +405,393 @@ def store_people_recs(conn: psycopg2.extensions.connection, limit: int = 50, ref
             cur.execute(SQL_GET_CANDIDATE_ROWS, (candidate_ids,))
             candidate_rows = cur.fetchall()
 
-        # build friends map for mutual friends scoring
-        friends_map: Dict[int, set[int]] = {}
-        friends_map[int(uid)] = set(viewer.get("friends") or [])
-        for r in candidate_rows:
-            friends_map[int(r["userid"])] = set(r.get("friends") or [])
-
+        # encode viewer + candidates (friends included, for mutual friends scoring)
+        vocab = CategoryVocab()
+        viewer_features = _person_features(vocab, viewer)
+        candidate_features = [_person_features(vocab, r) for r in candidate_rows]
         candidate_rows_by_id = {str(r["userid"]): r for r in candidate_rows}
 
-        # score each candidate
-        scored: List[ScoredCandidate] = []
-        for r in candidate_rows:
-            cid = str(r["userid"])
-            s = _score_person_from_rows(viewer, r, friends_map)
-            scored.append(ScoredCandidate(id=cid, score=s))
-
-        scored.sort(key=lambda x: (-x.score, x.id))
-
-        # rerank (fairness/diversity)
-        reranked = _rerank_people(
-            viewer_id=viewer_id_str,
-            scored=scored,
-            candidate_rows_by_id=candidate_rows_by_id,
-            limit=limit,
+        payload = _rank_people_payload(
+            vocab, viewer_features, candidate_features, candidate_rows_by_id, limit, refresh,
         )
 
-        # If refresh=True, randomize ordering of the selected results
-        if refresh and reranked:
-            random.shuffle(reranked)
+        staged.append((int(uid), payload))
+
+    write_recs(conn, "people_recs", staged)
 
-        # serialize payload
-        payload: List[Dict[str, Any]] = []
-        viewer_friends = friends_map[int(uid)]
 
-        for sc in reranked:
-            cand = candidate_rows_by_id.get(sc.id)
-            if not cand:
+# ----------------------------
+# Bulk mode: one users scan + in-memory inverted indexes
+# ----------------------------
+
+SQL_GET_ALL_PEOPLE_ROWS = """
+SELECT
+  userid,
+  age,
+  currentCity,
+  travelingTo,
+  COALESCE(languages, ARRAY[]::text[]) AS languages,
+  COALESCE(culturalIdentity, ARRAY[]::text[]) AS culturalIdentity,
+  COALESCE(lookingFor, ARRAY[]::text[]) AS lookingFor,
+  COALESCE(Friends, ARRAY[]::int[]) AS Friends,
+  COALESCE(BlockedUsers, ARRAY[]::int[]) AS BlockedUsers
+FROM users;
+"""
+
+
+@dataclass
+class PeopleIndex:
+    """
+    In-memory view of the users table for bulk candidate generation.
+
+    Every map is keyed by int user id. The inverted indexes mirror the
+    predicates of SQL_LOCATION_CANDIDATES / SQL_OVERLAP_CANDIDATES, so
+    NULL cities and NULL array elements never match (same as SQL `=` / `&&`).
+    """
+    rows_by_id: Dict[int, Dict[str, Any]]
+    vocab: CategoryVocab
+    features: Dict[int, PersonFeatures]
+    friends: Dict[int, set[int]]
+    friended_by: Dict[int, set[int]]
+    blocked: Dict[int, set[int]]
+    blocked_by: Dict[int, set[int]]
+    by_city: Dict[str, set[int]]
+    by_destination: Dict[str, set[int]]
+    by_goal: Dict[str, set[int]]
+    by_language: Dict[str, set[int]]
+    by_culture: Dict[str, set[int]]
+
+
+def _index_add(index: Dict[str, set[int]], key: Any, uid: int) -> None:
+    if key is None:
+        return
+    index.setdefault(key, set()).add(uid)
+
+
+def build_people_index(rows: List[Dict[str, Any]]) -> PeopleIndex:
+    """Build encoded features, friend adjacency (both directions), reverse-block map and attribute indexes from user rows."""
+    index = PeopleIndex(
+        rows_by_id={}, vocab=CategoryVocab(), features={}, friends={}, friended_by={}, blocked={}, blocked_by={},
+        by_city={}, by_destination={}, by_goal={}, by_language={}, by_culture={},
+    )
+
+    for r in rows:
+        uid = int(r["userid"])
+        index.rows_by_id[uid] = r
+        index.features[uid] = _person_features(index.vocab, r)
+        index.friends[uid] = set(r.get("friends") or [])
+        index.blocked[uid] = set(r.get("blockedusers") or [])
+
+        for friend_id in index.friends[uid]:
+            if friend_id is not None:
+                index.friended_by.setdefault(int(friend_id), set()).add(uid)
+
+        for blocked_id in index.blocked[uid]:
+            if blocked_id is not None:
+                index.blocked_by.setdefault(int(blocked_id), set()).add(uid)
+
+        _index_add(index.by_city, r.get("currentcity"), uid)
+        _index_add(index.by_destination, r.get("travelingto"), uid)
+        for g in r.get("lookingfor") or []:
+            _index_add(index.by_goal, g, uid)
+        for lang in r.get("languages") or []:
+            _index_add(index.by_language, lang, uid)
+        for c in r.get("culturalidentity") or []:
+            _index_add(index.by_culture, c, uid)
+
+    return index
+
+
+def load_people_index(conn: psycopg2.extensions.connection) -> PeopleIndex:
+    """Load the users table once and index it for bulk candidate generation."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(SQL_GET_ALL_PEOPLE_ROWS)
+        rows = cur.fetchall()
+    return build_people_index(rows)
+
+
+def generate_people_candidates(index: PeopleIndex, uid: int) -> set[int]:
+    """
+    In-memory equivalent of SQL_FOF_CANDIDATES | SQL_LOCATION_CANDIDATES | SQL_OVERLAP_CANDIDATES.
+
+    Returns candidate ids that exist in the users table.
+    """
+    viewer = index.rows_by_id.get(uid)
+    if viewer is None:
+        return set()
+
+    viewer_friends = index.friends.get(uid, set())
+    candidates: set[int] = set()
+
+    # 1) friends-of-friends (only friends that exist as users, like the JOIN in SQL)
+    for f1 in viewer_friends:
+        candidates.update(index.friends.get(f1, ()))
+
+    # 2) location: same currentCity / travelingTo cross-matches
+    city = viewer.get("currentcity")
+    dest = viewer.get("travelingto")
+    for key in (city, dest):
+        if key is None:
+            continue
+        candidates.update(index.by_city.get(key, ()))
+        candidates.update(index.by_destination.get(key, ()))
+
+    # 3) attribute overlap (goals / languages / cultures)
+    for g in viewer.get("lookingfor") or []:
+        candidates.update(index.by_goal.get(g, ()))
+    for lang in viewer.get("languages") or []:
+        candidates.update(index.by_language.get(lang, ()))
+    for c in viewer.get("culturalidentity") or []:
+        candidates.update(index.by_culture.get(c, ()))
+
+    # exclusions: self, friends, blocked, blocked_by, and ids with no users row
+    candidates.discard(uid)
+    candidates.difference_update(viewer_friends)
+    candidates.difference_update(index.blocked.get(uid, ()))
+    candidates.difference_update(index.blocked_by.get(uid, ()))
+    return {c for c in candidates if c in index.rows_by_id}
+
+
+def _people_recs_from_index(
+    index: PeopleIndex,
+    viewer_ids: Iterable[int],
+    limit: int,
+    refresh: bool,
+) -> List[tuple]:
+    """Rank people_recs for viewer_ids using a loaded index; returns (userid, payload) pairs."""
+    staged: List[tuple] = []
+    for uid in viewer_ids:
+        if uid not in index.rows_by_id:
+            continue
+
+        candidate_ids = generate_people_candidates(index, uid)
+        if not candidate_ids:
+            continue
+
+        payload = _rank_people_payload(
+            index.vocab,
+            index.features[uid],
+            [index.features[c] for c in candidate_ids],
+            {str(c): index.rows_by_id[c] for c in candidate_ids},
+            limit,
+            refresh,
+        )
+        staged.append((uid, payload))
+    return staged
+
+
+def store_people_recs_bulk(
+    conn: psycopg2.extensions.connection,
+    limit: int = 50,
+    refresh: bool = False,
+    user_ids: Optional[List[int]] = None,
+) -> int:
+    """
+    Bulk version of store_people_recs.
+
+    Loads the users table once, builds inverted indexes (city/destination,
+    goal/language/culture, friend adjacency, reverse-block map) and generates
+    candidates for every viewer in-process. Writes the same payload as the
+    per-user path; users with no candidates are left untouched, as before.
+
+    If user_ids is given, only those viewers are recomputed (candidates still
+    come from the whole table), e.g. one refresh shard.
+
+    A full run also clears the people_recs_changelog entries it has covered;
+    a sharded run leaves that to its caller (claim_people_changes before the
+    shards start, release_people_changes once they all finished).
+
+    Returns the number of users updated.
+    """
+    claimed = claim_people_changes(conn) if user_ids is None else []
+
+    index = load_people_index(conn)
+    viewer_ids = index.rows_by_id.keys() if user_ids is None else [int(u) for u in user_ids]
+
+    staged = _people_recs_from_index(index, viewer_ids, limit, refresh)
+    updated = write_recs(conn, "people_recs", staged, commit=False)
+    release_people_changes(conn, claimed)
+
+    conn.commit()
+    invalidate_feeds(uid for uid, _ in staged)
+    return updated
+
+
+# ----------------------------
+# Incremental mode: recompute only users touched by the changelog
+# ----------------------------
+
+SQL_CREATE_PEOPLE_CHANGELOG = """
+CREATE TABLE IF NOT EXISTS people_recs_changelog (
+    userID INT PRIMARY KEY,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION mark_people_recs_dirty() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO people_recs_changelog (userID, changed_at)
+    VALUES (NEW.userID, clock_timestamp())
+    ON CONFLICT (userID) DO UPDATE SET changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_people_recs_dirty ON Users;
+CREATE TRIGGER users_people_recs_dirty
+    AFTER INSERT OR UPDATE OF currentCity, travelingTo, languages, culturalIdentity, lookingFor, Friends, BlockedUsers
+    ON Users
+    FOR EACH ROW EXECUTE FUNCTION mark_people_recs_dirty();
+"""
+
+SQL_CHANGELOG_EXISTS = """
+SELECT to_regclass('public.people_recs_changelog') IS NOT NULL;
+"""
+
+SQL_GET_PEOPLE_CHANGES = """
+SELECT userid, changed_at
+FROM people_recs_changelog;
+"""
+
+# only delete entries we read; users re-marked while we were computing stay queued
+SQL_DELETE_PEOPLE_CHANGES = """
+DELETE FROM people_recs_changelog c
+USING unnest(%s::int[], %s::timestamptz[]) AS t(userid, changed_at)
+WHERE c.userid = t.userid
+  AND c.changed_at = t.changed_at;
+"""
+
+# viewers whose stored people_recs currently include any of the changed users
+SQL_PEOPLE_RECS_HOLDERS = """
+SELECT DISTINCT u.userid
+FROM users u
+CROSS JOIN LATERAL jsonb_array_elements(COALESCE(u.people_recs, '[]'::jsonb)) AS rec
+WHERE (rec->>'userid')::int = ANY(%s);
+"""
+
+
+def ensure_people_changelog(conn: psycopg2.extensions.connection) -> None:
+    """Create the people_recs_changelog table + users trigger if missing (idempotent)."""
+    with conn.cursor() as cur:
+        cur.execute(SQL_CREATE_PEOPLE_CHANGELOG)
+    conn.commit()
+
+
+def claim_people_changes(conn: psycopg2.extensions.connection) -> List[tuple]:
+    """Snapshot pending changelog entries as (userid, changed_at); [] if the table is missing."""
+    with conn.cursor() as cur:
+        cur.execute(SQL_CHANGELOG_EXISTS)
+        if not cur.fetchone()[0]:
+            return []
+        cur.execute(SQL_GET_PEOPLE_CHANGES)
+        claimed = [(int(r[0]), r[1]) for r in cur.fetchall()]
+    # end the read transaction so trigger inserts never wait on us
+    conn.commit()
+    return claimed
+
+
+def release_people_changes(conn: psycopg2.extensions.connection, claimed: List[tuple]) -> None:
+    """Delete claimed changelog entries (part of the caller's write transaction)."""
+    if not claimed:
+        return
+    with conn.cursor() as cur:
+        cur.execute(
+            SQL_DELETE_PEOPLE_CHANGES,
+            ([uid for uid, _ in claimed], [ts for _, ts in claimed]),
+        )
+
+
+def people_viewers_affected_by(index: PeopleIndex, changed_ids: Iterable[int]) -> set[int]:
+    """
+    Viewers whose people_recs can change when `changed_ids` change.
+
+    Covers the changed users themselves, viewers they can appear for as a
+    candidate (same city/destination, overlapping goals/languages/cultures,
+    friends-of-friends) and viewers whose friends-of-friends come through them.
+    Viewers that only had them in their *old* neighbourhood are found from the
+    stored recs instead (SQL_PEOPLE_RECS_HOLDERS).
+    """
+    affected: set[int] = set()
+
+    for uid in changed_ids:
+        affected.add(uid)
+
+        # viewers who list uid as a friend: their FoF set comes through uid
+        direct = index.friended_by.get(uid, set())
+        affected.update(direct)
+
+        # viewers for whom uid is a friend-of-friend
+        for f in direct:
+            affected.update(index.friended_by.get(f, ()))
+
+        row = index.rows_by_id.get(uid)
+        if row is None:
+            continue
+
+        # location + overlap predicates are symmetric, so the viewer-side
+        # lookup for uid finds every viewer uid is a candidate for
+        for key in (row.get("currentcity"), row.get("travelingto")):
+            if key is None:
                 continue
+            affected.update(index.by_city.get(key, ()))
+            affected.update(index.by_destination.get(key, ()))
+        for g in row.get("lookingfor") or []:
+            affected.update(index.by_goal.get(g, ()))
+        for lang in row.get("languages") or []:
+            affected.update(index.by_language.get(lang, ()))
+        for c in row.get("culturalidentity") or []:
+            affected.update(index.by_culture.get(c, ()))
+
+    return affected
+
+
+def store_people_recs_incremental(
+    conn: psycopg2.extensions.connection,
+    limit: int = 50,
+    refresh: bool = False,
+) -> int:
+    """
+    Recompute people_recs only for users affected by entries in people_recs_changelog.
 
-            cand_friends = friends_map.get(int(sc.id), set())
-            mutual_count = len(viewer_friends & cand_friends)
+    Falls back to the full store_people_recs_bulk when the changelog table does
+    not exist yet (it is created first, so later runs are incremental).
 
-            tags: List[str] = []
-            tags.extend((cand.get("lookingfor") or [])[:2])
-            tags.extend((cand.get("languages") or [])[:2])
-            tags.extend((cand.get("culturalidentity") or [])[:2])
-            tags = tags[:6]
+    Returns the number of users updated.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_CHANGELOG_EXISTS)
+        has_changelog = cur.fetchone()[0]
+    conn.commit()
 
-            payload.append(
-                {
-                    "userid": int(sc.id),
-                    "mutual_friends_count": mutual_count,
-                    "tags": tags,
-                    "score": sc.score,
-                }
-            )
+    if not has_changelog:
+        ensure_people_changelog(conn)
+        return store_people_recs_bulk(conn, limit=limit, refresh=refresh)
 
-        with conn.cursor() as cur:
-            cur.execute(SQL_UPDATE_PEOPLE_RECS, (Json(payload), int(uid)))
-        conn.commit()
+    claimed = claim_people_changes(conn)
+    if not claimed:
+        return 0
+
+    changed_ids = [uid for uid, _ in claimed]
+    index = load_people_index(conn)
+    affected = people_viewers_affected_by(index, changed_ids)
+
+    with conn.cursor() as cur:
+        cur.execute(SQL_PEOPLE_RECS_HOLDERS, (changed_ids,))
+        affected.update(int(r[0]) for r in cur.fetchall())
+
+    staged = _people_recs_from_index(index, sorted(affected), limit, refresh)
+    updated = write_recs(conn, "people_recs", staged, commit=False)
+    release_people_changes(conn, claimed)
+
+    conn.commit()
+    invalidate_feeds(uid for uid, _ in staged)
+    return updated
 
 
 if __name__ == "__main__":
-    import os
-    conn = psycopg2.connect(
-        dbname=os.getenv("DB_NAME", "hacks13"),
-        user=os.getenv("DB_USER", "jennifer"),
-        password=os.getenv("DB_PASSWORD", ""),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "5432"),
-    )
+    from app.services.helpers.db_helpers import get_conn
+    conn = get_conn()
 
-    store_people_recs(conn)
+    store_people_recs_bulk(conn)
     print("Stored people recommendations")
     """
     test_user_id = 482193
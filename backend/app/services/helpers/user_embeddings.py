@@ -0,0 +1,240 @@
+"""
+Incrementally maintained user embeddings (running centroid of post embeddings).
+
+user_embedding_stats keeps, per user, the number of embedded posts and the
+float8 sum of their embeddings. A trigger on Posts applies each insert /
+delete / embedding or author change as a +/- delta and rewrites that user's
+users.user_embedding = sum / count, so user vectors are always current at
+O(dim) cost per post instead of a GROUP BY over all posts.
+
+Works with both vector(384) (schema.sql) and REAL[] (schema_novector.sql)
+columns: embeddings are read as real[] and written back through the
+real[] -> vector assignment cast.
+
+cd backend
+python -m app.services.helpers.user_embeddings            # install trigger if missing
+python -m app.services.helpers.user_embeddings --rebuild  # recompute everything from posts
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import List, Optional
+
+import psycopg2
+
+from app.services.helpers.db_helpers import get_conn
+
+# same DDL as schema.sql / schema_novector.sql (setup_db.py runs this one; also for databases created before it)
+SQL_CREATE_USER_EMBEDDING_STATS = """
+CREATE TABLE IF NOT EXISTS user_embedding_stats (
+    userID INT PRIMARY KEY,
+    post_count INT NOT NULL,
+    emb_sum DOUBLE PRECISION[] NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION apply_user_embedding_delta(uid INT, emb REAL[], sign INT) RETURNS void AS $$
+DECLARE
+    n INT;
+    total DOUBLE PRECISION[];
+BEGIN
+    IF uid IS NULL OR emb IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO user_embedding_stats AS s (userID, post_count, emb_sum)
+    VALUES (uid, sign, ARRAY(SELECT sign * x::float8 FROM unnest(emb) WITH ORDINALITY AS t(x, i) ORDER BY i))
+    ON CONFLICT (userID) DO UPDATE SET
+        post_count = s.post_count + EXCLUDED.post_count,
+        emb_sum = ARRAY(
+            SELECT a + b
+            FROM unnest(s.emb_sum, EXCLUDED.emb_sum) WITH ORDINALITY AS t(a, b, i)
+            ORDER BY i
+        )
+    RETURNING post_count, emb_sum INTO n, total;
+
+    IF n <= 0 THEN
+        DELETE FROM user_embedding_stats WHERE userID = uid;
+        UPDATE Users SET user_embedding = NULL WHERE userID = uid;
+    ELSE
+        UPDATE Users
+        SET user_embedding = ARRAY(SELECT (a / n)::real FROM unnest(total) WITH ORDINALITY AS t(a, i) ORDER BY i)
+        WHERE userID = uid;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_user_embedding() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.user_id IS NOT DISTINCT FROM NEW.user_id
+       AND OLD.post_embedding IS NOT DISTINCT FROM NEW.post_embedding THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_user_embedding_delta(OLD.user_id, OLD.post_embedding::real[], -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_user_embedding_delta(NEW.user_id, NEW.post_embedding::real[], 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS posts_user_embedding_sync ON Posts;
+CREATE TRIGGER posts_user_embedding_sync
+    AFTER INSERT OR DELETE OR UPDATE OF post_embedding, user_id
+    ON Posts
+    FOR EACH ROW EXECUTE FUNCTION sync_user_embedding();
+"""
+
+SQL_STATS_EXISTS = """
+SELECT to_regclass('public.user_embedding_stats') IS NOT NULL;
+"""
+
+# users with embedded posts but no stats row (posts loaded before the trigger existed)
+SQL_USERS_MISSING_STATS = """
+SELECT DISTINCT p.user_id
+FROM posts p
+WHERE p.post_embedding IS NOT NULL
+  AND p.user_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM user_embedding_stats s WHERE s.userid = p.user_id)
+  {user_filter};
+"""
+
+SQL_DELETE_STATS = """
+DELETE FROM user_embedding_stats s
+WHERE TRUE {user_filter};
+"""
+
+SQL_INSERT_STATS = """
+INSERT INTO user_embedding_stats (userid, post_count, emb_sum)
+SELECT c.user_id, c.n, array_agg(d.s ORDER BY d.i)
+FROM (
+    SELECT p.user_id, COUNT(*) AS n
+    FROM posts p
+    WHERE p.post_embedding IS NOT NULL
+      AND p.user_id IS NOT NULL
+      {user_filter}
+    GROUP BY p.user_id
+) c
+JOIN (
+    SELECT p.user_id, e.i, SUM(e.x::float8) AS s
+    FROM posts p
+    CROSS JOIN LATERAL unnest(p.post_embedding::real[]) WITH ORDINALITY AS e(x, i)
+    WHERE p.post_embedding IS NOT NULL
+      AND p.user_id IS NOT NULL
+      {user_filter}
+    GROUP BY p.user_id, e.i
+) d ON d.user_id = c.user_id
+GROUP BY c.user_id, c.n;
+"""
+
+SQL_APPLY_CENTROIDS = """
+UPDATE users u
+SET user_embedding = ARRAY(
+    SELECT (t.a / s.post_count)::real
+    FROM unnest(s.emb_sum) WITH ORDINALITY AS t(a, i)
+    ORDER BY t.i
+)
+FROM user_embedding_stats s
+WHERE u.userid = s.userid
+  {user_filter};
+"""
+
+SQL_CLEAR_STALE = """
+UPDATE users u
+SET user_embedding = NULL
+WHERE u.user_embedding IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM user_embedding_stats s WHERE s.userid = u.userid)
+  {user_filter};
+"""
+
+
+def _stats_exist(conn: psycopg2.extensions.connection) -> bool:
+    with conn.cursor() as cur:
+        cur.execute(SQL_STATS_EXISTS)
+        return bool(cur.fetchone()[0])
+
+
+def ensure_user_embedding_stats(conn: psycopg2.extensions.connection) -> bool:
+    """
+    Install user_embedding_stats and the Posts trigger if missing.
+
+    A freshly created table is filled from the existing posts (full rebuild).
+    Returns True if it was created.
+    """
+    if _stats_exist(conn):
+        return False
+    with conn.cursor() as cur:
+        cur.execute(SQL_CREATE_USER_EMBEDDING_STATS)
+    conn.commit()
+    rebuild_user_embeddings(conn)
+    return True
+
+
+def rebuild_user_embeddings(
+    conn: psycopg2.extensions.connection,
+    user_ids: Optional[List[int]] = None,
+) -> int:
+    """
+    Recompute user_embedding_stats and users.user_embedding from posts.
+
+    Repair path for the trigger-maintained centroids (e.g. after bulk loads with
+    triggers disabled, or to shed accumulated float drift). If user_ids is
+    given, only those users are rebuilt. Users left without embedded posts get
+    a NULL user_embedding.
+
+    Posts writes are blocked for the duration so no delta is lost.
+    Returns the number of users with a centroid.
+    """
+    with conn.cursor() as cur:
+        cur.execute("LOCK TABLE posts IN SHARE MODE;")
+        params = {"user_ids": user_ids}
+        cur.execute(SQL_DELETE_STATS.format(
+            user_filter="" if user_ids is None else "AND s.userid = ANY(%(user_ids)s)"), params)
+        cur.execute(SQL_INSERT_STATS.format(
+            user_filter="" if user_ids is None else "AND p.user_id = ANY(%(user_ids)s)"), params)
+        rebuilt = cur.rowcount
+        u_filter = "" if user_ids is None else "AND u.userid = ANY(%(user_ids)s)"
+        cur.execute(SQL_APPLY_CENTROIDS.format(user_filter=u_filter), params)
+        cur.execute(SQL_CLEAR_STALE.format(user_filter=u_filter), params)
+    conn.commit()
+    return rebuilt
+
+
+def backfill_missing_user_embeddings(
+    conn: psycopg2.extensions.connection,
+    user_ids: Optional[List[int]] = None,
+) -> Optional[int]:
+    """
+    Rebuild only users whose embedded posts are not yet reflected in the stats.
+
+    With the trigger installed every other user is already current, so this is
+    cheap. Returns the number of users rebuilt, or None if the stats table
+    doesn't exist (caller falls back to a GROUP BY average).
+    """
+    if not _stats_exist(conn):
+        return None
+    user_filter = "" if user_ids is None else "AND p.user_id = ANY(%(user_ids)s)"
+    with conn.cursor() as cur:
+        cur.execute(SQL_USERS_MISSING_STATS.format(user_filter=user_filter), {"user_ids": user_ids})
+        missing = [int(r[0]) for r in cur.fetchall()]
+    conn.commit()
+    if not missing:
+        return 0
+    return rebuild_user_embeddings(conn, user_ids=missing)
+
+
+if __name__ == "__main__":
+    conn = get_conn()
+    try:
+        if "--rebuild" in sys.argv[1:]:
+            if not ensure_user_embedding_stats(conn):
+                print(rebuild_user_embeddings(conn))
+            print("Rebuilt user embeddings from posts")
+        else:
+            print("created:", ensure_user_embedding_stats(conn))
+            print("backfilled:", backfill_missing_user_embeddings(conn))
+    finally:
+        conn.close()
@@ -0,0 +1,262 @@
+"""
+ANN index management for posts.post_embedding (pgvector).
+
+store_post_recs_emb ranks posts by `post_embedding <=> user_embedding` (cosine
+distance) per user; without an index every lateral is a full scan of posts.
+This module creates the HNSW (default) or IVFFlat index, applies the search
+parameters for a transaction, and measures recall against the exact ranking.
+
+The index is created once, at setup (schema.sql, db/setup_db.py) or with the
+command below (CREATE INDEX CONCURRENTLY, so post inserts keep working while
+it builds) -- never from the recs refresh. IVFFlat lists are sized from the
+embedded posts at build time; rebuild once the table has grown.
+
+Configuration (env):
+    POST_EMB_INDEX            hnsw | ivfflat | none        (default: hnsw)
+    HNSW_M                    graph degree at build         (default: 16)
+    HNSW_EF_CONSTRUCTION      build candidate list size     (default: 64)
+    HNSW_EF_SEARCH            search candidate list size    (default: 100, >= k)
+    IVFFLAT_LISTS             lists at build                (default: rows / 1000, min 10)
+    IVFFLAT_PROBES            lists probed per search       (default: 10)
+
+cd backend
+python -m app.services.helpers.vector_index             # ensure index + print recall
+python -m app.services.helpers.vector_index --rebuild   # drop + recreate (new build params)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+from app.services.helpers.db_helpers import get_conn
+
+HNSW_INDEX_NAME = "idx_posts_post_embedding_hnsw"
+IVFFLAT_INDEX_NAME = "idx_posts_post_embedding_ivfflat"
+
+SQL_VECTOR_VERSION = """
+SELECT extversion FROM pg_extension WHERE extname = 'vector';
+"""
+
+SQL_EMBEDDING_COLUMN_TYPE = """
+SELECT udt_name
+FROM information_schema.columns
+WHERE table_schema = 'public' AND table_name = 'posts' AND column_name = 'post_embedding';
+"""
+
+# a failed CONCURRENTLY build leaves an invalid index behind under the same name
+SQL_INDEX_VALID = """
+SELECT i.indisvalid
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = %s;
+"""
+
+SQL_COUNT_EMBEDDED_POSTS = """
+SELECT COUNT(*) FROM posts WHERE post_embedding IS NOT NULL;
+"""
+
+SQL_SAMPLE_USERS = """
+SELECT userid
+FROM users
+WHERE user_embedding IS NOT NULL
+ORDER BY random()
+LIMIT %s;
+"""
+
+# same shape as the lateral in store_post_recs_emb
+SQL_TOP_POSTS_FOR_USER = """
+SELECT p.postid
+FROM users u
+JOIN LATERAL (
+    SELECT p.postid
+    FROM posts p
+    WHERE p.post_embedding IS NOT NULL
+      AND p.user_id <> u.userid
+    ORDER BY (p.post_embedding <=> u.user_embedding)
+    LIMIT %s
+) p ON TRUE
+WHERE u.userid = %s
+  AND u.user_embedding IS NOT NULL;
+"""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def index_method() -> str:
+    """Configured ANN method: 'hnsw', 'ivfflat' or 'none'."""
+    method = os.getenv("POST_EMB_INDEX", "hnsw").strip().lower()
+    return method if method in ("hnsw", "ivfflat", "none") else "hnsw"
+
+
+def _vector_version(cur) -> Optional[tuple]:
+    """Installed pgvector version as a tuple, e.g. (0, 8, 1); None if not installed."""
+    cur.execute(SQL_VECTOR_VERSION)
+    row = cur.fetchone()
+    if not row:
+        return None
+    return tuple(int(x) for x in row[0].split(".") if x.isdigit())
+
+
+def ensure_post_embedding_index(
+    conn: psycopg2.extensions.connection,
+    method: Optional[str] = None,
+    rebuild: bool = False,
+    concurrently: bool = False,
+) -> Optional[str]:
+    """
+    Create the ANN index on posts.post_embedding if it doesn't exist.
+
+    Setup / migration step, not for the refresh path: a plain build holds a
+    SHARE lock on posts (blocking inserts) for the whole build.
+    concurrently=True builds with CREATE INDEX CONCURRENTLY instead (runs in
+    autocommit; an invalid index left by a failed concurrent build is rebuilt).
+
+    rebuild=True drops and recreates it (e.g. after changing HNSW_M /
+    HNSW_EF_CONSTRUCTION, or IVFFLAT_LISTS once the table has grown; IVFFlat
+    centroids are fixed at build time).
+
+    Returns the index name, or None if pgvector isn't installed, post_embedding
+    isn't a vector column, or method is 'none'.
+    """
+    method = method or index_method()
+    if method == "none":
+        return None
+    with conn.cursor() as cur:
+        if _vector_version(cur) is None:
+            return None
+        cur.execute(SQL_EMBEDDING_COLUMN_TYPE)
+        row = cur.fetchone()
+    conn.commit()
+    if row is None or row[0] != "vector":
+        return None
+
+    if method == "ivfflat":
+        name = IVFFLAT_INDEX_NAME
+        with conn.cursor() as cur:
+            cur.execute(SQL_COUNT_EMBEDDED_POSTS)
+            rows = int(cur.fetchone()[0])
+        lists = _env_int("IVFFLAT_LISTS", max(10, rows // 1000))
+        ddl = f"""
+            CREATE INDEX {{concurrently}} IF NOT EXISTS {name} ON posts
+            USING ivfflat (post_embedding vector_cosine_ops) WITH (lists = {int(lists)});
+        """
+    else:
+        name = HNSW_INDEX_NAME
+        m = _env_int("HNSW_M", 16)
+        ef_construction = _env_int("HNSW_EF_CONSTRUCTION", 64)
+        ddl = f"""
+            CREATE INDEX {{concurrently}} IF NOT EXISTS {name} ON posts
+            USING hnsw (post_embedding vector_cosine_ops)
+            WITH (m = {int(m)}, ef_construction = {int(ef_construction)});
+        """
+
+    with conn.cursor() as cur:
+        cur.execute(SQL_INDEX_VALID, (name,))
+        row = cur.fetchone()
+    conn.commit()
+    rebuild = rebuild or (row is not None and not row[0])
+
+    how = "CONCURRENTLY" if concurrently else ""
+    autocommit = conn.autocommit
+    # CONCURRENTLY can't run inside a transaction block
+    conn.autocommit = concurrently or autocommit
+    try:
+        with conn.cursor() as cur:
+            if rebuild:
+                cur.execute(f"DROP INDEX {how} IF EXISTS {name};")
+            cur.execute(ddl.format(concurrently=how))
+        if not conn.autocommit:
+            conn.commit()
+    finally:
+        conn.autocommit = autocommit
+    return name
+
+
+def set_search_params(conn: psycopg2.extensions.connection, k: int = 50) -> None:
+    """
+    SET LOCAL the ANN search parameters for the current transaction.
+
+    hnsw.ef_search bounds how many rows one index scan can return, so it is
+    raised to at least k. On pgvector >= 0.8 iterative scans are enabled so the
+    `p.user_id <> u.userid` filter can't starve the LIMIT.
+    """
+    ef_search = max(_env_int("HNSW_EF_SEARCH", 100), k)
+    probes = _env_int("IVFFLAT_PROBES", 10)
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL hnsw.ef_search = %s;", (ef_search,))
+        cur.execute("SET LOCAL ivfflat.probes = %s;", (probes,))
+
+        if (_vector_version(cur) or ()) >= (0, 8):
+            cur.execute("SET LOCAL hnsw.iterative_scan = relaxed_order;")
+            cur.execute("SET LOCAL ivfflat.iterative_scan = relaxed_order;")
+
+
+def _top_posts(cur, user_id: int, k: int) -> List[int]:
+    cur.execute(SQL_TOP_POSTS_FOR_USER, (k, user_id))
+    return [int(r[0]) for r in cur.fetchall()]
+
+
+def check_post_recall(
+    conn: psycopg2.extensions.connection,
+    sample_users: int = 20,
+    k: int = 50,
+) -> Dict[str, Any]:
+    """
+    Compare ANN top-k posts against the exact top-k for a random sample of users.
+
+    Returns {"users", "k", "recall", "ann_ms", "exact_ms"}; recall is the mean
+    fraction of each user's exact top-k the index returned. Tune HNSW_EF_SEARCH /
+    IVFFLAT_PROBES up if recall is too low, down if ann_ms is too high.
+    """
+    with conn.cursor() as cur:
+        cur.execute(SQL_SAMPLE_USERS, (sample_users,))
+        user_ids = [int(r[0]) for r in cur.fetchall()]
+    conn.commit()
+
+    recalls: List[float] = []
+    ann_s = exact_s = 0.0
+    for uid in user_ids:
+        set_search_params(conn, k)
+        with conn.cursor() as cur:
+            started = time.perf_counter()
+            approx = _top_posts(cur, uid, k)
+            ann_s += time.perf_counter() - started
+
+            # same query with index scans off = exact ranking
+            cur.execute("SET LOCAL enable_indexscan = off;")
+            started = time.perf_counter()
+            exact = _top_posts(cur, uid, k)
+            exact_s += time.perf_counter() - started
+        conn.rollback()
+
+        if exact:
+            recalls.append(len(set(approx) & set(exact)) / len(exact))
+
+    n = len(recalls)
+    return {
+        "users": n,
+        "k": k,
+        "recall": round(sum(recalls) / n, 4) if n else None,
+        "ann_ms": round(1000 * ann_s / max(len(user_ids), 1), 3),
+        "exact_ms": round(1000 * exact_s / max(len(user_ids), 1), 3),
+    }
+
+
+if __name__ == "__main__":
+    conn = get_conn()
+    try:
+        rebuild = "--rebuild" in sys.argv[1:]
+        print("index:", ensure_post_embedding_index(conn, rebuild=rebuild, concurrently=True))
+        print(check_post_recall(conn))
+    finally:
+        conn.close()
@@ -0,0 +1,164 @@
+"""
+In-process exact vector search (NumPy), used when pgvector is unavailable.
+
+Post embeddings are held in one contiguous float32 matrix (rows L2-normalized,
+so cosine similarity is a dot product) or, optionally, as int8 codes with a
+per-row scale (4x less memory). Top-k is computed exactly with a blocked
+matrix multiply: queries x posts are processed in tiles so peak memory stays at
+one (query_block x post_block) score tile, and each tile is reduced with
+argpartition and merged into a running top-k.
+
+Distances use pgvector's `<=>` convention: cosine distance = 1 - cosine similarity.
+
+    m = EmbeddingMatrix.build(post_ids, post_vectors, owners=post_user_ids)
+    ids, dists = topk_cosine(user_vectors, m, k=50, query_ids=user_ids)
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUERY_BLOCK = int(os.getenv("VECTOR_QUERY_BLOCK", "512"))
+POST_BLOCK = int(os.getenv("VECTOR_POST_BLOCK", "32768"))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows (float32, C-contiguous); zero rows stay zero."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@dataclass
+class EmbeddingMatrix:
+    """
+    Searchable post embeddings.
+
+    ids:     (n,) int64 row -> post id
+    owners:  (n,) int64 row -> author user id (for excluding a viewer's own posts), or None
+    vectors: (n, d) float32 unit rows, or None when quantized
+    codes:   (n, d) int8 quantized unit rows, or None
+    scales:  (n,) float32 per-row dequantization scale for codes
+    """
+    ids: np.ndarray
+    owners: Optional[np.ndarray]
+    vectors: Optional[np.ndarray] = None
+    codes: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+
+    @classmethod
+    def build(
+        cls,
+        ids,
+        vectors,
+        owners=None,
+        int8: bool = False,
+    ) -> "EmbeddingMatrix":
+        unit = _normalize(np.asarray(vectors, dtype=np.float32))
+        m = cls(
+            ids=np.asarray(ids, dtype=np.int64),
+            owners=None if owners is None else np.asarray(owners, dtype=np.int64),
+            vectors=unit,
+        )
+        if int8:
+            m.quantize_int8()
+        return m
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def quantize_int8(self) -> None:
+        """Replace float32 rows with symmetric per-row int8 codes (drops the float copy)."""
+        if self.vectors is None:
+            return
+        peak = np.abs(self.vectors).max(axis=1)
+        peak[peak == 0] = 1.0
+        self.scales = (peak / 127.0).astype(np.float32)
+        self.codes = np.rint(self.vectors / self.scales[:, None]).astype(np.int8)
+        self.vectors = None
+
+    def block(self, start: int, stop: int) -> np.ndarray:
+        """float32 rows [start:stop] (dequantized on the fly for int8)."""
+        if self.vectors is not None:
+            return self.vectors[start:stop]
+        return self.codes[start:stop].astype(np.float32) * self.scales[start:stop, None]
+
+
+def _merge_topk(
+    best_sim: np.ndarray,
+    best_idx: np.ndarray,
+    sim: np.ndarray,
+    offset: int,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge one score tile into the running (unsorted) top-k per query row."""
+    kk = min(k, sim.shape[1])
+    # partition from the top end in place of negating the whole tile
+    part = np.argpartition(sim, sim.shape[1] - kk, axis=1)[:, -kk:]
+    tile_sim = np.take_along_axis(sim, part, axis=1)
+    tile_idx = part + offset
+
+    cand_sim = np.concatenate([best_sim, tile_sim], axis=1)
+    cand_idx = np.concatenate([best_idx, tile_idx], axis=1)
+    if cand_sim.shape[1] <= k:
+        return cand_sim, cand_idx
+    keep = np.argpartition(cand_sim, cand_sim.shape[1] - k, axis=1)[:, -k:]
+    return np.take_along_axis(cand_sim, keep, axis=1), np.take_along_axis(cand_idx, keep, axis=1)
+
+
+def topk_cosine(
+    queries,
+    matrix: EmbeddingMatrix,
+    k: int,
+    query_ids=None,
+    query_block: int = QUERY_BLOCK,
+    post_block: int = POST_BLOCK,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-k nearest posts by cosine distance for each query row.
+
+    If query_ids and matrix.owners are given, a query never gets rows it owns
+    (same as `p.user_id <> u.userid`). Rows with fewer than k matches are
+    padded with id -1 / distance inf.
+
+    Returns (post_ids, distances), both (n_queries, k), sorted by distance.
+    """
+    q = _normalize(np.asarray(queries, dtype=np.float32))
+    nq, n = q.shape[0], len(matrix)
+    out_ids = np.full((nq, k), -1, dtype=np.int64)
+    out_dist = np.full((nq, k), np.inf, dtype=np.float32)
+    if nq == 0 or n == 0 or k <= 0:
+        return out_ids, out_dist
+
+    qids = None if query_ids is None or matrix.owners is None else np.asarray(query_ids, dtype=np.int64)
+    kk = min(k, n)
+
+    for qs in range(0, nq, query_block):
+        qb = q[qs:qs + query_block]
+        qb_ids = None if qids is None else qids[qs:qs + query_block]
+        best_sim = np.empty((qb.shape[0], 0), dtype=np.float32)
+        best_idx = np.empty((qb.shape[0], 0), dtype=np.int64)
+
+        for ps in range(0, n, post_block):
+            sim = qb @ matrix.block(ps, ps + post_block).T
+            if qb_ids is not None:
+                # a query's own posts can never make its top-k
+                sim[matrix.owners[ps:ps + post_block][None, :] == qb_ids[:, None]] = -np.inf
+            best_sim, best_idx = _merge_topk(best_sim, best_idx, sim, ps, kk)
+
+        order = np.argsort(-best_sim, axis=1, kind="stable")
+        best_sim = np.take_along_axis(best_sim, order, axis=1)
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+
+        # masked (own) rows sort last; they become the -1 / inf padding
+        valid = np.isfinite(best_sim)
+        stop = qs + qb.shape[0]
+        out_ids[qs:stop, :kk] = np.where(valid, matrix.ids[best_idx], -1)
+        out_dist[qs:stop, :kk] = np.where(valid, 1.0 - best_sim, np.inf)
+
+    return out_ids, out_dist
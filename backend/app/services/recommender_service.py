@@ -4,11 +4,31 @@ Gets post and people recommendations from database
 python -m app.services.recommender_service
 """
 from __future__ import annotations
-from typing import Any, Dict, List
+import base64
+import binascii
+import json
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
 from app.services.helpers.db_helpers import get_conn
-from app.services.helpers.store_event_recs_in_db_dis import store_post_recs_dis
+from app.services.helpers.store_event_recs_in_db_dis import store_post_recs_dis, apply_post_recency
 from app.services.helpers.store_event_recs_in_db_emb import store_user_avg_embedding, store_post_recs_emb
-from app.services.helpers.store_people_recs_in_db import store_people_recs
+from app.services.helpers.store_people_recs_in_db import (
+    claim_people_changes,
+    ensure_people_changelog,
+    release_people_changes,
+    store_people_recs_bulk,
+    store_people_recs_incremental,
+)
+from app.services.helpers.embedding_store import ensure_quantized_tables, quant_dtype
+from app.services.helpers.user_embeddings import ensure_user_embedding_stats
+from app.services.helpers.feed_cache import FALLBACK_POSTS, cached_feed, invalidate_feeds, user_tag
+from app.services.helpers.feed_shuffle import reseed_users, shuffled
+from app.services.helpers.profile_cards import get_cards, person_card
 
 
 def recommend_posts(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
@@ -19,6 +39,8 @@ def recommend_posts(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
       1) postIDs that appear in BOTH event_recs_emb and event_recs_dis (in dis order)
       2) remaining postIDs that appear only in dis (in dis order)
       3) remaining postIDs that appear only in emb (in emb order)
+    If the user has a shuffle seed (users.recs_seed), that combined list is
+    permuted with it before the limit cut (see feed_shuffle).
 
     Returns:
       List[{
@@ -29,11 +51,95 @@ def recommend_posts(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
         "author_name": str,
         "author_location": str|None
       }]
+
+    Results are cached per (user, limit) in feed_cache until the user's recs
+    are rewritten, a shown author's profile changes, or FEED_CACHE_TTL passes.
     """
+    def load():
+        posts, fallback = _load_recommended_posts(user_id, limit)
+        refs = [user_tag(p["author_id"]) for p in posts if p["author_id"] is not None]
+        if fallback:
+            refs.append(FALLBACK_POSTS)
+        return posts, refs
+
+    return cached_feed(user_id, "posts", limit, load)
+
+
+def _extract_post_ids(recs: Any) -> List[int]:
+    """Extract post IDs from a JSONB[] array of dicts, preserving order."""
+    if not recs:
+        return []
+    out: List[int] = []
+    for rec in recs:
+        if not isinstance(rec, dict):
+            continue
+        pid = rec.get("postid")
+        if pid is None:
+            pid = rec.get("postID")
+        if pid is None:
+            continue
+        try:
+            out.append(int(pid))
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
+def _unique_preserve_order(ids: List[int]) -> List[int]:
+    seen = set()
+    out: List[int] = []
+    for x in ids:
+        if x in seen:
+            continue
+        seen.add(x)
+        out.append(x)
+    return out
+
+
+def _combine_post_ids(emb_recs: Any, dis_recs: Any, now: datetime | None = None) -> List[int]:
+    """Stored emb + dis recs -> post ids in recommend_posts order (both, then dis, then emb)."""
+    emb_ids = _extract_post_ids(emb_recs or [])
+    # dis recs store recency-free scores; apply recency as of now (or the given time)
+    dis_ids = _extract_post_ids(apply_post_recency(dis_recs or [], now=now))
+    emb_set = set(emb_ids)
+    both_in_dis_order = [pid for pid in dis_ids if pid in emb_set]
+    return _unique_preserve_order(both_in_dis_order + dis_ids + emb_ids)
+
+
+def _extract_people_ids(recs: Any) -> List[int]:
+    """people_recs JSONB array -> user ids in stored order."""
+    return [
+        int(d["userid"])
+        for d in (recs or [])
+        if isinstance(d, dict) and d.get("userid") is not None
+    ]
+
+
+def _with_authors(conn, rows: List[Tuple], cards: Dict[int, Dict[str, Any]] | None = None) -> List[Dict[str, Any]]:
+    """(postid, time_posted, post_content, user_id) rows -> post items, authors from the card cache."""
+    if cards is None:
+        cards = get_cards((r[3] for r in rows), conn)
+    out: List[Dict[str, Any]] = []
+    for r in rows:
+        author = cards.get(r[3]) if r[3] is not None else None
+        out.append({
+            "postid": r[0],
+            "time_posted": r[1].isoformat() if r[1] else None,
+            "post_content": r[2],
+            "author_id": r[3],
+            "author_name": (author["name"] if author else None) or "Traveler",
+            "author_location": author["currentCity"] if author else None,
+        })
+    return out
+
+
+def _load_recommended_posts(user_id: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """recommend_posts without the cache; also returns whether the recent-posts fallback was used."""
     sql_get_recs = """
         SELECT
             event_recs_emb,
-            event_recs_dis
+            event_recs_dis,
+            recs_seed
         FROM users
         WHERE userid = %s;
     """
@@ -49,45 +155,13 @@ def recommend_posts(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
             p.postid,
             p.time_posted,
             p.post_content,
-            p.user_id,
-            u.name AS author_name,
-            u.currentCity AS author_location
+            p.user_id
         FROM rec_ids r
         JOIN posts p ON p.postid = r.rec_postid
-        LEFT JOIN users u ON u.userid = p.user_id
         ORDER BY r.ord
         LIMIT %s;
     """
 
-    def extract_post_ids(recs: Any) -> List[int]:
-        """Extract post IDs from a JSONB[] array of dicts, preserving order."""
-        if not recs:
-            return []
-        out: List[int] = []
-        for rec in recs:
-            if not isinstance(rec, dict):
-                continue
-            pid = rec.get("postid")
-            if pid is None:
-                pid = rec.get("postID")
-            if pid is None:
-                continue
-            try:
-                out.append(int(pid))
-            except (TypeError, ValueError):
-                continue
-        return out
-
-    def unique_preserve_order(ids: List[int]) -> List[int]:
-        seen = set()
-        out: List[int] = []
-        for x in ids:
-            if x in seen:
-                continue
-            seen.add(x)
-            out.append(x)
-        return out
-
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -96,44 +170,22 @@ def recommend_posts(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
             row = cur.fetchone()
             if not row:
                 # fallback for new users
-                return get_fallback_posts(conn, limit)
-
-            emb_recs = row[0] or []
-            dis_recs = row[1] or []
-
-            emb_ids = extract_post_ids(emb_recs)
-            dis_ids = extract_post_ids(dis_recs)
-
-            if not emb_ids and not dis_ids:
-                # fallback for users with no recs yet
-                return get_fallback_posts(conn, limit)
-
-            emb_set = set(emb_ids)
+                return get_fallback_posts(conn, limit), True
 
             # 2) build ordered unique list: (both) + (dis) + (emb)
-            both_in_dis_order = [pid for pid in dis_ids if pid in emb_set]
-            combined_ids = unique_preserve_order(both_in_dis_order + dis_ids + emb_ids)
+            combined_ids = _combine_post_ids(row[0], row[1])
 
             if not combined_ids:
-                return get_fallback_posts(conn, limit)
+                # fallback for users with no recs yet
+                return get_fallback_posts(conn, limit), True
 
-            combined_ids = combined_ids[:limit]
+            combined_ids = shuffled(combined_ids, row[2])[:limit]
 
-            # 3) fetch post details with author info in the same order
+            # 3) fetch post details in the same order; authors come from the card cache
             cur.execute(sql_get_posts, (combined_ids, limit))
             rows = cur.fetchall()
 
-            return [
-                {
-                    "postid": r[0],
-                    "time_posted": r[1].isoformat() if r[1] else None,
-                    "post_content": r[2],
-                    "author_id": r[3],
-                    "author_name": r[4] or "Traveler",
-                    "author_location": r[5],
-                }
-                for r in rows
-            ]
+        return _with_authors(conn, rows), False
     finally:
         conn.close()
 
@@ -144,39 +196,26 @@ def recommend_people(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
 
     users.people_recs is assumed to be JSONB (a JSON array) like:
       [{"userid": 123, "score": ...}, {"userid": 456, ...}, ...]
-    We ignore scores and just use the userid ordering as stored.
+    We ignore scores and just use the userid ordering as stored, permuted by
+    users.recs_seed when the user has one.
+
+    Results are cached per (user, limit) in feed_cache (see recommend_posts).
     """
+    def load():
+        people = _load_recommended_people(user_id, limit)
+        return people, [user_tag(p["userid"]) for p in people]
+
+    return cached_feed(user_id, "people", limit, load)
+
+
+def _load_recommended_people(user_id: int, limit: int) -> List[Dict[str, Any]]:
+    """recommend_people without the cache."""
     sql_get_recs = """
-        SELECT people_recs
+        SELECT people_recs, recs_seed
         FROM users
         WHERE userid = %s;
     """
 
-    # preserve ordering using unnest + ordinality, fetch more user details
-    sql_get_users = """
-        WITH rec_ids AS (
-            SELECT rec_userid, ord
-            FROM unnest(%s::int[]) WITH ORDINALITY AS t(rec_userid, ord)
-        )
-        SELECT
-            u.userid,
-            u.name,
-            u.pronouns,
-            u.currentCity,
-            u.travelingTo,
-            u.age,
-            u.bio,
-            u.languages,
-            u.lookingFor,
-            u.culturalIdentity,
-            u.isStudent,
-            u.university
-        FROM rec_ids r
-        JOIN users u ON u.userid = r.rec_userid
-        ORDER BY r.ord
-        LIMIT %s;
-    """
-
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -187,39 +226,17 @@ def recommend_people(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
                 # fallback: return some random users for new users with no recs
                 return get_fallback_people(conn, user_id, limit)
 
-            recs = row[0]
-
             # recs might be a list of dicts (JSONB array decoded by psycopg2)
-            rec_user_ids: list[int] = []
-            for d in recs:
-                if isinstance(d, dict) and "userid" in d and d["userid"] is not None:
-                    rec_user_ids.append(int(d["userid"]))
+            rec_user_ids = _extract_people_ids(row[0])
 
             if not rec_user_ids:
                 return get_fallback_people(conn, user_id, limit)
 
-            rec_user_ids = rec_user_ids[:limit]
+            rec_user_ids = shuffled(rec_user_ids, row[1])[:limit]
 
-            cur.execute(sql_get_users, (rec_user_ids, limit))
-            rows = cur.fetchall()
-
-            return [
-                {
-                    "userid": r[0],
-                    "name": r[1] or f"User {r[0]}",
-                    "pronouns": r[2],
-                    "currentCity": r[3],
-                    "travelingTo": r[4],
-                    "age": r[5],
-                    "bio": r[6],
-                    "languages": r[7] or [],
-                    "lookingFor": r[8] or [],
-                    "culturalIdentity": r[9] or [],
-                    "isStudent": r[10],
-                    "university": r[11],
-                }
-                for r in rows
-            ]
+        # user details from the card cache, in rec order
+        cards = get_cards(rec_user_ids, conn)
+        return [person_card(cards[uid]) for uid in rec_user_ids if uid in cards]
     finally:
         conn.close()
 
@@ -227,10 +244,7 @@ def recommend_people(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
 def get_fallback_people(conn, exclude_user_id: int, limit: int = 20) -> List[Dict[str, Any]]:
     """return random users for new users with no recommendations"""
     sql = """
-        SELECT
-            userid, name, pronouns, currentCity, travelingTo,
-            age, bio, languages, lookingFor, culturalIdentity,
-            isStudent, university
+        SELECT userid
         FROM users
         WHERE userid != %s AND name IS NOT NULL AND bio IS NOT NULL
         ORDER BY RANDOM()
@@ -238,24 +252,9 @@ def get_fallback_people(conn, exclude_user_id: int, limit: int = 20) -> List[Dic
     """
     with conn.cursor() as cur:
         cur.execute(sql, (exclude_user_id, limit))
-        rows = cur.fetchall()
-        return [
-            {
-                "userid": r[0],
-                "name": r[1] or f"User {r[0]}",
-                "pronouns": r[2],
-                "currentCity": r[3],
-                "travelingTo": r[4],
-                "age": r[5],
-                "bio": r[6],
-                "languages": r[7] or [],
-                "lookingFor": r[8] or [],
-                "culturalIdentity": r[9] or [],
-                "isStudent": r[10],
-                "university": r[11],
-            }
-            for r in rows
-        ]
+        user_ids = [int(r[0]) for r in cur.fetchall()]
+    cards = get_cards(user_ids, conn)
+    return [person_card(cards[uid]) for uid in user_ids if uid in cards]
 
 
 def get_fallback_posts(conn, limit: int = 20) -> List[Dict[str, Any]]:
@@ -265,11 +264,8 @@ def get_fallback_posts(conn, limit: int = 20) -> List[Dict[str, Any]]:
             p.postid,
             p.time_posted,
             p.post_content,
-            p.user_id,
-            u.name AS author_name,
-            u.currentCity AS author_location
+            p.user_id
         FROM posts p
-        LEFT JOIN users u ON u.userid = p.user_id
         WHERE p.post_content IS NOT NULL
         ORDER BY p.time_posted DESC NULLS LAST
         LIMIT %s;
@@ -277,17 +273,7 @@ def get_fallback_posts(conn, limit: int = 20) -> List[Dict[str, Any]]:
     with conn.cursor() as cur:
         cur.execute(sql, (limit,))
         rows = cur.fetchall()
-        return [
-            {
-                "postid": r[0],
-                "time_posted": r[1].isoformat() if r[1] else None,
-                "post_content": r[2],
-                "author_id": r[3],
-                "author_name": r[4] or "Traveler",
-                "author_location": r[5],
-            }
-            for r in rows
-        ]
+    return _with_authors(conn, rows)
 
 
 def recommend_mixed_feed(user_id: int, limit: int = 50, seed: int | None = None) -> List[Dict[str, Any]]:
@@ -297,9 +283,15 @@ def recommend_mixed_feed(user_id: int, limit: int = 50, seed: int | None = None)
       - tag each item with type {"post","person"}
       - shuffle everything together
       - return first `limit`
+
+    seed defaults to the user's stored shuffle seed, so the mix is stable
+    until they shuffle again; without one it is random per call.
     """
     import random
 
+    if seed is None:
+        seed = _stored_seed(user_id)
+
     posts = recommend_posts(user_id, limit=limit)
     people = recommend_people(user_id, limit=limit)
 
@@ -314,13 +306,438 @@ def recommend_mixed_feed(user_id: int, limit: int = 50, seed: int | None = None)
     return mixed[:limit]
 
 
-def refresh_feed(refresh=False):
+# fallback candidates when a user has no stored recs of a kind
+FEED_FALLBACK_SIZE = 50
+
+SQL_FEED_RECS = """
+SELECT event_recs_emb, event_recs_dis, people_recs, recs_seed
+FROM users
+WHERE userid = %s;
+"""
+
+SQL_FEED_FALLBACK_POSTS = """
+SELECT postid
+FROM posts
+WHERE post_content IS NOT NULL
+ORDER BY time_posted DESC NULLS LAST
+LIMIT %s;
+"""
+
+# random-looking but fixed per viewer, so a rebuilt feed order keeps its people
+SQL_FEED_FALLBACK_PEOPLE = """
+SELECT userid
+FROM users
+WHERE userid != %(user_id)s AND name IS NOT NULL AND bio IS NOT NULL
+ORDER BY md5(userid::text || ':' || %(user_id)s::text), userid
+LIMIT %(n)s;
+"""
+
+# posts on one page (authors and people come from the card cache)
+SQL_FEED_PAGE_POSTS = """
+SELECT postid, time_posted, post_content, user_id
+FROM posts
+WHERE postid = ANY(%s);
+"""
+
+
+def _order_version(order: List[Tuple[str, int]]) -> str:
+    """Fingerprint of a feed order; cursors are only valid for the order they were cut from."""
+    return format(zlib.crc32(json.dumps(order, separators=(",", ":")).encode()), "08x")
+
+
+class InvalidCursor(ValueError):
+    """A feed cursor that wasn't produced by recommend_feed."""
+
+
+def _encode_cursor(offset: int, version: str, ranked_at: int) -> str:
+    raw = json.dumps({"o": offset, "v": version, "t": ranked_at}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, str, int | None]:
+    """Cursor -> (offset into the feed order, order version, recency time); InvalidCursor if malformed."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(raw["o"])
+        version = str(raw["v"])
+        # cursors cut before the recency time was frozen into them have no "t"
+        ranked_at = int(raw["t"]) if raw.get("t") is not None else None
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError) as e:
+        raise InvalidCursor("invalid cursor") from e
+    if offset < 0:
+        raise InvalidCursor("invalid cursor")
+    return offset, version, ranked_at
+
+
+def _interleave(posts: List[int], people: List[int]) -> List[Tuple[str, int]]:
+    """Merge both ranked lists, spreading the shorter one evenly through the longer."""
+    tagged = [((i + 1) / (len(posts) + 1), "post", pid) for i, pid in enumerate(posts)]
+    tagged += [((i + 1) / (len(people) + 1), "person", uid) for i, uid in enumerate(people)]
+    tagged.sort(key=lambda t: t[0])
+    return [(kind, item_id) for _, kind, item_id in tagged]
+
+
+def _load_feed_order(conn, user_id: int, ranked_at: int | None = None) -> Tuple[List[Any], List[Any]]:
+    """
+    [order, ranked_at] plus cache refs: order is every (kind, id) in the
+    user's unified feed in display order, with post recency applied as of
+    ranked_at (epoch seconds, default now) so the order can be rebuilt exactly.
+    """
+    if ranked_at is None:
+        ranked_at = int(time.time())
+    now = datetime.fromtimestamp(ranked_at, timezone.utc)
+    refs: List[Any] = []
+    with conn.cursor() as cur:
+        cur.execute(SQL_FEED_RECS, (user_id,))
+        row = cur.fetchone() or (None, None, None, None)
+
+        post_ids = _combine_post_ids(row[0], row[1], now=now)
+        if not post_ids:
+            cur.execute(SQL_FEED_FALLBACK_POSTS, (FEED_FALLBACK_SIZE,))
+            post_ids = [int(r[0]) for r in cur.fetchall()]
+            refs.append(FALLBACK_POSTS)
+
+        people_ids = _extract_people_ids(row[2])
+        if not people_ids:
+            cur.execute(SQL_FEED_FALLBACK_PEOPLE, {"user_id": user_id, "n": FEED_FALLBACK_SIZE})
+            people_ids = [int(r[0]) for r in cur.fetchall()]
+    conn.commit()
+    return [shuffled(_interleave(post_ids, people_ids), row[3]), ranked_at], refs
+
+
+def _hydrate_feed_page(conn, page: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    post_ids = [i for k, i in page if k == "post"]
+    rows: List[Tuple] = []
+    if post_ids:
+        with conn.cursor() as cur:
+            cur.execute(SQL_FEED_PAGE_POSTS, (post_ids,))
+            rows = cur.fetchall()
+        conn.commit()
+    # one card lookup for authors and people together
+    cards = get_cards([r[3] for r in rows] + [i for k, i in page if k == "person"], conn)
+    posts = {p["postid"]: p for p in _with_authors(conn, rows, cards)}
+
+    items: List[Dict[str, Any]] = []
+    for kind, item_id in page:
+        if kind == "post" and item_id in posts:
+            items.append({"type": "post", **posts[item_id]})
+        elif kind == "person" and item_id in cards:
+            items.append({"type": "person", **person_card(cards[item_id])})
+    return items
+
+
+def recommend_feed(user_id: int, limit: int = 20, cursor: str | None = None) -> Dict[str, Any]:
+    """
+    Unified posts + people feed, one page at a time.
+
+    The full feed order (post recs in recommend_posts order, people recs
+    spread evenly through them, permuted by the user's shuffle seed) is
+    built once and cached in feed_cache; each page then costs one query for
+    exactly its posts, with people and authors served from the card cache.
+
+    Cursors carry a fingerprint of the order they were cut from. The order
+    is rebuilt after TTL expiry, a recs refresh, a reshuffle or (fallback
+    feeds) a new post; an offset into a different order would skip or repeat
+    items, so a cursor from an older order restarts the feed from the top
+    with "restarted": True (the client should replace what it has shown).
+    Cursors also carry the time post recency was applied at, so a TTL
+    rebuild mid-scroll ranks as of that time and keeps the same order.
+
+    Returns {"items": [{"type": "post"|"person", ...}], "next_cursor": str|None,
+    "restarted": bool}. Pass next_cursor back to get the following page; None
+    means the end. Raises InvalidCursor on a malformed cursor.
+    """
+    offset, version, ranked_at = _decode_cursor(cursor) if cursor else (0, None, None)
+    conn = get_conn()
+    try:
+        order, built_at = cached_feed(user_id, "feed_order", 0, lambda: _load_feed_order(conn, user_id))
+        if ranked_at is not None and ranked_at != built_at:
+            # the cached order was rebuilt since this cursor was cut; rank as of the cursor's time
+            order, built_at = cached_feed(
+                user_id, "feed_order", ranked_at, lambda: _load_feed_order(conn, user_id, ranked_at)
+            )
+        current = _order_version(order)
+        restarted = version is not None and version != current
+        if restarted:
+            offset = 0
+        page = order[offset:offset + limit]
+        items = _hydrate_feed_page(conn, page) if page else []
+    finally:
+        conn.close()
+
+    next_offset = offset + len(page)
+    return {
+        "items": items,
+        "next_cursor": _encode_cursor(next_offset, current, built_at) if next_offset < len(order) else None,
+        "restarted": restarted,
+    }
+
+
+def _stored_seed(user_id: int) -> int | None:
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT recs_seed FROM users WHERE userid = %s;", (user_id,))
+            row = cur.fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+class RefreshCancelled(Exception):
+    """Raised between refresh stages when the caller asked to stop."""
+
+
+def prepare_refresh(conn) -> None:
+    """
+    One-time DDL the refresh stages rely on: people_recs_changelog, the
+    user_embedding_stats trigger table and (EMB_QUANT) the quantized side tables.
+
+    Run once per refresh before any stage -- in the parent before shards fan
+    out -- so the stages themselves only read and write rows. Concurrent
+    CREATE ... IF NOT EXISTS from several shards can fail on the catalog's
+    unique index. The ANN index on posts is created at setup (see vector_index).
+    """
+    ensure_people_changelog(conn)
+    ensure_user_embedding_stats(conn)
+    if quant_dtype() is not None:
+        ensure_quantized_tables(conn)
+
+
+def _run_refresh_stages(
+    conn,
+    refresh: bool = False,
+    user_ids: List[int] | None = None,
+    incremental: bool = False,
+    progress: Callable[[str, int, float], None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    people: bool = True,
+    users_total: int | None = None,
+) -> Dict[str, float]:
+    """
+    Run every recs stage on one connection (optionally for a subset of users).
+
+    Without user_ids this is a whole refresh and runs prepare_refresh first;
+    with user_ids (a refresh shard) the caller has already done it.
+
+    incremental=True recomputes people_recs only for users affected by
+    people_recs_changelog (ignored when user_ids is given). people=False
+    skips the people_recs stage (the caller runs it).
+
+    Recs are always stored ranked; refresh=True instead gives the users in
+    scope a new shuffle seed, applied at read time (see feed_shuffle).
+
+    progress(stage, users, seconds) is called after each stage; should_stop()
+    is checked before each stage (RefreshCancelled). Every stage commits its
+    own writes, so stopping between stages leaves each recs column consistent.
+    users_total is the user count reported for whole-table stages (counted
+    here if not given); the incremental people stage reports the users it
+    actually updated.
+
+    Returns seconds spent per stage.
+    """
+    if user_ids is None:
+        prepare_refresh(conn)
+
+    incremental = incremental and user_ids is None
+    stages = (
+        ("post_recs_dis", lambda: store_post_recs_dis(conn, user_ids=user_ids)),
+        ("user_avg_embedding", lambda: store_user_avg_embedding(conn, user_ids=user_ids)),
+        ("post_recs_emb", lambda: store_post_recs_emb(conn, user_ids=user_ids)),
+    )
+    if people and incremental:
+        stages += (("people_recs", lambda: store_people_recs_incremental(conn)),)
+    elif people:
+        stages += (("people_recs", lambda: store_people_recs_bulk(conn, user_ids=user_ids)),)
+    if refresh:
+        stages += (("shuffle_seed", lambda: reseed_users(conn, user_ids=user_ids)),)
+
+    if user_ids is not None:
+        n_users = len(user_ids)
+    elif users_total is not None or progress is None:
+        n_users = users_total or 0
+    else:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM users;")
+            n_users = int(cur.fetchone()[0])
+        conn.commit()
+
+    timings: Dict[str, float] = {}
+    for name, stage in stages:
+        if should_stop is not None and should_stop():
+            raise RefreshCancelled(name)
+        started = time.perf_counter()
+        done = stage()
+        timings[name] = round(time.perf_counter() - started, 3)
+        if progress is not None:
+            users = int(done or 0) if name == "people_recs" and incremental else n_users
+            progress(name, users, timings[name])
+    return timings
+
+
+def refresh_feed_serial(
+    conn,
+    refresh: bool = False,
+    incremental: bool = False,
+    progress: Callable[[str, int, float], None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    users_total: int | None = None,
+) -> Dict[str, Any]:
+    """
+    Refresh all recs tables on `conn` in this process (see _run_refresh_stages).
+
+    Returns a report in the shape of refresh_feed_parallel's:
+      {"workers": 1, "incremental", "users", "seconds", "stages": {stage: seconds}}
+    """
+    started = time.perf_counter()
+    timings = _run_refresh_stages(
+        conn, refresh=refresh, incremental=incremental,
+        progress=progress, should_stop=should_stop, users_total=users_total,
+    )
+    return {
+        "workers": 1,
+        "incremental": incremental,
+        "users": users_total,
+        "seconds": round(time.perf_counter() - started, 3),
+        "stages": timings,
+    }
+
+
+def _refresh_shard(shard: int, user_ids: List[int], refresh: bool, people: bool = True) -> Dict[str, Any]:
+    """Process-pool worker: refresh one shard of users on its own connection."""
+    started = time.perf_counter()
+    conn = get_conn()
+    try:
+        timings = _run_refresh_stages(conn, refresh=refresh, user_ids=user_ids, people=people)
+    finally:
+        conn.close()
+    return {
+        "shard": shard,
+        "users": len(user_ids),
+        "timings": timings,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def refresh_feed_parallel(
+    refresh: bool = False,
+    workers: int | None = None,
+    progress: Callable[[str, int, float], None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    incremental: bool = False,
+) -> Dict[str, Any]:
+    """
+    Refresh all recs tables with user ids sharded across `workers` processes.
+
+    prepare_refresh runs once here first; each worker then opens its own
+    connection and runs every stage for its shard (row writes only).
+    workers defaults to $REFRESH_WORKERS, then the number of CPUs.
+
+    people_recs_changelog is handled here, not in the shards: a full run
+    clears the entries pending when it started once every shard finished;
+    incremental=True skips people_recs in the shards and runs
+    store_people_recs_incremental here afterwards.
+
+    progress(stage, users, seconds) is called per stage as each shard
+    finishes. If should_stop() turns true, shards that haven't started are
+    cancelled (running shards finish) and RefreshCancelled is raised.
+
+    Returns a merged report:
+      {"workers", "incremental", "users", "seconds", "stages": {stage: {"max", "total"}}, "shards": [...]}
+    """
+    if workers is None:
+        workers = int(os.getenv("REFRESH_WORKERS", "0")) or os.cpu_count() or 1
+
     conn = get_conn()
-    store_post_recs_dis(conn, refresh)
-    store_user_avg_embedding(conn)
-    store_post_recs_emb(conn,refresh)
-    store_people_recs(conn,refresh)
-    return "success"
+    try:
+        # once here, so the shard workers never run DDL concurrently
+        prepare_refresh(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT userid FROM users ORDER BY userid;")
+            user_ids = [int(r[0]) for r in cur.fetchall()]
+        conn.commit()
+        claimed = [] if incremental else claim_people_changes(conn)
+
+        workers = max(1, min(workers, len(user_ids) or 1))
+        # strided shards keep sizes balanced and spread id ranges across workers
+        shards = [user_ids[i::workers] for i in range(workers)]
+
+        started = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [
+                pool.submit(_refresh_shard, i, shard, refresh, not incremental)
+                for i, shard in enumerate(shards)
+            ]
+            results = []
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for f in done:
+                    r = f.result()
+                    results.append(r)
+                    if progress is not None:
+                        for name, secs in r["timings"].items():
+                            progress(name, r["users"], secs)
+                if pending and should_stop is not None and should_stop():
+                    for f in pending:
+                        f.cancel()
+                    raise RefreshCancelled("shards")
+            results.sort(key=lambda r: r["shard"])
+
+        stages: Dict[str, Dict[str, float]] = {}
+        for r in results:
+            for name, secs in r["timings"].items():
+                agg = stages.setdefault(name, {"max": 0.0, "total": 0.0})
+                agg["max"] = max(agg["max"], secs)
+                agg["total"] = round(agg["total"] + secs, 3)
+
+        if incremental:
+            if should_stop is not None and should_stop():
+                raise RefreshCancelled("people_recs")
+            people_started = time.perf_counter()
+            updated = store_people_recs_incremental(conn)
+            secs = round(time.perf_counter() - people_started, 3)
+            stages["people_recs"] = {"max": secs, "total": secs}
+            if progress is not None:
+                progress("people_recs", updated, secs)
+        else:
+            release_people_changes(conn, claimed)
+            conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "workers": workers,
+        "incremental": incremental,
+        "users": len(user_ids),
+        "seconds": round(time.perf_counter() - started, 3),
+        "stages": stages,
+        "shards": results,
+    }
+
+
+def refresh_feed(refresh=False, workers: int | None = None, incremental: bool = False) -> Dict[str, Any]:
+    """
+    Recompute every recs table; returns the refresh report.
+
+    workers > 1 shards users across a process pool (see refresh_feed_parallel);
+    otherwise everything runs on one connection in this process
+    (refresh_feed_serial). incremental=True limits people_recs to users
+    touched since the last run in both modes.
+    """
+    if workers is not None and workers > 1:
+        try:
+            return refresh_feed_parallel(refresh=refresh, workers=workers, incremental=incremental)
+        finally:
+            # the pool's writes invalidated caches in the worker processes, not here
+            invalidate_feeds()
+
+    conn = get_conn()
+    try:
+        return refresh_feed_serial(conn, refresh=refresh, incremental=incremental)
+    finally:
+        conn.close()
 
 if __name__=="__main__":
     test_user_id = 482193
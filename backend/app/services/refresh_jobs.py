@@ -0,0 +1,222 @@
+"""
+Recs refresh as a background job (single-flight, progress, cancellation).
+
+start_refresh_job() runs refresh_feed's stages on a daemon thread and returns
+immediately with a job id. While a job is queued or running, further
+triggers return that same job instead of starting a duplicate recompute. A
+Postgres advisory lock extends this across API worker processes.
+
+    job, started = start_refresh_job(refresh=True)
+    get_job(job.id).to_dict()     # status, last finished stage, per-stage progress
+    cancel_job(job.id)            # stops before the next stage; aborts the running statement
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import psycopg2
+
+from app.services.helpers.db_helpers import connect
+from app.services.helpers.feed_cache import invalidate_feeds
+from app.services.recommender_service import RefreshCancelled, refresh_feed_parallel, refresh_feed_serial
+
+# arbitrary app-wide key for pg_try_advisory_lock
+REFRESH_LOCK_KEY = 0x7265636673
+
+# finished jobs kept for status lookups
+MAX_FINISHED_JOBS = 20
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+
+
+@dataclass
+class RefreshJob:
+    id: str
+    refresh: bool
+    workers: int
+    incremental: bool
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    last_stage: Optional[str] = None
+    # stage -> {"users": processed so far, "seconds": summed stage time}
+    progress: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    users_total: Optional[int] = None
+    # refresh_feed_parallel / refresh_feed_serial report once succeeded
+    report: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _conn: Any = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with _lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "refresh": self.refresh,
+            "workers": self.workers,
+            "incremental": self.incremental,
+            "last_stage": self.last_stage,
+            "users_total": self.users_total,
+            "progress": {k: dict(v) for k, v in self.progress.items()},
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "report": self.report,
+            "error": self.error,
+        }
+
+
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+_active: Optional[RefreshJob] = None
+
+
+def _record_progress(job: RefreshJob, stage: str, users: int, seconds: float) -> None:
+    with _lock:
+        entry = job.progress.setdefault(stage, {"users": 0, "seconds": 0.0})
+        entry["users"] += users
+        entry["seconds"] = round(entry["seconds"] + seconds, 3)
+        job.last_stage = stage
+
+
+def _try_lock(conn: psycopg2.extensions.connection) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s);", (REFRESH_LOCK_KEY,))
+        got = bool(cur.fetchone()[0])
+    conn.commit()
+    return got
+
+
+def _run(job: RefreshJob) -> None:
+    global _active
+    conn = None
+    try:
+        # own connection, not a pooled one: the session holds the advisory lock
+        conn = connect()
+        with _lock:
+            job._conn = conn
+            if job.status == "queued":
+                job.status = "running"
+            job.started_at = time.time()
+
+        if not _try_lock(conn):
+            raise RuntimeError("a refresh is already running in another process")
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM users;")
+            job.users_total = int(cur.fetchone()[0])
+        conn.commit()
+
+        progress = lambda stage, users, seconds: _record_progress(job, stage, users, seconds)
+        if job.workers > 1:
+            try:
+                report = refresh_feed_parallel(
+                    refresh=job.refresh, workers=job.workers, incremental=job.incremental,
+                    progress=progress, should_stop=job._cancel.is_set,
+                )
+            finally:
+                # shard writes invalidated caches in the worker processes only
+                invalidate_feeds()
+        else:
+            report = refresh_feed_serial(
+                conn, refresh=job.refresh, incremental=job.incremental,
+                progress=progress, should_stop=job._cancel.is_set, users_total=job.users_total,
+            )
+        with _lock:
+            job.report = report
+        status, error = "succeeded", None
+    except RefreshCancelled:
+        status, error = "cancelled", None
+    except psycopg2.extensions.QueryCanceledError:
+        # cancel_job() interrupted the statement in flight
+        status, error = ("cancelled", None) if job._cancel.is_set() else ("failed", "query cancelled")
+    except Exception as e:
+        traceback.print_exc()
+        status, error = "failed", f"{type(e).__name__}: {e}"
+    finally:
+        if conn is not None:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            # closing the session releases the advisory lock
+            conn.close()
+
+    with _lock:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job._conn = None
+        if _active is job:
+            _active = None
+        while len(_jobs) > MAX_FINISHED_JOBS:
+            oldest = next(iter(_jobs.values()))
+            if oldest.status in ACTIVE_STATUSES:
+                break
+            _jobs.popitem(last=False)
+
+
+def start_refresh_job(
+    refresh: bool = False,
+    workers: int = 1,
+    incremental: bool = False,
+) -> Tuple[RefreshJob, bool]:
+    """
+    Start a background refresh, or join the one already in progress.
+
+    Returns (job, started): started is False when an active job was returned
+    (its parameters win).
+    """
+    global _active
+    with _lock:
+        if _active is not None and _active.status in ACTIVE_STATUSES:
+            return _active, False
+        job = RefreshJob(id=uuid.uuid4().hex, refresh=refresh, workers=max(1, int(workers)), incremental=incremental)
+        _jobs[job.id] = job
+        _active = job
+
+    threading.Thread(target=_run, args=(job,), name=f"refresh-{job.id[:8]}", daemon=True).start()
+    return job, True
+
+
+def get_job(job_id: str) -> Optional[RefreshJob]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def active_job() -> Optional[RefreshJob]:
+    with _lock:
+        return _active
+
+
+def cancel_job(job_id: str) -> Optional[RefreshJob]:
+    """
+    Ask a job to stop: no further stage starts, and the statement running on
+    the job's connection is cancelled. Parallel shards already running finish.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return job
+        job._cancel.set()
+        job.status = "cancelling"
+        conn = job._conn
+    if conn is not None and not conn.closed:
+        try:
+            conn.cancel()
+        except psycopg2.Error:
+            pass
+    return job
@@ -1,10 +1,11 @@
 """
 generate all recommendations for users
 
-this script detects whether pgvector is available and runs the appropriate
+this script detects whether embeddings are available and runs the appropriate
 recommendation generation:
-- with pgvector: uses embedding-based similarity
-- without pgvector: uses random recommendations
+- with embeddings: uses embedding-based similarity (pgvector in the database,
+  or the in-process numpy engine when pgvector isn't installed)
+- without embeddings: uses random recommendations
 
 run: DB_USER=$(whoami) DB_NAME=hacks13 python backend/db/generate_all_recs.py
 """
@@ -60,12 +61,15 @@ def generate_vector_recs(conn):
     print('Generating vector-based recommendations...')
     
     # import the helpers
-    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
     from app.services.helpers.store_event_recs_in_db_emb import (
+        embedding_engine,
         store_user_avg_embedding,
-        store_events_recs_candidates
+        store_post_recs_emb
     )
-    from app.services.helpers.store_people_recs_in_db import generate_all_people_recs
+    from app.services.helpers.store_people_recs_in_db import store_people_recs_bulk
+    
+    print(f'Vector search engine: {embedding_engine(conn)}')
     
     # generate user embeddings from posts
     print('Computing user embeddings from posts...')
@@ -73,11 +77,11 @@ def generate_vector_recs(conn):
     
     # generate event recommendations
     print('Generating event recommendations...')
-    store_events_recs_candidates(conn)
+    store_post_recs_emb(conn)
     
     # generate people recommendations
     print('Generating people recommendations...')
-    generate_all_people_recs(conn)
+    store_people_recs_bulk(conn)
     
     print('Vector-based recommendations complete')
 
@@ -85,8 +89,10 @@ def generate_vector_recs(conn):
 def generate_random_recs(conn):
     """generate random recommendations when vector not available"""
     import random
-    from psycopg2.extras import Json
-    
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from app.services.helpers.recs_writer import write_recs
+
     print('Generating random recommendations...')
     cur = conn.cursor()
 
@@ -101,6 +107,8 @@ def generate_random_recs(conn):
     print(f'  Found {len(posts)} posts')
 
     # for each user, generate recommendations
+    people_staged = []
+    event_staged = []
     for i, uid in enumerate(user_ids):
         # get other users for people recommendations (exclude self)
         other_users = [u for u in user_ids if u != uid]
@@ -112,24 +120,17 @@ def generate_random_recs(conn):
         random.shuffle(other_posts)
         event_recs = [{'postid': p, 'distance': round(random.random(), 3)} for p in other_posts[:50]]
 
-        # update user with people_recs (jsonb)
-        cur.execute(
-            'UPDATE users SET people_recs = %s::jsonb WHERE userid = %s',
-            (Json(people_recs), uid)
-        )
-
-        # update user with event_recs_emb (jsonb[])
-        event_recs_json = [Json(e) for e in event_recs]
-        cur.execute(
-            'UPDATE users SET event_recs_emb = %s::jsonb[] WHERE userid = %s',
-            (event_recs_json, uid)
-        )
-        
-        conn.commit()
+        people_staged.append((uid, people_recs))
+        event_staged.append((uid, event_recs))
 
         if (i + 1) % 20 == 0:
             print(f'  Processed {i + 1}/{len(user_ids)} users')
 
+    # people_recs (jsonb) + event_recs_emb (jsonb[]) in one transaction
+    write_recs(conn, 'people_recs', people_staged, commit=False)
+    write_recs(conn, 'event_recs_emb', event_staged, commit=False)
+    conn.commit()
+
     print(f'Random recommendations complete for {len(user_ids)} users')
     cur.close()
 
@@ -162,8 +163,8 @@ def main():
     print(f'pgvector available: {vector_available}')
     print(f'embeddings exist: {embeddings_exist}')
     
-    if vector_available and embeddings_exist:
-        # use vector-based recommendations
+    if embeddings_exist:
+        # use vector-based recommendations (numpy engine if pgvector is missing)
         try:
             generate_vector_recs(conn)
         except Exception as e:
@@ -2,15 +2,19 @@
 generate mock recommendations for all users
 run: DB_USER=$(whoami) DB_NAME=hacks13 python backend/db/generate_recs.py
 
-this script generates random recommendations when pgvector is not available
-for vector-based recommendations, install pgvector and use the store_*_recs scripts
+people recs are random placeholders (scored people recs: store_people_recs_in_db);
+event recs start random and are then replaced with nearest posts by embedding
+for every user that has one (pgvector, or in-process search on REAL[] columns)
 """
 
 import json
 import psycopg2
 import os
 import random
-from psycopg2.extras import Json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app.services.helpers.recs_writer import write_recs
 
 DB_NAME = os.getenv('DB_NAME', 'hacks13')
 DB_USER = os.getenv('DB_USER', 'jennifer')
@@ -19,15 +23,6 @@ DB_HOST = os.getenv('DB_HOST', 'localhost')
 DB_PORT = os.getenv('DB_PORT', '5432')
 
 
-def check_vector_available(conn) -> bool:
-    """check if pgvector extension is enabled"""
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM pg_extension WHERE extname = 'vector'")
-    result = cur.fetchone()[0] > 0
-    cur.close()
-    return result
-
-
 def generate_random_recs(conn):
     """generate random recommendations for all users"""
     cur = conn.cursor()
@@ -43,6 +38,8 @@ def generate_random_recs(conn):
     print(f'Found {len(posts)} posts')
 
     # for each user, generate recommendations
+    people_staged = []
+    event_staged = []
     for i, uid in enumerate(user_ids):
         # get other users for people recommendations (exclude self)
         other_users = [u for u in user_ids if u != uid]
@@ -54,24 +51,17 @@ def generate_random_recs(conn):
         random.shuffle(other_posts)
         event_recs = [{'postid': p, 'distance': round(random.random(), 3)} for p in other_posts[:50]]
 
-        # update user with people_recs (jsonb)
-        cur.execute(
-            'UPDATE users SET people_recs = %s::jsonb WHERE userid = %s',
-            (Json(people_recs), uid)
-        )
-
-        # update user with event_recs_emb (jsonb[])
-        event_recs_json = [Json(e) for e in event_recs]
-        cur.execute(
-            'UPDATE users SET event_recs_emb = %s::jsonb[] WHERE userid = %s',
-            (event_recs_json, uid)
-        )
-        
-        conn.commit()
+        people_staged.append((uid, people_recs))
+        event_staged.append((uid, event_recs))
 
         if (i + 1) % 20 == 0:
             print(f'Processed {i + 1}/{len(user_ids)} users')
 
+    # people_recs (jsonb) + event_recs_emb (jsonb[]) in one transaction
+    write_recs(conn, 'people_recs', people_staged, commit=False)
+    write_recs(conn, 'event_recs_emb', event_staged, commit=False)
+    conn.commit()
+
     print(f'Generated recommendations for all {len(user_ids)} users')
     cur.close()
 
@@ -85,15 +75,25 @@ def main():
         port=DB_PORT
     )
     
-    # check if vector is available
-    if check_vector_available(conn):
-        print('pgvector detected - but using random recs for simplicity')
-        print('for vector-based recs, run the store_*_recs scripts directly')
-    else:
-        print('pgvector not available - using random recommendations')
-    
+    from app.services.helpers.store_event_recs_in_db_emb import (
+        embedding_engine,
+        store_user_avg_embedding,
+        store_post_recs_emb,
+    )
+
+    print('people recs: random (for scored people recs run store_people_recs_in_db)')
+    print('event recs: random placeholders first')
     generate_random_recs(conn)
     
+    # event recs from post embeddings when there are any (in-process search if no pgvector)
+    engine = embedding_engine(conn)
+    if engine is None:
+        print('event recs: no post_embedding column - keeping the random event recs')
+    else:
+        print(f'event recs: replacing with nearest posts by embedding ({engine}) for users with an embedding')
+        store_user_avg_embedding(conn)
+        store_post_recs_emb(conn)
+    
     # verify one user
     cur = conn.cursor()
     cur.execute('SELECT userid, jsonb_array_length(people_recs), array_length(event_recs_emb, 1) FROM users WHERE userid = 482193')
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import random
 from datetime import datetime, timedelta
@@ -8,6 +9,9 @@ from sentence_transformers import SentenceTransformer
 from google import genai
 load_dotenv()
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from app.services.helpers.embedding_cache import EmbeddingCache, cached_encoder
+
 # load valid user ids from profiles.json to ensure referential integrity
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 with open(os.path.join(SCRIPT_DIR, "profiles.json"), "r", encoding="utf-8") as f:
@@ -86,9 +90,17 @@ for uid in user_ids:
         post_keys_in_order.append(key)
         post_id += 1
 
-# Embeddings (local)
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-emb = model.encode(all_contents, convert_to_numpy=True, normalize_embeddings=True)
+# Embeddings (local); texts seen in earlier runs come from the embedding cache
+model_name = "sentence-transformers/all-MiniLM-L6-v2"
+model = SentenceTransformer(model_name)
+cache = EmbeddingCache()
+encode = cached_encoder(
+    lambda texts: model.encode(texts, convert_to_numpy=True, normalize_embeddings=True),
+    model_name,
+    cache,
+)
+emb = encode(all_contents)
+print(f"Embedding cache: {cache.stats()}")
 
 for key, vec in zip(post_keys_in_order, emb):
     data[key]["embedding"] = vec.tolist()
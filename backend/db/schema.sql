@@ -4,6 +4,10 @@ DROP TABLE IF EXISTS posts CASCADE;
 DROP TABLE IF EXISTS conversations CASCADE;
 DROP TABLE IF EXISTS auth CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
+DROP TABLE IF EXISTS people_recs_changelog CASCADE;
+DROP TABLE IF EXISTS user_embedding_stats CASCADE;
+DROP TABLE IF EXISTS post_embeddings_q CASCADE;
+DROP TABLE IF EXISTS user_embeddings_q CASCADE;
 
 CREATE EXTENSION IF NOT EXISTS vector;
 
@@ -43,6 +47,7 @@ CREATE TABLE IF NOT EXISTS Users (
     event_recs_emb JSONB[],
     event_recs_dis JSONB,
     people_recs JSONB,
+    recs_seed INT,
     user_embedding vector(384),
     RSVP INT[]
 );
@@ -56,6 +61,7 @@ CREATE TABLE IF NOT EXISTS Posts (
     is_event BOOLEAN DEFAULT FALSE,
     time_posted TIMESTAMPTZ DEFAULT NOW(),
     rsvps INT[],
+    tags TEXT[],
     post_embedding vector(384),
     capacity INT,
     start_time TIMESTAMPTZ,
@@ -68,6 +74,11 @@ CREATE TABLE Conversations (
   user_a INT NOT NULL,
   user_b INT NOT NULL,
   last_messaged TIMESTAMPTZ DEFAULT NOW(),
+  -- newest message, kept by send_message (inbox preview without reading Messages)
+  last_message_id INT,
+  last_message_snippet TEXT,
+  last_message_sender INT,
+  last_message_at TIMESTAMPTZ,
   user_low  INT GENERATED ALWAYS AS (LEAST(user_a, user_b)) STORED,
   user_high INT GENERATED ALWAYS AS (GREATEST(user_a, user_b)) STORED
 );
@@ -86,3 +97,118 @@ CREATE TABLE Auth (
     userID INT PRIMARY KEY REFERENCES Users(userID),
     password_hash VARCHAR(255) NOT NULL
 );
+
+-- ANN index for the per-user nearest-posts lateral in store_post_recs_emb (cosine distance, <=>)
+-- build params: HNSW_M / HNSW_EF_CONSTRUCTION; see app/services/helpers/vector_index.py
+CREATE INDEX IF NOT EXISTS idx_posts_post_embedding_hnsw ON Posts
+    USING hnsw (post_embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Inbox lookups (user_a = ? OR user_b = ?) and time-ordered conversation history
+CREATE INDEX IF NOT EXISTS idx_conversations_users ON Conversations (user_a, user_b);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_b ON Conversations (user_b);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_time ON Messages (conversationID, timestamp, messageID);
+
+-- Reverse block lookup ("who blocked this user?") via BlockedUsers @> ARRAY[id]
+CREATE INDEX IF NOT EXISTS idx_users_blockedusers ON Users USING GIN (BlockedUsers);
+
+-- Posts still waiting for the background embedding worker
+CREATE INDEX IF NOT EXISTS idx_posts_unembedded ON Posts (PostID) WHERE post_embedding IS NULL;
+
+-- Users whose people_recs inputs changed since the last people refresh
+-- (filled by trigger on signup and on city/travel/language/culture/goal/friend/block updates)
+CREATE TABLE IF NOT EXISTS people_recs_changelog (
+    userID INT PRIMARY KEY,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION mark_people_recs_dirty() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO people_recs_changelog (userID, changed_at)
+    VALUES (NEW.userID, clock_timestamp())
+    ON CONFLICT (userID) DO UPDATE SET changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_people_recs_dirty ON Users;
+CREATE TRIGGER users_people_recs_dirty
+    AFTER INSERT OR UPDATE OF currentCity, travelingTo, languages, culturalIdentity, lookingFor, Friends, BlockedUsers
+    ON Users
+    FOR EACH ROW EXECUTE FUNCTION mark_people_recs_dirty();
+
+-- Running per-user post count + embedding sum; a trigger on Posts keeps
+-- Users.user_embedding = sum / count current (rebuild: python -m app.services.helpers.user_embeddings --rebuild)
+CREATE TABLE IF NOT EXISTS user_embedding_stats (
+    userID INT PRIMARY KEY,
+    post_count INT NOT NULL,
+    emb_sum DOUBLE PRECISION[] NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION apply_user_embedding_delta(uid INT, emb REAL[], sign INT) RETURNS void AS $$
+DECLARE
+    n INT;
+    total DOUBLE PRECISION[];
+BEGIN
+    IF uid IS NULL OR emb IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO user_embedding_stats AS s (userID, post_count, emb_sum)
+    VALUES (uid, sign, ARRAY(SELECT sign * x::float8 FROM unnest(emb) WITH ORDINALITY AS t(x, i) ORDER BY i))
+    ON CONFLICT (userID) DO UPDATE SET
+        post_count = s.post_count + EXCLUDED.post_count,
+        emb_sum = ARRAY(
+            SELECT a + b
+            FROM unnest(s.emb_sum, EXCLUDED.emb_sum) WITH ORDINALITY AS t(a, b, i)
+            ORDER BY i
+        )
+    RETURNING post_count, emb_sum INTO n, total;
+
+    IF n <= 0 THEN
+        DELETE FROM user_embedding_stats WHERE userID = uid;
+        UPDATE Users SET user_embedding = NULL WHERE userID = uid;
+    ELSE
+        UPDATE Users
+        SET user_embedding = ARRAY(SELECT (a / n)::real FROM unnest(total) WITH ORDINALITY AS t(a, i) ORDER BY i)
+        WHERE userID = uid;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_user_embedding() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.user_id IS NOT DISTINCT FROM NEW.user_id
+       AND OLD.post_embedding IS NOT DISTINCT FROM NEW.post_embedding THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_user_embedding_delta(OLD.user_id, OLD.post_embedding::real[], -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_user_embedding_delta(NEW.user_id, NEW.post_embedding::real[], 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS posts_user_embedding_sync ON Posts;
+CREATE TRIGGER posts_user_embedding_sync
+    AFTER INSERT OR DELETE OR UPDATE OF post_embedding, user_id
+    ON Posts
+    FOR EACH ROW EXECUTE FUNCTION sync_user_embedding();
+
+-- Compact int8 / float16 copies of the embeddings (EMB_QUANT, see embedding_store)
+CREATE TABLE IF NOT EXISTS post_embeddings_q (
+    postID INT PRIMARY KEY REFERENCES Posts(PostID) ON DELETE CASCADE,
+    dtype TEXT NOT NULL,
+    scale REAL NOT NULL,
+    codes BYTEA NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_embeddings_q (
+    userID INT PRIMARY KEY REFERENCES Users(userID) ON DELETE CASCADE,
+    dtype TEXT NOT NULL,
+    scale REAL NOT NULL,
+    codes BYTEA NOT NULL
+);
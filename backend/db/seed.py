@@ -2,8 +2,13 @@ import json
 from dotenv import load_dotenv
 import psycopg2
 import os
+import sys
 import hashlib
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from app.services.helpers.post_tags import derive_post_tags
+from app.services.conversations_service import backfill_last_messages
+
 load_dotenv()
 # -----------------------
 # Config
@@ -124,16 +129,17 @@ def load_posts(cur, conn, posts_file: str) -> None:
                     """
                     INSERT INTO Posts (
                         PostID, user_id,
-                        time_posted, post_content, post_embedding,
+                        time_posted, post_content, tags, post_embedding,
                         capacity, start_time, end_time
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                     """,
                     (
                         int(post_key),
                         post["user_id"],
                         post.get("time_posted"),
                         post.get("post_content"),
+                        derive_post_tags(post.get("post_content")),
                         post.get("embedding"),
                         post.get("capacity", 0),
                         post.get("start_time"),
@@ -149,15 +155,17 @@ def load_posts(cur, conn, posts_file: str) -> None:
                             user_id,
                             time_posted,
                             post_content,
+                            tags,
                             capacity, start_time, end_time
                         )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                         """,
                         (
                             int(post_key),
                             post["user_id"],
                             post.get("time_posted"),
                             post.get("post_content"),
+                            derive_post_tags(post.get("post_content")),
                             post.get("capacity", 0),
                             post.get("start_time"),
                             post.get("end_time"),
@@ -279,6 +287,8 @@ def load_messages(cur, conn, messages_file: str) -> None:
         else:
             conn.commit()
         count += 1
+    # bulk insert bypasses send_message: fill the inbox previews
+    backfill_last_messages(conn)
     print(f"Loaded {count} messages into DB")
 
 if __name__ == "__main__":
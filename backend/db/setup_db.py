@@ -6,7 +6,8 @@ this script handles everything needed to get a fresh database up and running:
 1. creates the database if it doesn't exist
 2. creates all tables with the correct schema
 3. seeds users, posts, conversations, messages from mock data
-4. generates recommendations for all users
+4. creates the post embedding (ann) index when pgvector is in use
+5. generates recommendations for all users
 
 usage:
     DB_USER=$(whoami) python backend/db/setup_db.py
@@ -27,12 +28,10 @@ import sys
 
 try:
     import psycopg2
-    from psycopg2.extras import Json
 except ImportError:
     print("Installing psycopg2-binary...")
     subprocess.check_call([sys.executable, "-m", "pip", "install", "psycopg2-binary", "-q"])
     import psycopg2
-    from psycopg2.extras import Json
 
 import hashlib
 
@@ -67,6 +66,10 @@ DROP TABLE IF EXISTS Posts CASCADE;
 DROP TABLE IF EXISTS Conversations CASCADE;
 DROP TABLE IF EXISTS Auth CASCADE;
 DROP TABLE IF EXISTS Users CASCADE;
+DROP TABLE IF EXISTS people_recs_changelog CASCADE;
+DROP TABLE IF EXISTS user_embedding_stats CASCADE;
+DROP TABLE IF EXISTS post_embeddings_q CASCADE;
+DROP TABLE IF EXISTS user_embeddings_q CASCADE;
 
 -- create users table
 CREATE TABLE Users (
@@ -103,7 +106,9 @@ CREATE TABLE Users (
     recs JSONB[],
     event_recs_emb JSONB[],
     event_recs_dis JSONB[],
-    people_recs JSONB
+    people_recs JSONB,
+    recs_seed INT,
+    user_embedding REAL[]
 );
 
 -- create posts table (matches seed.py expectations)
@@ -113,7 +118,9 @@ CREATE TABLE Posts (
     location_str VARCHAR(255),
     location_coords POINT,
     time_posted TIMESTAMPTZ DEFAULT NOW(),
-    post_content TEXT
+    post_content TEXT,
+    tags TEXT[],
+    post_embedding REAL[]
 );
 
 -- create conversations table
@@ -122,6 +129,11 @@ CREATE TABLE Conversations (
     user_a INT NOT NULL REFERENCES Users(userID),
     user_b INT NOT NULL REFERENCES Users(userID),
     last_messaged TIMESTAMPTZ DEFAULT NOW(),
+    -- newest message, kept by send_message (inbox preview without reading Messages)
+    last_message_id INT,
+    last_message_snippet TEXT,
+    last_message_sender INT,
+    last_message_at TIMESTAMPTZ,
     user_low INT GENERATED ALWAYS AS (LEAST(user_a, user_b)) STORED,
     user_high INT GENERATED ALWAYS AS (GREATEST(user_a, user_b)) STORED
 );
@@ -143,8 +155,17 @@ CREATE TABLE Auth (
 
 -- create indexes for common queries
 CREATE INDEX idx_posts_user_id ON Posts(user_id);
-CREATE INDEX idx_messages_conversation ON Messages(conversationID);
+CREATE INDEX idx_messages_conversation_time ON Messages(conversationID, timestamp, messageID);
 CREATE INDEX idx_conversations_users ON Conversations(user_a, user_b);
+CREATE INDEX idx_conversations_user_b ON Conversations(user_b);
+CREATE INDEX idx_users_blockedusers ON Users USING GIN (BlockedUsers);
+
+-- posts still waiting for the background embedding worker
+CREATE INDEX idx_posts_unembedded ON Posts (PostID) WHERE post_embedding IS NULL;
+
+-- people_recs_changelog, user_embedding_stats and the quantized embedding
+-- tables (plus their triggers) are created by create_schema() from the
+-- app modules that own them
 """
 
 
@@ -201,8 +222,18 @@ def create_schema():
     
     cur.execute(SCHEMA_SQL)
     conn.commit()
-    
     cur.close()
+    
+    # ddl owned by the app (also run on startup / refresh for older databases)
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from app.services.helpers.store_people_recs_in_db import ensure_people_changelog
+    from app.services.helpers.user_embeddings import ensure_user_embedding_stats
+    from app.services.helpers.embedding_store import ensure_quantized_tables
+    
+    ensure_people_changelog(conn)
+    ensure_user_embedding_stats(conn)
+    ensure_quantized_tables(conn)
+    
     conn.close()
     print("[setup] schema created")
 
@@ -339,6 +370,9 @@ def load_posts():
     with open(POSTS_FILE, "r", encoding="utf-8") as f:
         posts_data = json.load(f)
     
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from app.services.helpers.post_tags import derive_post_tags
+    
     conn = get_conn()
     cur = conn.cursor()
     
@@ -347,8 +381,8 @@ def load_posts():
         try:
             cur.execute(
                 """
-                INSERT INTO Posts (PostID, user_id, time_posted, post_content)
-                VALUES (%s, %s, %s, %s)
+                INSERT INTO Posts (PostID, user_id, time_posted, post_content, tags, post_embedding)
+                VALUES (%s, %s, %s, %s, %s, %s)
                 ON CONFLICT (PostID) DO NOTHING
                 """,
                 (
@@ -356,6 +390,8 @@ def load_posts():
                     post["user_id"],
                     post.get("time_posted"),
                     post.get("post_content"),
+                    derive_post_tags(post.get("post_content")),
+                    post.get("embedding"),
                 ),
             )
             count += 1
@@ -486,6 +522,11 @@ def load_messages():
         WHERE c.conversationID = m.conversationID
     """)
     conn.commit()
+
+    # bulk insert bypasses send_message: fill the inbox previews
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from app.services.conversations_service import backfill_last_messages
+    backfill_last_messages(conn)
     
     cur.close()
     conn.close()
@@ -494,10 +535,29 @@ def load_messages():
     return count
 
 
+def create_vector_index():
+    """create the ann index on posts.post_embedding once the posts are loaded"""
+    print("[setup] creating post embedding index...")
+    
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from app.services.helpers.vector_index import ensure_post_embedding_index
+    
+    conn = get_conn()
+    # None without pgvector (REAL[] embeddings are searched in-process)
+    name = ensure_post_embedding_index(conn)
+    conn.close()
+    
+    print(f"[setup] post embedding index: {name or 'none (no pgvector)'}")
+    return name
+
+
 def generate_recommendations():
     """generate random recommendations for all users"""
     print("[setup] generating recommendations...")
     
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from app.services.helpers.recs_writer import write_recs
+    
     conn = get_conn()
     cur = conn.cursor()
     
@@ -509,6 +569,8 @@ def generate_recommendations():
     cur.execute("SELECT postid, user_id FROM posts")
     posts = cur.fetchall()
     
+    people_staged = []
+    event_staged = []
     for uid in user_ids:
         # people recommendations (exclude self)
         other_users = [u for u in user_ids if u != uid]
@@ -520,19 +582,21 @@ def generate_recommendations():
         random.shuffle(other_posts)
         event_recs = [{"postid": p, "distance": round(random.random(), 3)} for p in other_posts[:50]]
         
-        # update user
-        cur.execute(
-            "UPDATE users SET people_recs = %s::jsonb WHERE userid = %s",
-            (Json(people_recs), uid)
-        )
-        
-        event_recs_json = [Json(e) for e in event_recs]
-        cur.execute(
-            "UPDATE users SET event_recs_emb = %s::jsonb[] WHERE userid = %s",
-            (event_recs_json, uid)
-        )
+        people_staged.append((uid, people_recs))
+        event_staged.append((uid, event_recs))
     
+    # COPY into staging + one UPDATE per column
+    write_recs(conn, "people_recs", people_staged, commit=False)
+    write_recs(conn, "event_recs_emb", event_staged, commit=False)
     conn.commit()
+    
+    # replace random event recs with nearest posts by embedding (in-process, no pgvector needed)
+    try:
+        from app.services.helpers.store_event_recs_in_db_emb import store_user_avg_embedding, store_post_recs_emb
+        store_user_avg_embedding(conn)
+        store_post_recs_emb(conn)
+    except ImportError as e:
+        print(f"  [warn] embedding recs skipped ({e}), keeping random event recs")
     cur.close()
     conn.close()
     
@@ -596,6 +660,7 @@ def main():
         load_posts()
         load_conversations()
         load_messages()
+        create_vector_index()
         generate_recommendations()
         verify_setup()
         
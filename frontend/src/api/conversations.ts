@@ -22,6 +22,8 @@ export interface OpenConversationResponse {
   friend_user_id?: number;
   friend_name?: string;
   messages: Message[];
+  next_before?: string | null;
+  next_after?: string | null;
 }
 
 export interface SendMessageResponse {
@@ -41,8 +43,24 @@ export const fetchConversations = async (userId: number): Promise<ConversationPr
   return response.json();
 };
 
-export const fetchConversation = async (userId: number, friendId: number): Promise<OpenConversationResponse> => {
-  const response = await fetch(`${API_URL}/conversations/conversation/${friendId}?user_id=${userId}`);
+// one page of a thread: newest page by default, `before` = next_before for
+// older messages, `after` = next_after for messages sent since
+export interface ConversationPageOptions {
+  limit?: number;
+  before?: string;
+  after?: string;
+}
+
+export const fetchConversation = async (
+  userId: number,
+  friendId: number,
+  options: ConversationPageOptions = {},
+): Promise<OpenConversationResponse> => {
+  const params = new URLSearchParams({ user_id: String(userId) });
+  if (options.limit) params.set('limit', String(options.limit));
+  if (options.before) params.set('before', options.before);
+  if (options.after) params.set('after', options.after);
+  const response = await fetch(`${API_URL}/conversations/conversation/${friendId}?${params}`);
   if (!response.ok) {
     throw new Error('Failed to fetch conversation');
   }
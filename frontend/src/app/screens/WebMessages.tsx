@@ -28,6 +28,18 @@ interface UiMessage {
   timestamp: string;
 }
 
+// how often an open chat checks for new messages (next_after)
+const POLL_INTERVAL_MS = 5000;
+
+function toUiMessage(m: ApiMessage, userIdInt: number): UiMessage {
+  return {
+    id: m.messageid.toString(),
+    text: m.message_content,
+    sent: m.senderid === userIdInt, // if senderid matches current user, it's sent by us
+    timestamp: new Date(m.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+  };
+}
+
 // info about the friend in the currently selected chat
 interface ChatFriendInfo {
   userId: string;
@@ -47,6 +59,15 @@ export function WebMessages({ selectedUserId, selectedUserName, selectedUserAvat
   const [conversations, setConversations] = useState<ConversationPreview[]>([]);
   const [loading, setLoading] = useState(false);
   const [conversationsLoading, setConversationsLoading] = useState(true);
+  // cursor for the page before the oldest loaded message (null = start of thread)
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  // cursor after the newest loaded message, for polling
+  const newerCursorRef = useRef<string | null>(null);
+  // chat the loaded messages belong to (late responses for another chat are dropped)
+  const activeChatRef = useRef<string | undefined>(selectedChat);
+  // prepending older messages shouldn't jump to the bottom
+  const skipScrollRef = useRef(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   
   // get user id from prop or localStorage
@@ -91,7 +112,10 @@ export function WebMessages({ selectedUserId, selectedUserName, selectedUserAvat
     async function loadMessages() {
       if (!selectedChat) return;
 
+      activeChatRef.current = selectedChat;
       setLoading(true);
+      setOlderCursor(null);
+      newerCursorRef.current = null;
       try {
         const friendId = parseInt(selectedChat, 10);
         const data = await fetchConversation(userIdInt, friendId);
@@ -104,15 +128,10 @@ export function WebMessages({ selectedUserId, selectedUserName, selectedUserAvat
           });
         }
         
-        // transform api messages to ui messages
-        const uiMessages: UiMessage[] = data.messages.map(m => ({
-          id: m.messageid.toString(),
-          text: m.message_content,
-          sent: m.senderid === userIdInt, // if senderid matches current user, it's sent by us
-          timestamp: new Date(m.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
-        }));
-        
-        setMessages(uiMessages);
+        // transform api messages to ui messages (newest page, oldest first)
+        setMessages(data.messages.map(m => toUiMessage(m, userIdInt)));
+        setOlderCursor(data.next_before ?? null);
+        newerCursorRef.current = data.next_after ?? null;
       } catch (err) {
         console.error('Failed to load messages', err);
       } finally {
@@ -123,7 +142,60 @@ export function WebMessages({ selectedUserId, selectedUserName, selectedUserAvat
     loadMessages();
   }, [selectedChat, userIdInt]);
 
+  // poll the open chat for messages newer than the last one loaded
   useEffect(() => {
+    if (!selectedChat) return;
+    const friendId = parseInt(selectedChat, 10);
+    let cancelled = false;
+
+    const timer = setInterval(async () => {
+      // empty thread so far: no cursor yet, look at the newest page
+      const after = newerCursorRef.current;
+      try {
+        const data = await fetchConversation(userIdInt, friendId, after ? { after } : {});
+        if (cancelled || activeChatRef.current !== selectedChat || newerCursorRef.current !== after) return;
+        newerCursorRef.current = data.next_after ?? after;
+        if (!after) setOlderCursor(data.next_before ?? null);
+        if (data.messages.length === 0) return;
+        setMessages(prev => {
+          // our own sends are already shown
+          const seen = new Set(prev.map(m => m.id));
+          const fresh = data.messages.map(m => toUiMessage(m, userIdInt)).filter(m => !seen.has(m.id));
+          return fresh.length ? [...prev, ...fresh] : prev;
+        });
+      } catch (err) {
+        console.error('Failed to poll messages', err);
+      }
+    }, POLL_INTERVAL_MS);
+
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+    };
+  }, [selectedChat, userIdInt]);
+
+  const loadOlderMessages = async () => {
+    if (!selectedChat || !olderCursor || loadingOlder) return;
+    const chat = selectedChat;
+    setLoadingOlder(true);
+    try {
+      const data = await fetchConversation(userIdInt, parseInt(chat, 10), { before: olderCursor });
+      if (activeChatRef.current !== chat) return;
+      skipScrollRef.current = true;
+      setMessages(prev => [...data.messages.map(m => toUiMessage(m, userIdInt)), ...prev]);
+      setOlderCursor(data.next_before ?? null);
+    } catch (err) {
+      console.error('Failed to load older messages', err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages, loading]);
 
@@ -319,6 +391,17 @@ export function WebMessages({ selectedUserId, selectedUserName, selectedUserAvat
                     </div>
                 ) : (
                 <>
+                {olderCursor && (
+                  <div className="flex justify-center">
+                    <button
+                      onClick={loadOlderMessages}
+                      disabled={loadingOlder}
+                      className="px-4 py-1.5 text-sm text-[#666666] border border-black/20 rounded-xl hover:bg-[#FFEBDA]/50 transition-colors"
+                    >
+                      {loadingOlder ? <Loader2 className="animate-spin" size={16} /> : 'Load earlier messages'}
+                    </button>
+                  </div>
+                )}
                 <AnimatePresence>
                   {messages.map((msg, index) => (
                     <motion.div